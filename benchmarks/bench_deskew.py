@@ -0,0 +1,90 @@
+# benchmarks/bench_deskew.py
+"""
+So sánh ước lượng góc nghiêng + xoay trang:
+
+  - legacy    : Otsu full-res → np.column_stack(np.where(th < 255)) → cv2.minAreaRect → warpAffine
+                (đường cũ của image_ops.preprocess_image)
+  - thumbnail : image_ops.deskew (projection profile trên thumbnail, chỉ warp khi góc đáng kể)
+  - estimate  : chỉ image_ops.estimate_skew_angle (gray → góc), không warp
+
+Tạo trang tổng hợp 2480x3508 (A4 @300dpi) nghiêng một góc biết trước; in latency,
+peak memory (tracemalloc — chỉ tính buffer NumPy/Python, không tính bộ nhớ nội bộ OpenCV)
+và góc ước lượng.
+
+Usage:
+  python -m benchmarks.bench_deskew --angles 0 0.1 1.5 -3 --repeat 3
+  python -m benchmarks.bench_deskew --image data/debug/page.png
+"""
+import argparse, random, string, time, tracemalloc
+
+import cv2
+import numpy as np
+
+from src.processing.preprocess.image_ops import deskew, estimate_skew_angle, to_gray
+
+
+def legacy_deskew(bgr: np.ndarray):
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
+    coords = np.column_stack(np.where(th < 255))
+    angle = 0.0
+    if coords.size >= 100:
+        angle = cv2.minAreaRect(coords)[-1]
+        angle = -(90 + angle) if angle < -45 else -angle
+        h, w = gray.shape[:2]
+        M = cv2.getRotationMatrix2D((w//2, h//2), angle, 1.0)
+        bgr = cv2.warpAffine(bgr, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return bgr, angle
+
+
+def estimate_only(bgr: np.ndarray):
+    return bgr, estimate_skew_angle(to_gray(bgr))
+
+
+def make_page(angle: float, w: int = 2480, h: int = 3508, seed: int = 0) -> np.ndarray:
+    """Trang chữ ngẫu nhiên, xoay `angle` độ (ngược quy ước deskew → góc đúng là -angle)."""
+    rng = random.Random(seed)
+    img = np.full((h, w, 3), 255, dtype=np.uint8)
+    y = 260
+    while y < h - 260:
+        x = 220
+        while x < w - 420:
+            word = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 9)))
+            cv2.putText(img, word, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.4, (0, 0, 0), 3, cv2.LINE_AA)
+            x += 40 + 30 * len(word)
+        y += 70
+    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderValue=(255, 255, 255))
+
+
+def measure(fn, img, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(img)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    _, angle = fn(img)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, angle
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--angles", type=float, nargs="+", default=[0.0, 0.1, 1.5, -3.0])
+    ap.add_argument("--image", default=None, help="Ảnh trang thật (thay cho trang tổng hợp)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    cases = [(args.image, cv2.imread(args.image))] if args.image else \
+            [(f"skew {a:+.1f}°", make_page(a)) for a in args.angles]
+    print(f"{'case':<14} {'method':<10} {'ms':>8} {'peak MB':>8} {'angle':>7}")
+    for name, img in cases:
+        for method, fn in (("legacy", legacy_deskew), ("thumbnail", deskew), ("estimate", estimate_only)):
+            sec, peak, angle = measure(fn, img, args.repeat)
+            print(f"{name:<14} {method:<10} {sec * 1000:8.1f} {peak / 1e6:8.1f} {angle:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
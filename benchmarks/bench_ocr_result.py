@@ -0,0 +1,165 @@
+# benchmarks/bench_ocr_result.py
+"""
+So sánh đường chuẩn hoá output OCR → PageColumns (đã lọc + sắp thứ tự đọc) trên trang nhiều item:
+
+  - legacy : engine trả list dict / list Paddle classic → _to_dict_items (isinstance + try/except
+             từng item) → gom dict thành mảng + đoán thang conf (/100, /3000)   (đường cũ)
+  - typed  : engine.parse (định dạng + thang conf khai báo sẵn) → OcrResult → paddle_to_columns
+
+Dữ liệu tổng hợp theo đúng định dạng gốc của từng engine (dict cột của image_to_data,
+list [poly, (text, score)] của PaddleOCR classic); không cần chạy OCR thật.
+
+Usage:
+  python -m benchmarks.bench_ocr_result --items 10000 --repeat 5
+"""
+import argparse, random, string, time
+
+import numpy as np
+
+from src.processing.preprocess.ocr.paddle_engine import PaddleClassicEngine
+from src.processing.preprocess.ocr.tesseract_engine import TesseractEngine
+from src.processing.preprocess.page_schema import LINE_ID_KEYS, PageColumns
+from src.processing.preprocess.writer import paddle_to_columns
+
+W, H = 2480, 3508
+
+
+# ---------- đường cũ (giữ nguyên logic để so sánh) ----------
+def _legacy_tesseract_items(data):
+    out = []
+    for i in range(len(data["text"])):
+        txt = (data["text"][i] or "").strip()
+        try:
+            conf = float(data["conf"][i])
+        except Exception:
+            conf = -1.0
+        if conf <= 0 or not txt:
+            continue
+        x, y, w, h = int(data["left"][i]), int(data["top"][i]), int(data["width"][i]), int(data["height"][i])
+        out.append({"text": txt, "conf": conf, "bbox": [x, y, x + w, y + h], "engine": "tesseract",
+                    "block": int(data["block_num"][i]), "par": int(data["par_num"][i]),
+                    "line": int(data["line_num"][i])})
+    return out
+
+
+def _legacy_to_dict_items(items):
+    out = []
+    for it in (items or []):
+        if isinstance(it, (list, tuple)) and len(it) >= 2 and isinstance(it[0], (list, tuple)):
+            try:
+                xs = [float(p[0]) for p in it[0]]; ys = [float(p[1]) for p in it[0]]
+                bbox = [min(xs), min(ys), max(xs), max(ys)]
+            except Exception:
+                bbox = [0, 0, 0, 0]
+            ti = it[1]
+            if isinstance(ti, (list, tuple)) and len(ti) >= 2:
+                txt, cf = str(ti[0] or ""), float(ti[1])
+            elif isinstance(ti, dict):
+                txt, cf = str(ti.get("text", "") or ""), float(ti.get("conf", ti.get("score", 0.0)) or 0.0)
+            else:
+                txt, cf = str(ti or ""), 1.0
+            out.append({"text": txt, "conf": cf, "bbox": bbox})
+        elif isinstance(it, dict):
+            d = {"text": str(it.get("text", "") or ""), "conf": float(it.get("conf", it.get("score", 0.0)) or 0.0),
+                 "bbox": list(it.get("bbox", [0, 0, 0, 0]))}
+            for k in LINE_ID_KEYS:
+                if k in it:
+                    d[k] = it[k]
+            out.append(d)
+    return out
+
+
+def _legacy_columns(items, min_conf=0.2):
+    ids = None
+    if items and all(isinstance(it, dict) for it in items):
+        if all(k in items[0] for k in LINE_ID_KEYS):
+            ids = np.array([[it.get(k, -1) for k in LINE_ID_KEYS] for it in items], dtype=np.int64)
+    texts = [str(it.get("text", "") or "").strip() for it in items]
+    bbox = np.array([it.get("bbox", (0, 0, 0, 0)) for it in items], dtype=np.float64).reshape(-1, 4)
+    conf = np.array([it.get("conf", 0.0) for it in items], dtype=np.float64)
+    conf = np.where((conf > 1.5) & (conf <= 100.0), conf / 100.0,
+                    np.where(conf > 100.0, np.minimum(1.0, conf / 3000.0), conf))
+    cols = PageColumns("bench", 0, W, H, texts, bbox, conf, engine="paddle", ids=ids)
+    return cols.filter(min_conf=min_conf, min_size=1.0).sort_reading_order()
+
+
+def legacy_tesseract(data):
+    return _legacy_columns(_legacy_to_dict_items(_legacy_tesseract_items(data)))
+
+
+def legacy_paddle(lines):
+    return _legacy_columns(_legacy_to_dict_items(lines))
+
+
+def typed_tesseract(data):
+    return paddle_to_columns("bench", 0, W, H, TesseractEngine.parse(data), min_conf=0.2)
+
+
+def typed_paddle(lines):
+    return paddle_to_columns("bench", 0, W, H, PaddleClassicEngine.parse(lines), min_conf=0.2)
+
+
+# ---------- dữ liệu tổng hợp ----------
+def _boxes(n: int, rng: random.Random):
+    per_row = 12
+    for k in range(n):
+        r, c = divmod(k, per_row)
+        x, y = 100 + c * 190 + rng.randint(0, 10), 100 + (r % 150) * 22 + rng.randint(0, 3)
+        yield r, x, y, rng.randint(60, 170), rng.randint(14, 20)
+
+
+def make_tesseract_data(n: int, seed: int = 0) -> dict:
+    """Dict cột kiểu image_to_data(Output.DICT); ~5% dòng cấu trúc (text rỗng, conf -1)."""
+    rng = random.Random(seed)
+    cols = {k: [] for k in ("text", "conf", "left", "top", "width", "height", "block_num", "par_num", "line_num")}
+    for r, x, y, w, h in _boxes(n, rng):
+        empty = rng.random() < 0.05
+        cols["text"].append("" if empty else "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 9))))
+        cols["conf"].append(-1 if empty else rng.randint(20, 99))
+        cols["left"].append(x); cols["top"].append(y); cols["width"].append(w); cols["height"].append(h)
+        cols["block_num"].append(r // 40 + 1); cols["par_num"].append(r // 8 + 1); cols["line_num"].append(r + 1)
+    return cols
+
+
+def make_paddle_lines(n: int, seed: int = 0) -> list:
+    """List [poly 4 điểm, (text, score)] kiểu PaddleOCR classic."""
+    rng = random.Random(seed)
+    out = []
+    for _, x, y, w, h in _boxes(n, rng):
+        poly = [[float(x), float(y)], [float(x + w), float(y)], [float(x + w), float(y + h)], [float(x), float(y + h)]]
+        text = "".join(rng.choice(string.ascii_letters) for _ in range(rng.randint(2, 9)))
+        out.append([poly, (text, rng.uniform(0.1, 1.0))])
+    return out
+
+
+def measure(fn, data, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cols = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return best, cols
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=10000, help="Số item OCR mỗi trang")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    cases = (("tesseract", make_tesseract_data(args.items), legacy_tesseract, typed_tesseract),
+             ("paddle", make_paddle_lines(args.items), legacy_paddle, typed_paddle))
+    print(f"{'engine':<10} {'path':<7} {'ms/page':>9} {'items/s':>11} {'kept':>6}")
+    for name, data, legacy, typed in cases:
+        base = None
+        for path, fn in (("legacy", legacy), ("typed", typed)):
+            sec, cols = measure(fn, data, args.repeat)
+            print(f"{name:<10} {path:<7} {sec * 1000:9.2f} {args.items / sec:11.0f} {len(cols):6d}")
+            if base is None:
+                base = cols
+            elif base.text != cols.text or not np.allclose(base.conf, cols.conf):
+                print(f"[WARN] {name}: typed output differs from legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_render.py
+"""
+So sánh các đường render trang scan → ndarray cho OCR.
+
+  - legacy    : pdftoppm -png → PIL.open → np.array → cv2.cvtColor (đường cũ của pdf_ocr_ingest)
+  - pdftoppm  : image_ops.render_page(fmt="png") (pdftoppm -png → cv2.imdecode thẳng ra BGR/gray)
+  - pnm       : image_ops.render_page(fmt="pnm") (PGM/PPM không nén → np.memmap, không zlib)
+  - fitz-png  : get_pixmap → tobytes("png") → Image.open (đường cũ của PdfExtractor)
+  - fitz      : image_ops.render_page_fitz (pixmap.samples → numpy view, không qua PNG)
+
+In ra pages/sec và số byte bị copy mỗi trang (buffer trung gian sau khi đã có ảnh thô).
+
+Usage:
+  python -m benchmarks.bench_render --pdf data/raw/.../quy-che.pdf --pages 10 --dpi 300
+"""
+import argparse, io, tempfile, time
+from pathlib import Path
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+from src.processing.preprocess.image_ops import (
+    _PixmapArray, _pdftoppm_bin, render_page, render_page_fitz,
+)
+
+
+def _legacy(pdf, idx, dpi, poppler, out_dir, color):
+    import subprocess
+    prefix = str(Path(out_dir) / f"legacy-{idx+1:03d}")
+    subprocess.run([_pdftoppm_bin(poppler), "-r", str(dpi), "-png", "-f", str(idx+1), "-l", str(idx+1),
+                    "-singlefile", pdf, prefix], check=True)
+    pil = Image.open(prefix + ".png").convert("RGB")   # decode
+    rgb = np.array(pil)                                 # copy 1
+    bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)          # copy 2
+    copied = Path(prefix + ".png").stat().st_size + rgb.nbytes * 2
+    if color == "gray":
+        bgr = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        copied += bgr.nbytes
+    return bgr, copied
+
+
+def _pdftoppm(pdf, idx, dpi, poppler, out_dir, color):
+    img = render_page(pdf, idx, dpi, poppler, out_dir, color=color, fmt="png")
+    png = Path(out_dir) / f"page-{idx+1:03d}.png"
+    return img, png.stat().st_size   # chỉ đọc file PNG; decode ghi thẳng vào ndarray đích
+
+
+def _pnm(pdf, idx, dpi, poppler, out_dir, color):
+    img = render_page(pdf, idx, dpi, poppler, out_dir, color=color, fmt="pnm")
+    return img, 0                    # memmap: pixel đọc thẳng từ page cache, không buffer trung gian
+
+
+def _fitz_png(doc, idx, dpi, color):
+    pix = doc.load_page(idx).get_pixmap(dpi=dpi)
+    png = pix.tobytes("png")                            # encode
+    img = Image.open(io.BytesIO(png)).convert("L" if color == "gray" else "RGB")
+    arr = np.array(img)                                 # copy
+    return arr, len(png) + arr.nbytes
+
+
+def _fitz(doc, idx, dpi, color):
+    img = render_page_fitz(doc.load_page(idx), dpi=dpi, color=color)
+    return img, (0 if isinstance(img, _PixmapArray) else img.nbytes)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", required=True)
+    ap.add_argument("--pages", type=int, default=5)
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--color", default="bgr", choices=["bgr", "gray"])
+    ap.add_argument("--poppler_path", default=None)
+    args = ap.parse_args()
+
+    pdf = str(Path(args.pdf).resolve())
+    doc = fitz.open(pdf)
+    n = min(args.pages, len(doc))
+
+    with tempfile.TemporaryDirectory(prefix="bench-render-") as tmp:
+        runs = {
+            "legacy":   lambda i: _legacy(pdf, i, args.dpi, args.poppler_path, tmp, args.color),
+            "pdftoppm": lambda i: _pdftoppm(pdf, i, args.dpi, args.poppler_path, tmp, args.color),
+            "pnm":      lambda i: _pnm(pdf, i, args.dpi, args.poppler_path, tmp, args.color),
+            "fitz-png": lambda i: _fitz_png(doc, i, args.dpi, args.color),
+            "fitz":     lambda i: _fitz(doc, i, args.dpi, args.color),
+        }
+        print(f"{'backend':<10} {'pages/s':>8} {'MB copied/page':>15} {'shape':>18}")
+        for name, fn in runs.items():
+            copied, shape = 0, None
+            t0 = time.perf_counter()
+            for i in range(n):
+                img, c = fn(i)
+                copied += c
+                shape = img.shape
+                del img
+            dt = time.perf_counter() - t0
+            print(f"{name:<10} {n / dt:8.2f} {copied / n / 1e6:15.1f} {str(shape):>18}")
+    doc.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_structure_parser.py
+"""
+Thông lượng structure_parser.parse_structure (lines/sec) trên fulltext_norm tổng hợp:
+
+  - legacy  : strip_accents (NFD + lọc 'Mn' từng ký tự) cho MỌI dòng, rồi thử lần lượt
+              CHUONG_RE / CHUONG_FOLD_RE / DIEU_RE / DIEU_FOLD_RE / KHOAN_RE / DIEM_RE   (đường cũ)
+  - combined: 1 lần STRUCT_RE (named group); chỉ fold (str.translate) khi trượt và dòng bắt đầu
+              bằng c/d
+
+Corpus kiểu quy chế: Chương/Điều/Khoản/Điểm + dòng thân; một phần tiêu đề mất dấu do OCR
+("CHUONG II", "Dieu 12."). Hai đường phải cho cùng JSON.
+
+Usage:
+  python -m benchmarks.bench_structure_parser --articles 5000 --repeat 5
+"""
+import argparse, random, re, time, unicodedata
+
+from src.config.regex_patterns import CHUONG_RE, DIEU_RE, KHOAN_RE, DIEM_RE
+from src.processing.parser.structure_parser import flush_current_article, parse_structure
+
+_WORDS = ("quy", "chế", "đào", "tạo", "sinh", "viên", "học", "phần", "tín", "chỉ", "điểm", "trường",
+          "đại", "khoa", "ngành", "chương", "trình", "thi", "kết", "quả", "được", "theo", "của")
+_ROMAN = ("I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X")
+
+
+# ---------- đường cũ (giữ nguyên logic để so sánh) ----------
+def _legacy_strip_accents(s: str) -> str:
+    return ''.join(c for c in unicodedata.normalize('NFD', s)
+                   if unicodedata.category(c) != 'Mn').lower()
+
+_CHUONG_FOLD_RE = re.compile(r'(?im)^\s*chuong\s+([ivxlcd\d]+)(?:\s*[-–]\s*(.+))?\s*$')
+_DIEU_FOLD_RE = re.compile(r'(?im)^\s*dieu\s+(\d+)\s*[\.:]?\s*(.*)$')
+
+
+def legacy_parse_structure(lines):
+    content = []
+    current_chapter = None
+    current_article = None
+    for raw in lines:
+        line = raw.rstrip()
+        folded = _legacy_strip_accents(line).strip()
+        if not line.strip():
+            continue
+        mch = CHUONG_RE.match(line) or _CHUONG_FOLD_RE.match(folded)
+        if mch:
+            if current_article:
+                flush_current_article(current_article, current_chapter['articles'])
+                current_article = None
+            title = (mch.group(2) or "").strip()
+            current_chapter = {"chapter": f"Chương {mch.group(1).strip()}", "title": title if title else None,
+                               "articles": []}
+            content.append(current_chapter)
+            continue
+        md = DIEU_RE.match(line) or _DIEU_FOLD_RE.match(folded)
+        if md:
+            if current_article:
+                flush_current_article(current_article, current_chapter['articles'] if current_chapter else content)
+            article_title = md.group(2).strip() if md.group(2) else None
+            current_article = {"id": int(md.group(1)), "title": article_title if article_title else None,
+                               "text": "", "clauses": []}
+            if current_chapter is None:
+                current_chapter = {"chapter": None, "title": None, "articles": []}
+                content.append(current_chapter)
+            continue
+        mk = KHOAN_RE.match(line)
+        if mk and current_article:
+            current_article["clauses"].append({"idx": int(mk.group(1)), "text": mk.group(2).strip(), "points": []})
+            continue
+        mp = DIEM_RE.match(line)
+        if mp and current_article:
+            pt = {"label": mp.group(1), "text": mp.group(2).strip()}
+            if current_article["clauses"]:
+                current_article["clauses"][-1]["points"].append(pt)
+            else:
+                current_article["clauses"].append({"idx": None, "text": "", "points": [pt]})
+            continue
+        if current_article:
+            current_article["text"] = (current_article["text"] + "\n" + line) if current_article["text"] else line
+    if current_article:
+        flush_current_article(current_article, current_chapter["articles"] if current_chapter else content)
+    return {"metadata": {"schema": "uit-regulation-structure@v1",
+                         "levels": ["chapter", "article", "clause", "point"]},
+            "content": content}
+
+
+# ---------- dữ liệu tổng hợp ----------
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 18)))
+
+
+def make_lines(articles: int, seed: int = 0):
+    rng = random.Random(seed)
+    out = []
+    per_chapter = max(1, articles // len(_ROMAN))
+    for a in range(1, articles + 1):
+        if (a - 1) % per_chapter == 0:
+            ch = _ROMAN[((a - 1) // per_chapter) % len(_ROMAN)]
+            out.append(f"CHUONG {ch} - QUY DINH CHUNG" if rng.random() < 0.2 else f"Chương {ch} - Quy định chung")
+        out.append(f"Dieu {a}. {_sentence(rng)}" if rng.random() < 0.1 else f"Điều {a}. {_sentence(rng)}")
+        for _ in range(rng.randint(0, 2)):
+            out.append(_sentence(rng))
+        for k in range(1, rng.randint(1, 4) + 1):
+            out.append(f"{k}. {_sentence(rng)}")
+            for lb in "abc"[:rng.randint(0, 3)]:
+                out.append(f"{lb}) {_sentence(rng)}")
+            if rng.random() < 0.3:
+                out.append("")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--articles", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    lines = make_lines(args.articles)
+    print(f"corpus: {args.articles} articles, {len(lines)} lines")
+    print(f"{'method':<10} {'sec':>8} {'lines/sec':>12}")
+    base = None
+    for name, fn in (("legacy", legacy_parse_structure), ("combined", parse_structure)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            parsed = fn(lines)
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:<10} {best:8.3f} {len(lines) / best:12.0f}")
+        if base is None:
+            base = parsed
+        elif parsed != base:
+            print(f"[WARN] {name}: output differs from legacy")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,24 @@
 import re
 import unicodedata
 
+def _build_fold_table() -> dict:
+    # ký tự Latin có dấu (Latin-1, Extended-A/B, Extended Additional: đủ cho tiếng Việt) → chữ gốc;
+    # dấu kết hợp rời (văn bản NFD) → xoá. Giống NFD + bỏ 'Mn'; đ/Đ không tách dấu nên giữ nguyên.
+    table = {}
+    for cp in (*range(0x00C0, 0x0250), *range(0x1E00, 0x1F00)):
+        c = chr(cp)
+        base = ''.join(ch for ch in unicodedata.normalize('NFD', c) if unicodedata.category(ch) != 'Mn')
+        if base != c:
+            table[cp] = base
+    for cp in range(0x0300, 0x0370):
+        if unicodedata.category(chr(cp)) == 'Mn':
+            table[cp] = None
+    return table
+
+_FOLD_TABLE = _build_fold_table()
+
 def strip_accents(s: str) -> str:
-    return ''.join(c for c in unicodedata.normalize('NFD', s)
-                   if unicodedata.category(c) != 'Mn').lower()
+    return s.translate(_FOLD_TABLE).lower()
 
 # Bản có dấu (giữ nguyên cho đẹp)
 CHUONG_RE = re.compile(r'(?im)^\s*Chương\s+([IVXLC\d]+)(?:\s*[-–]\s*(.+))?\s*$')
@@ -15,6 +30,22 @@ DIEM_RE   = re.compile(r'(?m)^\s*([a-zA-Z])\)\s+(.*)$')
 CHUONG_FOLD_RE = re.compile(r'(?im)^\s*chuong\s+([ivxlcd\d]+)(?:\s*[-–]\s*(.+))?\s*$')
 DIEU_FOLD_RE   = re.compile(r'(?im)^\s*dieu\s+(\d+)\s*[\.:]?\s*(.*)$')
 
+# Gộp 1 pattern cho parser: nhóm ngoài (chuong/dieu/khoan/diem) đóng sau cùng → m.lastgroup là loại dòng.
+# Cùng điều kiện với các regex riêng ở trên (4 nhánh loại trừ nhau theo từ đầu dòng).
+STRUCT_RE = re.compile(
+    r'^\s*(?:'
+    r'(?P<chuong>(?i:Chương\s+(?P<chuong_no>[IVXLC\d]+))(?:\s*[-–]\s*(?P<chuong_title>.+))?\s*$)'
+    r'|(?P<dieu>(?i:Điều)\s+(?P<dieu_no>\d+)\s*[\.:]?\s*(?P<dieu_title>.*)$)'
+    r'|(?P<khoan>(?P<khoan_no>\d+)\.\s+(?P<khoan_text>.*)$)'
+    r'|(?P<diem>(?P<diem_label>[a-zA-Z])\)\s+(?P<diem_text>.*)$)'
+    r')')
+# Bản folded (sau strip_accents) chỉ cho Chương/Điều mất dấu do OCR
+STRUCT_FOLD_RE = re.compile(
+    r'(?i)^\s*(?:'
+    r'(?P<chuong>chuong\s+(?P<chuong_no>[ivxlcd\d]+)(?:\s*[-–]\s*(?P<chuong_title>.+))?\s*$)'
+    r'|(?P<dieu>dieu\s+(?P<dieu_no>\d+)\s*[\.:]?\s*(?P<dieu_title>.*)$)'
+    r')')
+
 PAGE_MARK_RE = re.compile(r'^\s*<{2,}PAGE\s+\d+>{2,}\s*$', re.IGNORECASE)
 NOI_NHAN_START_RE = re.compile(r'(?im)^\s*Nơi nhận\s*:\s*$')
 KY_TEN_RE = re.compile(r'(?im)^\s*(HIỆU TRƯỞNG|PHÓ HIỆU TRƯỞNG|(đã ký)|\(đã ký\))\s*$')
@@ -3,9 +3,8 @@ Extractor for PDF files using PyMuPDF, with an OCR fallback using Tesseract.
 """
 import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
-import io
 
+from src.processing.preprocess.image_ops import iter_fitz_page_images
 from .base_extractor import BaseExtractor
 
 class PdfExtractor(BaseExtractor):
@@ -21,14 +20,9 @@ class PdfExtractor(BaseExtractor):
         """
         print("[INFO] PDF appears to be image-based. Falling back to OCR...")
         full_text = []
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            
-            # Render page to a high-resolution image for better OCR accuracy
-            pix = page.get_pixmap(dpi=300)
-            img_bytes = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_bytes))
-            
+        # Render lazily, one page at a time, straight from the pixmap into a grayscale
+        # NumPy view (no PNG round trip), so peak memory does not grow with page count
+        for page_num, img in iter_fitz_page_images(doc, dpi=300, color="gray"):
             # Use Tesseract to extract text, specifying Vietnamese language
             try:
                 page_text = pytesseract.image_to_string(img, lang='vie')
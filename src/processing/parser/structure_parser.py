@@ -9,18 +9,12 @@ Usage:
     --input data/processed/<doc-id>/fulltext_norm.txt \
     --output data/processed/parsed/<doc-id>.json
 """
-from src.config.regex_patterns import (
-    CHUONG_RE, DIEU_RE, KHOAN_RE, DIEM_RE,
-    CHUONG_FOLD_RE, DIEU_FOLD_RE,
-    PAGE_MARK_RE, NOI_NHAN_START_RE, KY_TEN_RE, strip_accents
-)
-
 import argparse, json, re
 from pathlib import Path
 
 from src.config.regex_patterns import (
-    CHUONG_RE, DIEU_RE, KHOAN_RE, DIEM_RE,
-    PAGE_MARK_RE, NOI_NHAN_START_RE, KY_TEN_RE
+    STRUCT_RE, STRUCT_FOLD_RE,
+    PAGE_MARK_RE, NOI_NHAN_START_RE, KY_TEN_RE, strip_accents
 )
 
 def read_text(fp: Path) -> list[str]:
@@ -78,6 +72,21 @@ def flush_current_article(current_article, bucket):
             current_article['text'] = current_article.get('text', "").strip()
         bucket.append(current_article)
 
+def classify_line(line: str):
+    """
+    1 lần match STRUCT_RE (có dấu); chỉ khi trượt và dòng bắt đầu bằng c/d (sau khi bỏ dấu) mới
+    fold cả dòng để bắt "Chuong"/"Dieu" mất dấu. Trả (loại, match) hoặc (None, None).
+    """
+    m = STRUCT_RE.match(line)
+    if m is None:
+        head = line.lstrip()[:1]
+        if not head or strip_accents(head) not in ("c", "d"):
+            return None, None
+        m = STRUCT_FOLD_RE.match(strip_accents(line))
+        if m is None:
+            return None, None
+    return m.lastgroup, m
+
 def parse_structure(lines: list[str]) -> dict:
     content = []
     current_chapter = None
@@ -85,22 +94,22 @@ def parse_structure(lines: list[str]) -> dict:
 
     for raw in lines:
         line = raw.rstrip()
-        folded = strip_accents(line).strip()
 
         # Skip rỗng
         if not line.strip():
             continue
 
+        kind, m = classify_line(line)
+
         # ==== Match Chương ====
-        mch = CHUONG_RE.match(line) or CHUONG_FOLD_RE.match(folded)
-        if mch:
+        if kind == "chuong":
             # flush article trước khi sang chương mới
             if current_article:
                 flush_current_article(current_article, current_chapter['articles'])
                 current_article = None
             # tạo chương mới
-            roman_or_num = mch.group(1).strip()
-            title = (mch.group(2) or "").strip()
+            roman_or_num = m["chuong_no"].strip()
+            title = (m["chuong_title"] or "").strip()
             current_chapter = {
                 "chapter": f"Chương {roman_or_num}",
                 "title": title if title else None,
@@ -110,13 +119,12 @@ def parse_structure(lines: list[str]) -> dict:
             continue
 
         # ==== Match Điều ====
-        md = DIEU_RE.match(line) or DIEU_FOLD_RE.match(folded)
-        if md:
+        if kind == "dieu":
             # flush điều cũ
             if current_article:
                 flush_current_article(current_article, current_chapter['articles'] if current_chapter else content)
-            article_id = int(md.group(1))
-            article_title = md.group(2).strip() if md.group(2) else None
+            article_id = int(m["dieu_no"])
+            article_title = m["dieu_title"].strip() if m["dieu_title"] else None
             current_article = {
                 "id": article_id,
                 "title": article_title if article_title else None,
@@ -131,18 +139,16 @@ def parse_structure(lines: list[str]) -> dict:
             continue
 
         # ==== Match Khoản ====
-        mk = KHOAN_RE.match(line)
-        if mk and current_article:
-            idx = int(mk.group(1))
-            text = mk.group(2).strip()
+        if kind == "khoan" and current_article:
+            idx = int(m["khoan_no"])
+            text = m["khoan_text"].strip()
             current_article["clauses"].append({"idx": idx, "text": text, "points": []})
             continue
 
         # ==== Match Điểm ====
-        mp = DIEM_RE.match(line)
-        if mp and current_article:
-            label = mp.group(1)
-            text = mp.group(2).strip()
+        if kind == "diem" and current_article:
+            label = m["diem_label"]
+            text = m["diem_text"].strip()
             # gắn vào khoản gần nhất nếu có, nếu không thì tạo khoản ảo
             if current_article["clauses"]:
                 current_article["clauses"][-1]["points"].append({"label": label, "text": text})
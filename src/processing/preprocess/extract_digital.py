@@ -1,4 +1,5 @@
 # extract_digital.py
+import csv
 import fitz  # PyMuPDF
 import pdfplumber
 from pathlib import Path
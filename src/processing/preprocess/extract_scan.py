@@ -1,4 +1,6 @@
 # extract_scan.py
+import bisect
+import csv
 import cv2
 import pytesseract
 from pytesseract import Output
@@ -13,14 +15,78 @@ def ocr_page_to_lines(image: np.ndarray, lang="vie+eng") -> List[str]:
     txt = pytesseract.image_to_string(image, lang=lang, config=config)
     return [s for s in txt.splitlines() if s.strip()]
 
-def detect_tables_csv(image: np.ndarray) -> List[List[List[str]]]:
+_CELL_CONFIG = "--oem 1 --psm 7 -c preserve_interword_spaces=1"
+_BATCH_CONFIG = "--oem 1 --psm 6 -c preserve_interword_spaces=1"
+_BATCH_GAP = 24          # khoảng trắng giữa các cell khi ghép (px) — lớn hơn khoảng cách dòng
+_BATCH_INSET = 3         # cắt bớt mép cell để bỏ đường kẻ
+_BATCH_MAX_H = 30000     # Tesseract giới hạn ~32767 px mỗi chiều
+
+def _ocr_cells_per_cell(cells: List[np.ndarray], lang: str) -> List[str]:
+    """Cách cũ: 1 lần gọi tesseract (1 process) cho mỗi cell."""
+    return [pytesseract.image_to_string(c, lang=lang, config=_CELL_CONFIG).strip() for c in cells]
+
+def _ocr_cells_batched(cells: List[np.ndarray], lang: str) -> List[str]:
+    """
+    Ghép các cell thành 1 ảnh dọc (offset đã biết) → 1 lần image_to_data cho cả lô,
+    rồi gán từng word về cell theo tâm y. Ảnh quá cao thì chia thành vài lô.
+    """
+    out = [""] * len(cells)
+    if not cells:
+        return out
+    ch = cells[0].shape[2:]  # () gray / (3,) BGR
+
+    batches, cur, cur_h = [], [], _BATCH_GAP
+    for idx, c in enumerate(cells):
+        c = c[_BATCH_INSET:max(_BATCH_INSET, c.shape[0] - _BATCH_INSET),
+              _BATCH_INSET:max(_BATCH_INSET, c.shape[1] - _BATCH_INSET)]
+        if c.size == 0:
+            continue
+        if cur and cur_h + c.shape[0] + _BATCH_GAP > _BATCH_MAX_H:
+            batches.append(cur)
+            cur, cur_h = [], _BATCH_GAP
+        cur.append((idx, c, cur_h))
+        cur_h += c.shape[0] + _BATCH_GAP
+    if cur:
+        batches.append(cur)
+
+    for batch in batches:
+        height = batch[-1][2] + batch[-1][1].shape[0] + _BATCH_GAP
+        width = max(c.shape[1] for _, c, _ in batch) + 2 * _BATCH_GAP
+        canvas = np.full((height, width) + ch, 255, dtype=np.uint8)
+        starts = []
+        for idx, c, y in batch:
+            canvas[y:y + c.shape[0], _BATCH_GAP:_BATCH_GAP + c.shape[1]] = c
+            starts.append(y)
+
+        data = pytesseract.image_to_data(canvas, lang=lang, config=_BATCH_CONFIG, output_type=Output.DICT)
+        words = defaultdict(list)
+        for k, txt in enumerate(data["text"]):
+            txt = (txt or "").strip()
+            if not txt:
+                continue
+            cy = data["top"][k] + data["height"][k] / 2.0
+            j = bisect.bisect_right(starts, cy) - 1
+            if j < 0:
+                continue
+            idx, c, y = batch[j]
+            if cy > y + c.shape[0] + _BATCH_GAP / 2:
+                continue
+            words[idx].append(((data["block_num"][k], data["par_num"][k], data["line_num"][k],
+                                data["left"][k]), txt))
+        for idx, ws in words.items():
+            out[idx] = " ".join(t for _, t in sorted(ws))
+    return out
+
+def detect_tables_csv(image: np.ndarray, batched: bool = True, lang: str = "vie+eng") -> List[List[List[str]]]:
     """
     Heuristic cho bảng có đường kẻ (bordered tables):
     - Tìm line ngang/dọc bằng morphology
-    - Cắt ô theo lưới -> OCR từng cell -> rows (CSV)
+    - Cắt ô theo lưới -> OCR cell -> rows (CSV)
+      batched=True: OCR toàn bộ cell của trang trong 1 lần gọi tesseract; False: từng cell (cách cũ)
     Trả về: List[table] -> List[row] -> List[cell_text]
     """
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim==3 else image.copy()
+    # image có thể là gray/nhị phân 1 kênh (đường Tesseract) hoặc BGR; cell cắt ra giữ nguyên số kênh
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim==3 else image
     gray = cv2.GaussianBlur(gray, (3,3), 0)
     bw = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
                                cv2.THRESH_BINARY_INV, 15, 10)
@@ -36,7 +102,20 @@ def detect_tables_csv(image: np.ndarray) -> List[List[List[str]]]:
     table_mask = cv2.add(h_lines, v_lines)
     contours, _ = cv2.findContours(table_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    tables = []
+    # tìm ranh giới cell từ peaks (nhóm liên tiếp)
+    def split_bound(idxs):
+        bounds=[]
+        start=idxs[0]
+        for i in range(1,len(idxs)):
+            if idxs[i]!=idxs[i-1]+1:
+                bounds.append((start, idxs[i-1]))
+                start=idxs[i]
+        bounds.append((start, idxs[-1]))
+        # lấy tâm các line làm ranh giới
+        return [int((a+b)/2) for a,b in bounds]
+
+    grids = []        # mỗi bảng: (n_rows, n_cols)
+    cell_imgs = []    # toàn bộ cell của trang, theo thứ tự bảng → hàng → cột
     for cnt in contours:
         x,y,w,h = cv2.boundingRect(cnt)
         if w*h < 5000:  # bỏ nhiễu nhỏ
@@ -55,37 +134,27 @@ def detect_tables_csv(image: np.ndarray) -> List[List[List[str]]]:
         if len(cols)<2 or len(rows)<2: 
             continue
 
-        # tìm ranh giới cell từ peaks (nhóm liên tiếp)
-        def split_bound(idxs):
-            bounds=[]
-            start=idxs[0]
-            for i in range(1,len(idxs)):
-                if idxs[i]!=idxs[i-1]+1:
-                    bounds.append((start, idxs[i-1]))
-                    start=idxs[i]
-            bounds.append((start, idxs[-1]))
-            # lấy tâm các line làm ranh giới
-            return [int((a+b)/2) for a,b in bounds]
-
         col_bounds = split_bound(cols)
         row_bounds = split_bound(rows)
 
         # dựng grid (cell bằng khoảng giữa 2 đường)
-        cells = []
         for r in range(len(row_bounds)-1):
-            row_cells=[]
             y0 = row_bounds[r]
             y1 = row_bounds[r+1]
             for c in range(len(col_bounds)-1):
                 x0 = col_bounds[c]
                 x1 = col_bounds[c+1]
-                cell = roi[y0:y1, x0:x1]
-                text = pytesseract.image_to_string(
-                    cell, lang="vie+eng",
-                    config="--oem 1 --psm 7 -c preserve_interword_spaces=1"
-                )
-                row_cells.append(text.strip())
-            cells.append(row_cells)
+                cell_imgs.append(roi[y0:y1, x0:x1])
+        grids.append((len(row_bounds)-1, len(col_bounds)-1))
+
+    texts = (_ocr_cells_batched if batched else _ocr_cells_per_cell)(cell_imgs, lang)
+
+    tables, k = [], 0
+    for n_rows, n_cols in grids:
+        cells = []
+        for _ in range(n_rows):
+            cells.append(texts[k:k+n_cols])
+            k += n_cols
         tables.append(cells)
     return tables
 
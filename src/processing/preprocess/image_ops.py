@@ -1,33 +1,119 @@
 # src/processing/preprocess/image_ops.py
 import cv2
 import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import os, platform
-from typing import List, Optional
+import os, platform, time
+from typing import Iterable, Iterator, List, Optional, Tuple
 from PIL import Image
-from paddle import crop
-from pdf2image import convert_from_path
 import pytesseract
 import tempfile, subprocess, shutil, os
 
-def _osd_angle_deg(bgr):
+OSD_MAX_SIDE = 1800          # OSD chạy trên ảnh thu nhỏ (~150 dpi) — đủ để đoán hướng, rẻ hơn nhiều
+_OSD_MIN_CONF = 1.0          # "Orientation confidence" dưới ngưỡng → coi như không chắc, giữ nguyên
+
+
+def _osd_angle_deg(bgr, max_side: int = OSD_MAX_SIDE) -> int:
+    """
+    Tesseract OSD trên bản thu nhỏ → góc cần xoay THEO CHIỀU KIM ĐỒNG HỒ để trang đứng thẳng
+    (dòng "Rotate", cùng quy ước _rotate_to_upright / --rotate_pages). Lỗi / không chắc → 0.
+    """
     try:
-        bgr = ensure_3_channels(bgr)
-        h, w = bgr.shape[:2]
+        # OSD đọc được ảnh 1 kênh → không cần nhân ra 3 kênh
+        img = _resize_max_side(bgr, max_side)
+        h, w = img.shape[:2]
         if min(h, w) < 200:  # crop quá nhỏ thì OSD hay sai
             return 0
         osd = pytesseract.image_to_osd(
-            bgr,
+            img,
             config="--psm 0 --oem 1 -c min_characters_to_try=50"
         )
-        for line in osd.splitlines():
-            if "Orientation in degrees" in line:
-                return int(line.split(":")[1].strip())
+        fields = dict(line.split(":", 1) for line in osd.splitlines() if ":" in line)
+        if float(fields.get("Orientation confidence", "0").strip()) < _OSD_MIN_CONF:
+            return 0
+        return int(fields.get("Rotate", "0").strip()) % 360
     except Exception:
         pass
     return 0
 
 
+# ---------- Tự phát hiện hướng trang trên thumbnail ----------
+ORIENT_THUMB_SIDE = 1200     # cạnh dài thumbnail (A4 @300dpi → ~100 dpi, chữ x-height ~6-8 px)
+_ORIENT_AXIS_RATIO = 1.3     # profile theo hàng "nhọn" hơn theo cột ≥ 1.3 lần → dòng chữ nằm ngang
+_ORIENT_ASC_MARGIN = 0.15    # chênh lệch mực trên/dưới thân chữ đủ để phân biệt 0° với 180°
+
+
+def _profile_peakiness(profile: np.ndarray) -> float:
+    m = float(profile.mean())
+    return float(profile.var()) / (m * m) if m > 0 else 0.0
+
+
+def _ascender_score(ink: np.ndarray) -> Tuple[float, int]:
+    """
+    Ảnh mực (1 = chữ) dòng nằm ngang → (score, số dòng). Chữ Latin/tiếng Việt có nhiều nét
+    + dấu phía TRÊN thân chữ (x-height) hơn phía dưới: score > 0 → đứng thẳng, < 0 → lộn ngược.
+    """
+    rows = ink.sum(axis=1).astype(np.float64)
+    on = rows > 0.02 * rows.max() if rows.max() > 0 else rows > 0
+    above = below = 0.0
+    n_lines = 0
+    y, H = 0, len(rows)
+    while y < H:
+        if not on[y]:
+            y += 1
+            continue
+        y1 = y
+        while y1 < H and on[y1]:
+            y1 += 1
+        seg = rows[y:y1]
+        if len(seg) >= 4:
+            core = np.nonzero(seg >= 0.5 * seg.max())[0]
+            above += seg[:core[0]].sum()
+            below += seg[core[-1] + 1:].sum()
+            n_lines += 1
+        y = y1
+    total = above + below
+    return ((above - below) / total if total > 0 else 0.0), n_lines
+
+
+def detect_orientation(img: np.ndarray, thumb_side: int = ORIENT_THUMB_SIDE,
+                       use_osd: bool = True) -> dict:
+    """
+    Đoán hướng trang (0/90/180/270 — góc xoay theo chiều kim đồng hồ để đứng thẳng).
+    1) Thumbnail nhị phân: so độ "nhọn" projection profile hàng vs cột → dòng chữ ngang hay dọc.
+    2) Chiều dọc → xoay thumbnail 90°; so mực trên/dưới thân chữ → phân biệt 2 hướng ngược nhau.
+    Chỉ khi một trong 2 bước không chắc mới gọi OSD (trên ảnh thu nhỏ).
+    Trả về {"deg", "method": "thumbnail"|"osd"|"none"}.
+    """
+    gray = to_gray(img)
+    h, w = gray.shape[:2]
+    scale = min(1.0, thumb_side / float(max(h, w)))
+    small = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))),
+                       interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    row_peak = _profile_peakiness(ink.sum(axis=1))
+    col_peak = _profile_peakiness(ink.sum(axis=0))
+    horizontal = vertical = False
+    if row_peak >= _ORIENT_AXIS_RATIO * col_peak:
+        horizontal = True
+    elif col_peak >= _ORIENT_AXIS_RATIO * row_peak:
+        vertical = True
+
+    if horizontal or vertical:
+        probe = ink if horizontal else cv2.rotate(ink, cv2.ROTATE_90_CLOCKWISE)
+        score, n_lines = _ascender_score(probe)
+        if n_lines >= 3 and abs(score) >= _ORIENT_ASC_MARGIN:
+            upright = score > 0
+            deg = (0 if upright else 180) if horizontal else (90 if upright else 270)
+            return {"deg": deg, "method": "thumbnail"}
+
+    if not use_osd:
+        return {"deg": 0, "method": "none"}
+    return {"deg": _osd_angle_deg(gray), "method": "osd"}
+
+
 # def _osd_angle_deg(bgr):
 #     """
 #     Dùng Tesseract OSD để ước lượng góc xoay của 1 crop.
@@ -49,12 +135,15 @@ def _rotate_to_upright(bgr, deg):
     if deg == 270: return cv2.rotate(bgr, cv2.ROTATE_90_COUNTERCLOCKWISE)
     return bgr
 
-def split_and_upright(bgr, mode: str = "horizontal", force_rotate_180: bool = False):
+def split_and_upright(bgr, mode: str = "horizontal", force_rotate_180: bool = False,
+                      deg: Optional[int] = None):
     """
-    Không chia đôi nữa. Chỉ xoay toàn ảnh (ép 270 độ nếu cần).
+    Không chia đôi nữa. Chỉ xoay toàn ảnh cho đứng thẳng: `deg` nếu truyền vào,
+    không thì tự phát hiện (detect_orientation) thay vì ép cứng 270° như trước.
     """
-    # Nếu muốn bỏ OSD luôn và xoay cứng 270°
-    crop_upright = cv2.rotate(bgr, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    if deg is None:
+        deg = detect_orientation(bgr)["deg"]
+    crop_upright = _rotate_to_upright(bgr, deg)
 
     # Nếu vẫn muốn giữ flag ép 180° (tuỳ chọn)
     if force_rotate_180:
@@ -63,19 +152,31 @@ def split_and_upright(bgr, mode: str = "horizontal", force_rotate_180: bool = Fa
     return [(0, 0, crop_upright)]
 
 
+def to_gray(img: np.ndarray) -> np.ndarray:
+    """ndarray BGR/BGRA/gray → gray uint8 1 kênh (ảnh đã gray thì trả nguyên, không copy)."""
+    if img.ndim == 2:
+        return img
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-def prep_for_tesseract_from_bgr(bgr):
-    """Nhị phân hoá nhẹ cho Tesseract (dùng khi fallback)."""
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+def binarize_for_tesseract(img: np.ndarray) -> np.ndarray:
+    """Nhị phân hoá nhẹ cho Tesseract; nhận BGR hoặc gray, trả về ảnh 1 kênh uint8."""
+    gray = to_gray(img)
     _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
     black_ratio = (th < 128).mean()
     if black_ratio < 0.01:
         th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                                    cv2.THRESH_BINARY, 35, 11)
-    th = cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
     return np.ascontiguousarray(th, dtype=np.uint8)
 
 
+def prep_for_tesseract_from_bgr(bgr):
+    """Nhị phân hoá nhẹ cho Tesseract (dùng khi fallback); trả 3 kênh cho code cũ — nên dùng binarize_for_tesseract."""
+    return cv2.cvtColor(binarize_for_tesseract(bgr), cv2.COLOR_GRAY2BGR)
+
+
 def _resize_max_side(bgr: np.ndarray, max_side: int = 3980) -> np.ndarray:
     h, w = bgr.shape[:2]
     m = max(h, w)
@@ -107,35 +208,246 @@ def _detect_poppler_path() -> str | None:
 
 
 
-def pdf_to_images(pdf_path: str, dpi: int = 300, poppler_path: Optional[str] = None,
-                  limit: Optional[int] = None, output_dir: Optional[str] = None) -> List[Image.Image]:
-    pdf_abs = str(Path(pdf_path).resolve())
-    if not os.path.exists(pdf_abs):
-        raise FileNotFoundError(f"PDF not found: {pdf_abs}")
-
-    # chọn nơi ghi ảnh
-    out_dir = Path(output_dir).resolve() if output_dir else Path.cwd() / "render_tmp"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    prefix = str((out_dir / "page").resolve())   # -> ...\b1-xxxx\render\page-001.png
-
+def _pdftoppm_bin(poppler_path: Optional[str] = None) -> str:
     bin_dir = poppler_path or os.getenv("POPPLER_PATH") or ""
     pdftoppm = shutil.which("pdftoppm", path=bin_dir) or str(Path(bin_dir) / "pdftoppm.exe")
     if not (pdftoppm and os.path.exists(pdftoppm)):
         raise RuntimeError("pdftoppm.exe not found. Pass --poppler_path <...\\bin>")
+    return pdftoppm
 
-    cmd = [pdftoppm, "-r", str(dpi), "-png"]
-    if limit and limit > 0:
-        cmd += ["-f", "1", "-l", str(limit)]     # 👈 chỉ render từ 1..limit
-    cmd += [pdf_abs, prefix]
 
-    print(f"[DEBUG:image_ops] run: {' '.join(cmd)}")
+def pdf_page_count(pdf_path: str, poppler_path: Optional[str] = None) -> int:
+    """Số trang của PDF: ưu tiên PyMuPDF, không có thì hỏi pdfinfo (poppler)."""
+    try:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except ImportError:
+        pass
+    bin_dir = poppler_path or os.getenv("POPPLER_PATH") or ""
+    pdfinfo = shutil.which("pdfinfo", path=bin_dir) or str(Path(bin_dir) / "pdfinfo.exe")
+    out = subprocess.run([pdfinfo, pdf_path], check=True, timeout=60,
+                         capture_output=True, text=True, errors="ignore").stdout
+    for line in out.splitlines():
+        if line.startswith("Pages:"):
+            return int(line.split(":", 1)[1].strip())
+    return 0
+
+
+RENDER_BACKENDS = ("pdftoppm", "fitz")
+
+
+RENDER_FORMATS = ("pnm", "png")
+
+
+def read_pnm(path: str, writable: bool = False) -> np.ndarray:
+    """
+    Mở file PGM (P5) / PPM (P6) 8-bit bằng np.memmap → ndarray HxW / HxWx3 (RGB) zero-copy,
+    dữ liệu nằm ở page cache của OS thay vì bị decode + copy vào RAM của process.
+    """
+    with open(path, "rb") as f:
+        head = f.read(512)
+    magic = head[:2]
+    if magic not in (b"P5", b"P6"):
+        raise ValueError(f"Not a binary PGM/PPM file: {path}")
+    vals, pos = [], 2
+    while len(vals) < 3:
+        while head[pos:pos + 1].isspace():
+            pos += 1
+        if head[pos:pos + 1] == b"#":      # comment tới hết dòng
+            pos = head.index(b"\n", pos) + 1
+            continue
+        start = pos
+        while head[pos:pos + 1].isdigit():
+            pos += 1
+        if start == pos:
+            raise ValueError(f"Bad PNM header: {path}")
+        vals.append(int(head[start:pos]))
+    pos += 1   # đúng 1 ký tự trắng sau maxval rồi tới dữ liệu
+    w, h, maxval = vals
+    if maxval > 255:
+        raise ValueError(f"16-bit PNM not supported: {path}")
+    shape = (h, w) if magic == b"P5" else (h, w, 3)
+    mm = np.memmap(path, dtype=np.uint8, mode="r+" if writable else "r", offset=pos, shape=shape)
+    return mm.view(np.ndarray)   # ndarray thường (pickle/cv2 như mọi ảnh khác), vẫn giữ mmap qua .base
+
+
+def render_page(pdf_path: str, page_idx: int, dpi: int = 300, poppler_path: Optional[str] = None,
+                output_dir: Optional[str] = None, color: str = "bgr", fmt: str = "pnm") -> np.ndarray:
+    """
+    Render đúng 1 trang (page_idx 0-based) bằng pdftoppm -f/-l -singlefile → ndarray BGR/gray.
+    fmt="pnm": PGM/PPM không nén, mở bằng memmap (không tốn zlib cả lúc ghi lẫn lúc đọc);
+    fmt="png": như cũ, decode bằng cv2.imdecode.
+    """
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"Unknown render format: {fmt}")
+    pdf_abs = str(Path(pdf_path).resolve())
+    out_dir = Path(output_dir).resolve() if output_dir else Path.cwd() / "render_tmp"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    page_no = page_idx + 1
+    prefix = str((out_dir / f"page-{page_no:03d}").resolve())   # -> ...\render\page-001.png / .ppm / .pgm
+
+    cmd = [_pdftoppm_bin(poppler_path), "-r", str(dpi)]
+    if fmt == "png":
+        cmd.append("-png")
+    cmd += ["-f", str(page_no), "-l", str(page_no), "-singlefile"]
+    if color == "gray":
+        cmd.append("-gray")
+    cmd += [pdf_abs, prefix]
     subprocess.run(cmd, check=True, timeout=180)
+    if fmt == "pnm":
+        if color == "gray":
+            return read_pnm(prefix + ".pgm")
+        # RGB → BGR ngay trên vùng map của file tạm (không cấp phát ảnh mới)
+        arr = read_pnm(prefix + ".ppm", writable=True)
+        cv2.cvtColor(arr, cv2.COLOR_RGB2BGR, dst=arr)
+        return arr
+    # decode thẳng ra BGR/gray (bỏ PIL + np.array + cvtColor); np.fromfile để chịu được path Unicode trên Windows
+    flag = cv2.IMREAD_GRAYSCALE if color == "gray" else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.fromfile(prefix + ".png", dtype=np.uint8), flag)
+
+
+def _rendered_path(output_dir: str, page_idx: int, color: str, fmt: str) -> Path:
+    ext = "png" if fmt == "png" else ("pgm" if color == "gray" else "ppm")
+    return Path(output_dir).resolve() / f"page-{page_idx + 1:03d}.{ext}"
 
-    files = sorted(out_dir.glob("page-*.png"))
-    if limit:
-        files = files[:limit]
-    pages = [Image.open(f).convert("RGB") for f in files]
-    print(f"[DEBUG:image_ops] rendered {len(pages)} page(s) -> {out_dir}")
+
+def _discard(path: Path):
+    # Trang đã giao cho consumer: xoá file tạm ngay (Linux: mapping vẫn sống tới khi array được giải phóng;
+    # Windows không xoá được file đang map → để cho bước dọn thư mục scratch cuối lần chạy)
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+class _PixmapArray(np.ndarray):
+    """ndarray nhìn thẳng vào Pixmap.samples; giữ tham chiếu `_pix` để buffer không bị giải phóng."""
+    _pix = None
+
+
+def pixmap_to_array(pix, color: str = "bgr") -> np.ndarray:
+    """
+    Pixmap (không alpha) → ndarray HxW (gray) hoặc HxWx3 (BGR), không qua PNG.
+    Gray: view zero-copy. BGR: đổi kênh RGB→BGR ngay trên buffer của pixmap nếu ghi được.
+    """
+    h, w, n = pix.height, pix.width, pix.n
+    arr = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(h, pix.stride)[:, :w * n]
+    arr = arr.reshape(h, w) if n == 1 else arr.reshape(h, w, n)
+    arr = arr.view(_PixmapArray)
+    arr._pix = pix
+    if n == 1:
+        return arr if color == "gray" else cv2.cvtColor(arr, cv2.COLOR_GRAY2BGR)
+    if color == "gray":
+        return cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
+    if arr.flags.writeable:
+        cv2.cvtColor(arr, cv2.COLOR_RGB2BGR, dst=arr)
+        return arr
+    return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+
+
+def render_page_fitz(page, dpi: int = 300, color: str = "bgr") -> np.ndarray:
+    """Render 1 trang PyMuPDF (fitz.Page) → ndarray, pixmap đúng colorspace để khỏi phải convert."""
+    import fitz  # PyMuPDF
+    cs = fitz.csGRAY if color == "gray" else fitz.csRGB
+    pix = page.get_pixmap(dpi=dpi, colorspace=cs, alpha=False)
+    return pixmap_to_array(pix, color=color)
+
+
+def iter_fitz_page_images(doc, dpi: int = 300, pages: Optional[Iterable[int]] = None,
+                          color: str = "bgr") -> Iterator[Tuple[int, np.ndarray]]:
+    """Như iter_pdf_images nhưng render trong process bằng PyMuPDF (doc đã mở). Không prefetch: fitz không thread-safe."""
+    for idx in (pages if pages is not None else range(len(doc))):
+        img = render_page_fitz(doc.load_page(idx), dpi=dpi, color=color)
+        yield idx, img
+        del img
+
+
+def iter_pdf_images(pdf_path: str, dpi: int = 300, poppler_path: Optional[str] = None,
+                    pages: Optional[Iterable[int]] = None, limit: Optional[int] = None,
+                    output_dir: Optional[str] = None, prefetch: int = 2,
+                    backend: str = "pdftoppm", color: str = "bgr",
+                    fmt: str = "pnm") -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Render + yield (page_idx, ndarray BGR/gray) lần lượt từng trang.
+    backend="pdftoppm": chỉ tối đa `prefetch` trang được render trước (thread nền) → RAM không tăng theo số trang.
+      fmt="pnm": file PGM/PPM tạm, đọc qua memmap và bị xoá ngay sau khi trang được lấy đi;
+      không truyền output_dir → dùng thư mục scratch riêng, tự dọn khi generator kết thúc/đóng.
+    backend="fitz": render trong process bằng PyMuPDF, pixmap → numpy không qua PNG.
+    """
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {backend}")
+    pdf_abs = str(Path(pdf_path).resolve())
+    if not os.path.exists(pdf_abs):
+        raise FileNotFoundError(f"PDF not found: {pdf_abs}")
+
+    if pages is None:
+        n = pdf_page_count(pdf_abs, poppler_path)
+        if limit and limit > 0:
+            n = min(n, limit)
+        pages = range(n)
+
+    if backend == "fitz":
+        print(f"[DEBUG:image_ops] stream render backend=fitz dpi={dpi}")
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_abs) as doc:
+            yield from iter_fitz_page_images(doc, dpi=dpi, pages=pages, color=color)
+        return
+
+    scratch = None
+    if output_dir is None and fmt == "pnm":
+        scratch = output_dir = tempfile.mkdtemp(prefix="pdf-render-")
+    print(f"[DEBUG:image_ops] stream render backend={backend} fmt={fmt} dpi={dpi} prefetch={prefetch} "
+          f"-> {output_dir or 'render_tmp'}")
+
+    def _render(idx):
+        return render_page(pdf_abs, idx, dpi, poppler_path, output_dir, color, fmt)
+
+    def _done(idx):
+        if fmt == "pnm":
+            _discard(_rendered_path(output_dir, idx, color, fmt))
+
+    try:
+        if prefetch <= 0:
+            for idx in pages:
+                img = _render(idx)
+                yield idx, img
+                del img
+                _done(idx)
+            return
+
+        todo = iter(pages)
+        inflight = deque()
+        with ThreadPoolExecutor(max_workers=prefetch) as ex:
+            try:
+                for idx in todo:
+                    inflight.append((idx, ex.submit(_render, idx)))
+                    if len(inflight) >= prefetch:
+                        break
+                while inflight:
+                    idx, fut = inflight.popleft()
+                    img = fut.result()
+                    nxt = next(todo, None)
+                    if nxt is not None:
+                        inflight.append((nxt, ex.submit(_render, nxt)))
+                    yield idx, img
+                    del img
+                    _done(idx)
+            finally:
+                for _, fut in inflight:
+                    fut.cancel()
+    finally:
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def pdf_to_images(pdf_path: str, dpi: int = 300, poppler_path: Optional[str] = None,
+                  limit: Optional[int] = None, output_dir: Optional[str] = None) -> List[Image.Image]:
+    """Bản cũ: trả về list toàn bộ trang PIL RGB (tốn RAM với PDF dài) — nên dùng iter_pdf_images."""
+    pages = [Image.fromarray(cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB))
+             for _, bgr in iter_pdf_images(pdf_path, dpi=dpi, poppler_path=poppler_path,
+                                           limit=limit, output_dir=output_dir)]
+    print(f"[DEBUG:image_ops] rendered {len(pages)} page(s) -> {output_dir or 'render_tmp'}")
     return pages
 
 def ensure_3_channels(img: np.ndarray) -> np.ndarray:
@@ -148,33 +460,194 @@ def ensure_3_channels(img: np.ndarray) -> np.ndarray:
         img = img.astype(np.uint8)
     return img
 
-def preprocess_image(pil_img, mode: str = "paddle") -> np.ndarray:
-    bgr = cv2.cvtColor(np.array(pil_img), cv2.COLOR_RGB2BGR)
-    bgr = cv2.fastNlMeansDenoisingColored(bgr, None, 3, 3, 7, 21)
+# ---------- Tiền xử lý thích ứng: đo trước trên ảnh nhỏ, chỉ chạy bước cần thiết ----------
+ANALYSIS_MAX_SIDE = 1024     # ảnh thu nhỏ dùng để ước lượng nhiễu / tương phản
+NOISE_SKIP_SIGMA = 2.0       # sigma < ngưỡng này: scan sạch → bỏ denoise
+NOISE_REDUCED_SIGMA = 8.0    # sigma >= ngưỡng này: nhiễu nặng → denoise ở độ phân giải 1/2
+LOW_CONTRAST = 96            # p98 - p2 < ngưỡng → tăng tương phản (CLAHE)
 
-    # Deskew ước lượng trên Otsu, sau đó áp lên BGR
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-    coords = np.column_stack(np.where(th < 255))
-    if coords.size >= 100:
-        angle = cv2.minAreaRect(coords)[-1]
-        angle = -(90 + angle) if angle < -45 else -angle
-        h, w = gray.shape[:2]
-        M = cv2.getRotationMatrix2D((w//2, h//2), angle, 1.0)
-        bgr = cv2.warpAffine(bgr, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+# Laplacian 3x3 của Immerkær: triệt tiêu vùng phẳng/dốc đều, chỉ còn nhiễu (var = 36·sigma²)
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
 
-    # Resize tránh >4000
-    bgr = _resize_max_side(bgr, 3980)
 
-    if mode == "paddle":
-        return np.ascontiguousarray(bgr, dtype=np.uint8)
+def _to_array(img, gray: bool) -> np.ndarray:
+    """PIL/ndarray → ndarray uint8: 1 kênh nếu gray, ngược lại BGR 3 kênh."""
+    if not isinstance(img, np.ndarray):
+        img = np.array(img.convert("L" if gray else "RGB"))
+        return img if gray else cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    if gray:
+        return to_gray(img)
+    return ensure_3_channels(img)
 
-    # Tesseract: nhị phân / contrast cao
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY+cv2.THRESH_OTSU)
-    black_ratio = (th < 128).mean()
-    if black_ratio < 0.01:
-        th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 35, 11)
-    th = cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
-    return np.ascontiguousarray(th, dtype=np.uint8)
+
+def estimate_noise_contrast(gray: np.ndarray, max_side: int = ANALYSIS_MAX_SIDE) -> Tuple[float, float]:
+    """
+    (sigma nhiễu, tương phản p98-p2) trên bản thu nhỏ của ảnh xám.
+    Thu nhỏ kiểu lấy mẫu (INTER_NEAREST) để giữ nguyên thống kê nhiễu từng pixel;
+    dùng median |Laplacian| nên nét chữ (thiểu số pixel) không làm lệch ước lượng.
+    """
+    h, w = gray.shape[:2]
+    step = max(1, int(np.ceil(max(h, w) / float(max_side))))
+    small = gray[::step, ::step]
+    conv = cv2.filter2D(small.astype(np.float32), -1, _NOISE_KERNEL)[1:-1, 1:-1]
+    sigma = float(np.median(np.abs(conv))) / (0.6745 * 6.0) if conv.size else 0.0
+    p2, p98 = np.percentile(small, (2, 98)) if small.size else (0, 255)
+    return sigma, float(p98 - p2)
+
+
+def _denoise_plan(sigma: float) -> str:
+    if sigma < NOISE_SKIP_SIGMA:
+        return "skip"
+    if sigma < NOISE_REDUCED_SIGMA:
+        return "gray"
+    return "reduced"
+
+
+def _denoise(img: np.ndarray, h: float) -> np.ndarray:
+    if img.ndim == 2:
+        return cv2.fastNlMeansDenoising(img, None, h, 7, 21)
+    # Ảnh màu: chỉ lọc kênh sáng (Y) — ~1/3 chi phí bản màu, chữ nằm ở Y nên chất lượng OCR như nhau
+    ycc = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
+    ycc[..., 0] = cv2.fastNlMeansDenoising(np.ascontiguousarray(ycc[..., 0]), None, h, 7, 21)
+    return cv2.cvtColor(ycc, cv2.COLOR_YCrCb2BGR)
+
+
+def _denoise_reduced(img: np.ndarray, h: float) -> np.ndarray:
+    # Nhiễu nặng: lọc ở 1/2 độ phân giải (~1/4 chi phí) rồi phóng lại kích thước cũ
+    H, W = img.shape[:2]
+    half = cv2.resize(img, (W // 2, H // 2), interpolation=cv2.INTER_AREA)
+    if half.ndim == 2:
+        half = cv2.fastNlMeansDenoising(half, None, h, 7, 21)
+    else:
+        half = cv2.fastNlMeansDenoisingColored(half, None, h, h, 7, 21)
+    return cv2.resize(half, (W, H), interpolation=cv2.INTER_CUBIC)
+
+
+def _clahe(img: np.ndarray) -> np.ndarray:
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    if img.ndim == 2:
+        return clahe.apply(img)
+    ycc = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
+    ycc[..., 0] = clahe.apply(np.ascontiguousarray(ycc[..., 0]))
+    return cv2.cvtColor(ycc, cv2.COLOR_YCrCb2BGR)
+
+
+# ---------- Deskew trên thumbnail (projection profile) ----------
+DESKEW_MAX_SIDE = 1000       # cạnh dài thumbnail tối đa dùng để ước lượng góc (thu nhỏ theo hệ số nguyên)
+DESKEW_MAX_DEG = 10.0        # chỉ tìm trong ±10° (xoay 90/180/270 do bước upright lo)
+DESKEW_MIN_DEG = 0.2         # nhỏ hơn → coi như thẳng, không warp
+DESKEW_STEPS = (1.0, 0.2, 0.05)   # coarse-to-fine: mỗi bước dò ±bước trước quanh đỉnh (~41 góc thay vì ~62)
+_DESKEW_MAX_POINTS = 20_000
+
+
+def _profile_score(xs: np.ndarray, ys: np.ndarray, angles: np.ndarray) -> np.ndarray:
+    # Chiếu điểm mực lên trục y sau khi xoay từng góc; dòng chữ thẳng ↔ histogram "nhọn" (tổng bình phương lớn).
+    # Mọi góc trong 1 lượt: mỗi góc lệch sang 1 dải bin riêng → 1 lần bincount cho cả ma trận (góc × điểm)
+    a = np.deg2rad(angles).astype(np.float32)[:, None]
+    proj = np.rint(ys * np.cos(a) - xs * np.sin(a)).astype(np.int32)
+    proj -= proj.min(axis=1, keepdims=True)
+    span = int(proj.max()) + 1
+    proj += (np.arange(len(angles), dtype=np.int32) * span)[:, None]
+    hist = np.bincount(proj.ravel(), minlength=span * len(angles)).reshape(len(angles), span).astype(np.float64)
+    return np.einsum("ij,ij->i", hist, hist)
+
+
+def estimate_skew_angle(gray: np.ndarray, max_side: int = DESKEW_MAX_SIDE,
+                        max_deg: float = DESKEW_MAX_DEG) -> float:
+    """
+    Góc nghiêng (độ, cùng quy ước cv2.getRotationMatrix2D) ước lượng bằng projection profile
+    trên thumbnail nhị phân: dò coarse-to-fine theo DESKEW_STEPS quanh đỉnh.
+    Thumbnail thu nhỏ theo hệ số nguyên (INTER_AREA nhánh nhanh của OpenCV, ~5x nhanh hơn tỉ lệ lẻ).
+    """
+    h, w = gray.shape[:2]
+    k = max(1, int(np.ceil(max(h, w) / float(max_side))))
+    if k > 1:
+        hk, wk = h - h % k, w - w % k
+        small = cv2.resize(gray[:hk, :wk], (wk // k, hk // k), interpolation=cv2.INTER_AREA)
+    else:
+        small = gray
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    pts = cv2.findNonZero(ink)
+    if pts is None or len(pts) < 100:
+        return 0.0
+    pts = pts.reshape(-1, 2)
+    if len(pts) > _DESKEW_MAX_POINTS:
+        pts = pts[::int(np.ceil(len(pts) / _DESKEW_MAX_POINTS))]
+    # Rung ±0.5 px (seed cố định): điểm nằm trên lưới pixel nên góc 0° luôn "nhọn" giả tạo trên thumbnail nhỏ
+    jitter = np.random.default_rng(0).random(pts.shape, dtype=np.float32) - 0.5
+    xs = pts[:, 0] + jitter[:, 0] - small.shape[1] / 2.0
+    ys = pts[:, 1] + jitter[:, 1] - small.shape[0] / 2.0
+
+    best, half = 0.0, max_deg
+    for st in DESKEW_STEPS:
+        angles = np.arange(best - half, best + half + 1e-6, st)
+        best = float(angles[int(np.argmax(_profile_score(xs, ys, angles)))])
+        half = st
+    return best
+
+
+def deskew(img: np.ndarray, min_deg: float = DESKEW_MIN_DEG) -> Tuple[np.ndarray, float]:
+    """Xoay thẳng ảnh (BGR hoặc gray); trả về (ảnh, góc). Góc < min_deg → trả nguyên ảnh, không copy."""
+    angle = estimate_skew_angle(to_gray(img))
+    if abs(angle) < min_deg:
+        return img, angle
+    h, w = img.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE), angle
+
+
+def preprocess_image(img, mode: str = "paddle", info: Optional[dict] = None,
+                     gray: bool = False, timings: Optional[dict] = None) -> np.ndarray:
+    """
+    Tiền xử lý 1 trang (ndarray BGR/gray hoặc PIL) cho OCR.
+    Ước lượng nhiễu/tương phản trên ảnh thu nhỏ rồi mới chọn bước: bỏ denoise,
+    denoise kênh sáng/xám, hoặc denoise ở độ phân giải thấp.
+    mode="tesseract" (hoặc gray=True) xử lý 1 kênh từ đầu tới cuối; gray=True thì trả về
+    ảnh 1 kênh (engine có accepts_gray), ngược lại trả 3 kênh như cũ.
+    `info` (nếu truyền) nhận các quyết định (tất định, ghi vào page meta);
+    "scale" = tỉ lệ resize (bbox OCR trên ảnh trả về chia cho scale để về toạ độ trang).
+    `timings` (nếu truyền) được cộng thêm thời gian từng bước (ms) — số đo của lần chạy, không vào page meta.
+    """
+    info = info if info is not None else {}
+    steps = timings if timings is not None else {}
+
+    def _tick(name, t0):
+        steps[name] = round(steps.get(name, 0.0) + (time.perf_counter() - t0) * 1000, 1)
+        return time.perf_counter()
+
+    t = time.perf_counter()
+    work = _to_array(img, gray=(gray or mode != "paddle"))
+    sigma, contrast = estimate_noise_contrast(to_gray(work))
+    plan = _denoise_plan(sigma)
+    info.update(noise_sigma=round(sigma, 2), contrast=round(contrast, 1), denoise=plan)
+    t = _tick("analyze", t)
+
+    strength = float(min(15.0, max(3.0, round(sigma))))
+    if plan != "skip":
+        work = _denoise(work, strength) if plan == "gray" else _denoise_reduced(work, strength)
+        t = _tick("denoise", t)
+
+    if contrast < LOW_CONTRAST:
+        work = _clahe(work)
+        info["clahe"] = True
+        t = _tick("contrast", t)
+
+    # Deskew: ước lượng góc trên thumbnail, xoay ảnh gốc 1 lần (bỏ qua nếu góc không đáng kể)
+    work, angle = deskew(work)
+    info["skew_deg"] = round(angle, 2)
+    t = _tick("deskew", t)
+
+    # Resize tránh >4000
+    h0 = work.shape[0]
+    work = _resize_max_side(work, 3980)
+    info["scale"] = round(work.shape[0] / float(h0), 6)
+    t = _tick("resize", t)
+
+    if mode != "paddle":
+        # Tesseract: nhị phân / contrast cao
+        work = binarize_for_tesseract(work)
+        t = _tick("binarize", t)
+    if not gray:
+        work = ensure_3_channels(work)
+    return np.ascontiguousarray(work, dtype=np.uint8)
 
@@ -0,0 +1,239 @@
+# src/processing/preprocess/ingest_queue.py
+"""
+Batch OCR cho cả cây thư mục (vd data/raw/<domain>/<page>/ do crawler tải về).
+
+Hàng đợi lưu bền trong SQLite (processed_dir/queue.sqlite): mỗi PDF một dòng với trạng thái
+pending / running / done / skipped / failed. Chạy bị ngắt giữa chừng → lần sau các job
+"running" được trả về "pending" và chạy tiếp từ chỗ dừng.
+
+1 PDF làm chết process con (crash/OOM → BrokenProcessPool) không kéo sập cả batch: pool được dựng
+lại, các job đang chạy lúc đó được chạy lại lần lượt từng job một để tìm đúng thủ phạm; job đã
+chạy >= max_attempts lần thì đánh dấu failed vĩnh viễn (kể cả khi resume). Worker còn sống bị giết và
+chờ thoát hẳn trước khi chạy lại. Pool --workers bên trong 1 tài liệu sập chỉ là lỗi thường của tài liệu đó
+(process_document bọc thành PageWorkerCrashed).
+"""
+import copy
+import sqlite3
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+QUEUE_NAME = "queue.sqlite"
+DEFAULT_MAX_ATTEMPTS = 3
+_CRASH_ERROR = "worker process crashed (BrokenProcessPool: segfault/OOM?)"
+
+
+def discover_pdfs(root: str) -> List[Path]:
+    return sorted(p for p in Path(root).rglob("*") if p.is_file() and p.suffix.lower() == ".pdf")
+
+
+class IngestQueue:
+    def __init__(self, processed_dir: str):
+        Path(processed_dir).mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(Path(processed_dir) / QUEUE_NAME), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                path        TEXT PRIMARY KEY,
+                size        INTEGER,
+                mtime_ns    INTEGER,
+                status      TEXT NOT NULL DEFAULT 'pending',
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                doc_id      TEXT,
+                error       TEXT,
+                seconds     REAL,
+                started_at  TEXT,
+                finished_at TEXT
+            )""")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, paths: Iterable[Path]) -> int:
+        """Thêm PDF mới; PDF đã xong nhưng file bị thay đổi (size/mtime) → xếp hàng lại."""
+        rows = []
+        for p in paths:
+            st = p.stat()
+            rows.append((str(p.resolve()), st.st_size, st.st_mtime_ns))
+        added = self.conn.executemany("INSERT OR IGNORE INTO jobs(path, size, mtime_ns) VALUES (?,?,?)", rows).rowcount
+        self.conn.executemany(
+            "UPDATE jobs SET status='pending', size=?, mtime_ns=? "
+            "WHERE path=? AND status IN ('done','skipped') AND (size IS NOT ? OR mtime_ns IS NOT ?)",
+            [(size, mtime, path, size, mtime) for path, size, mtime in rows])
+        self.conn.commit()
+        return added
+
+    def recover(self, retry_failed: bool = False, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        """
+        Job đang 'running' từ lần chạy bị ngắt → 'pending' (và 'failed' nếu retry_failed).
+        Job 'running' đã chạy >= max_attempts lần (nhiều khả năng chính nó làm sập lần chạy trước) → 'failed'.
+        """
+        self.conn.execute("UPDATE jobs SET status='failed', error=? WHERE status='running' AND attempts>=?",
+                          (f"gave up after {max_attempts} attempt(s): {_CRASH_ERROR}", max_attempts))
+        n = self.conn.execute("UPDATE jobs SET status='pending' WHERE status='running'").rowcount
+        if retry_failed:
+            n += self.conn.execute("UPDATE jobs SET status='pending', attempts=0 WHERE status='failed'").rowcount
+        self.conn.commit()
+        return n
+
+    def pending(self) -> List[str]:
+        return [r[0] for r in self.conn.execute("SELECT path FROM jobs WHERE status='pending' ORDER BY path")]
+
+    def mark_running(self, path: str):
+        self.conn.execute("UPDATE jobs SET status='running', attempts=attempts+1, started_at=?, error=NULL "
+                          "WHERE path=?", (datetime.now().isoformat(timespec="seconds"), path))
+        self.conn.commit()
+
+    def attempts(self, path: str) -> int:
+        row = self.conn.execute("SELECT attempts FROM jobs WHERE path=?", (path,)).fetchone()
+        return row[0] if row else 0
+
+    def mark_pending(self, path: str):
+        self.conn.execute("UPDATE jobs SET status='pending' WHERE path=?", (path,))
+        self.conn.commit()
+
+    def mark_finished(self, path: str, status: str, seconds: float, doc_id: str = None, error: str = None):
+        self.conn.execute("UPDATE jobs SET status=?, doc_id=?, error=?, seconds=?, finished_at=? WHERE path=?",
+                          (status, doc_id, error, round(seconds, 3),
+                           datetime.now().isoformat(timespec="seconds"), path))
+        self.conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def _run_job(path: str, args) -> dict:
+    # chạy trong process con; import muộn để tránh vòng import với pdf_ocr_ingest
+    from .pdf_ocr_ingest import process_document
+    return process_document(Path(path), args)
+
+
+def _pool_broken(ex: ProcessPoolExecutor) -> bool:
+    # BrokenProcessPool từ fut.result() có thể là pool --workers bên trong tài liệu; chỉ tin cờ của chính pool
+    return bool(getattr(ex, "_broken", False))
+
+
+def _kill_pool(ex: ProcessPoolExecutor):
+    """Pool đã sập: giết worker còn sống và chờ chúng thoát hẳn trước khi chạy lại job của chúng
+    (không để 2 process cùng ghi out_dir / manifest / dòng queue của 1 tài liệu)."""
+    procs = list((getattr(ex, "_processes", None) or {}).values())
+    for p in procs:
+        if p.is_alive():
+            p.terminate()
+    ex.shutdown(wait=True, cancel_futures=True)
+    for p in procs:
+        p.join()
+
+
+def _batch_shape(args):
+    """(số tài liệu song song, worker/tài liệu); --workers người dùng đặt được giữ nguyên."""
+    budget = max(1, args.cpu_budget)
+    if args.workers:
+        workers = args.workers
+        jobs = max(1, args.jobs or budget // workers)
+        if jobs * workers > budget:
+            print(f"[WARN] --jobs {jobs} x --workers {workers} vượt --cpu_budget {budget}")
+    else:
+        jobs = max(1, min(args.jobs or max(1, budget // 2), budget))
+        workers = max(1, budget // jobs)   # mỗi tài liệu một phần ngân sách CPU
+    return jobs, workers
+
+
+def run_batch(args) -> int:
+    """Quét args.input_dir, xếp hàng và chạy; trả về exit code (1 nếu còn job lỗi)."""
+    jobs, workers = _batch_shape(args)
+    max_attempts = max(1, getattr(args, "max_attempts", DEFAULT_MAX_ATTEMPTS))
+    doc_args = copy.copy(args)
+    doc_args.input_dir = None
+    doc_args.workers = workers
+
+    queue = IngestQueue(args.processed_dir)
+    found = discover_pdfs(args.input_dir)
+    added = queue.enqueue(found)
+    recovered = queue.recover(retry_failed=args.retry_failed, max_attempts=max_attempts)
+    todo = queue.pending()
+    print(f"[INFO] Batch: {len(found)} PDF(s) found, {added} new, {recovered} resumed, {len(todo)} to run "
+          f"({jobs} doc(s) x {workers} worker(s), cpu_budget={args.cpu_budget})")
+
+    started: Dict[object, tuple] = {}
+    todo = deque(todo)
+    suspects = deque()   # job đang chạy lúc pool sập: chạy lại từng job một cho đến khi rõ thủ phạm
+    ex = ProcessPoolExecutor(max_workers=jobs)
+
+    def _submit(src: deque):
+        path = src.popleft()
+        queue.mark_running(path)
+        try:
+            started[ex.submit(_run_job, path, doc_args)] = (path, time.perf_counter())
+        except BrokenProcessPool:
+            queue.mark_pending(path)
+            src.appendleft(path)
+            raise
+
+    def _fill():
+        if suspects:
+            if not started:
+                _submit(suspects)
+            return
+        while len(started) < jobs and todo:
+            _submit(todo)
+
+    def _finish(fut):
+        path, t0 = started.pop(fut)
+        dt = time.perf_counter() - t0
+        try:
+            res = fut.result()
+            queue.mark_finished(path, res.get("status", "done"), dt, doc_id=res.get("doc_id"))
+            print(f"[BATCH] {res.get('status', 'done')}: {path} ({dt:.1f}s)")
+        except Exception as e:
+            err = "".join(traceback.format_exception_only(type(e), e)).strip()
+            queue.mark_finished(path, "failed", dt, error=err)
+            print(f"[BATCH] failed: {path}: {err}")
+
+    def _on_broken_pool():
+        nonlocal ex
+        # job đã xong trước khi pool sập vẫn giữ kết quả → ghi nhận bình thường
+        for fut in [f for f in started if f.done() and not isinstance(f.exception(), BrokenProcessPool)]:
+            _finish(fut)
+        crashed = list(started.values())
+        started.clear()
+        _kill_pool(ex)
+        ex = ProcessPoolExecutor(max_workers=jobs)
+        for path, t0 in crashed:
+            # chạy 1 mình mà vẫn sập → chắc chắn là thủ phạm; hoặc đã hết số lần thử
+            if len(crashed) == 1 or queue.attempts(path) >= max_attempts:
+                queue.mark_finished(path, "failed", time.perf_counter() - t0, error=_CRASH_ERROR)
+                print(f"[BATCH] failed: {path}: {_CRASH_ERROR}")
+            else:
+                queue.mark_pending(path)
+                suspects.append(path)
+        if len(crashed) > 1:
+            print(f"[WARN] Worker pool crashed with {len(crashed)} job(s) in flight; retrying them one at a time")
+
+    try:
+        while True:
+            try:
+                _fill()
+            except BrokenProcessPool:
+                _on_broken_pool()
+                continue
+            if not started:
+                break
+            done, _ = wait(list(started), return_when=FIRST_COMPLETED)
+            if _pool_broken(ex):
+                _on_broken_pool()
+                continue
+            for fut in done:
+                _finish(fut)
+    finally:
+        ex.shutdown(cancel_futures=True)
+        counts = queue.counts()
+        queue.close()
+        print(f"[INFO] Batch status: {counts}")
+    return 1 if counts.get("failed") else 0
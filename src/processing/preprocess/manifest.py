@@ -0,0 +1,98 @@
+# src/processing/preprocess/manifest.py
+"""
+Manifest các tài liệu đã xử lý (SQLite trong processed_dir):
+doc_id → hash input, options, danh sách file output, thời gian chạy.
+Chạy lại cùng tài liệu + cùng options → bỏ qua gần như tức thì.
+"""
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "manifest.sqlite"
+
+
+def file_md5(path: Path, chunk_size: int = 1 << 20) -> str:
+    """md5 theo từng chunk — không đọc cả file PDF vào RAM."""
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def options_hash(options: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class Manifest:
+    def __init__(self, processed_dir: str):
+        Path(processed_dir).mkdir(parents=True, exist_ok=True)
+        self.path = Path(processed_dir) / MANIFEST_NAME
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id       TEXT PRIMARY KEY,
+                input_path   TEXT NOT NULL,
+                input_hash   TEXT NOT NULL,
+                size         INTEGER,
+                mtime_ns     INTEGER,
+                options      TEXT,
+                options_hash TEXT,
+                outputs      TEXT,
+                timings      TEXT,
+                updated_at   TEXT
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(input_path)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def input_hash(self, pdf: Path) -> str:
+        """Hash input; nếu path + size + mtime khớp lần ghi trước thì dùng lại, khỏi đọc file."""
+        st = pdf.stat()
+        row = self.conn.execute(
+            "SELECT input_hash FROM documents WHERE input_path=? AND size=? AND mtime_ns=?",
+            (str(pdf.resolve()), st.st_size, st.st_mtime_ns)).fetchone()
+        return row[0] if row else file_md5(pdf)
+
+    def lookup(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        cur = self.conn.execute("SELECT * FROM documents WHERE doc_id=?", (doc_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        rec = dict(zip([c[0] for c in cur.description], row))
+        for k in ("options", "outputs", "timings"):
+            rec[k] = json.loads(rec[k]) if rec[k] else None
+        return rec
+
+    def is_up_to_date(self, doc_id: str, input_hash: str, opts_hash: str, out_dir: Path) -> bool:
+        rec = self.lookup(doc_id)
+        if not rec or rec["input_hash"] != input_hash or rec["options_hash"] != opts_hash:
+            return False
+        return all((out_dir / f).exists() for f in (rec["outputs"] or []))
+
+    def record(self, doc_id: str, pdf: Path, input_hash: str, options: Dict[str, Any],
+               outputs: List[str], timings: Dict[str, Any]):
+        st = pdf.stat()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?,?,?,?,?,?,?,?,?,?)",
+            (doc_id, str(pdf.resolve()), input_hash, st.st_size, st.st_mtime_ns,
+             json.dumps(options, sort_keys=True, default=str), options_hash(options),
+             json.dumps(outputs, ensure_ascii=False), json.dumps(timings),
+             datetime.now().isoformat(timespec="seconds")))
+        self.conn.commit()
+
+
+def list_outputs(out_dir: Path, since: float = 0.0, skip_dirs=("render",)) -> List[str]:
+    """
+    Các file output (đường dẫn tương đối) của 1 tài liệu được ghi từ thời điểm `since`
+    (bỏ file cũ của lần chạy trước, vd --limit khác) và bỏ thư mục render tạm.
+    """
+    return sorted(str(p.relative_to(out_dir)).replace("\\", "/") for p in out_dir.rglob("*")
+                  if p.is_file() and p.relative_to(out_dir).parts[0] not in skip_dirs
+                  and p.stat().st_mtime >= since)
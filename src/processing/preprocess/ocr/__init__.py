@@ -1,8 +1,14 @@
 # Export các engine OCR
-from .paddle_engine import PaddleClassicEngine
+# PaddleClassicEngine được import muộn (paddleocr rất nặng) → chạy Tesseract không phải nạp paddle
+from .base import BaseOCREngine, OcrResult
 from .tesseract_engine import TesseractEngine
+from .registry import get_engine, engine_init_stats, engine_accepts_gray
 
-# Giữ alias tên cũ để tương thích nếu nơi khác còn import PaddleEngine
-PaddleEngine = PaddleClassicEngine
+def __getattr__(name):
+    if name in ("PaddleClassicEngine", "PaddleEngine"):
+        from .paddle_engine import PaddleClassicEngine
+        # Giữ alias tên cũ để tương thích nếu nơi khác còn import PaddleEngine
+        return PaddleClassicEngine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ["PaddleClassicEngine", "TesseractEngine", "PaddleEngine"]
+__all__ = ["BaseOCREngine", "OcrResult", "PaddleClassicEngine", "TesseractEngine", "PaddleEngine", "get_engine", "engine_init_stats", "engine_accepts_gray"]
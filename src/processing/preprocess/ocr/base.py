@@ -1,7 +1,14 @@
-from typing import Any, List, Tuple
+from ..page_schema import LINE_ID_KEYS, OcrResult
+
 
 class BaseOCREngine:
     name = "base"
-    def extract(self, image) -> List[Any]:
-        """Return engine-native results (words/lines with bbox, conf)."""
+    # True nếu extract() nhận thẳng ảnh 1 kênh (gray/nhị phân) → pipeline khỏi nhân ra BGR
+    accepts_gray = False
+    # Định dạng output gốc của engine và thang conf của nó (conf / conf_scale → 0..1)
+    output_format = "base"
+    conf_scale = 1.0
+
+    def extract(self, image) -> OcrResult:
+        """OCR 1 ảnh → OcrResult (bbox theo pixel ảnh đầu vào, conf 0..1)."""
         raise NotImplementedError
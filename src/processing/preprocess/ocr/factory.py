@@ -1,6 +1,5 @@
 # src/processing/preprocess/ocr/factory.py
 from typing import Literal
-from .paddle_engine import PaddleClassicEngine
 from .tesseract_engine import TesseractEngine
 
 # def build_engine(name: Literal["paddle","tesseract"], lang: str = "vi"):
@@ -9,14 +8,29 @@ from .tesseract_engine import TesseractEngine
 #     if name == "tesseract":
 #         return TesseractEngine(lang=lang)
 #     raise ValueError(f"Unknown OCR engine: {name}")
-def build_engine(name: str, lang: str = "vie+eng"):
+def normalize_lang(lang: str) -> str:
     # Map ngôn ngữ ngắn → Tesseract lang
     lang = (lang or "").lower()
     if lang in ("vi", "vie", "vi-vn"):
         lang = "vie+eng"
+    return lang
+
+def engine_accepts_gray(name: str) -> bool:
+    """Engine có nhận ảnh 1 kênh không (đọc thuộc tính class, không build engine / không nạp paddleocr)."""
     if name == "auto" or name == "tesseract":
-        return TesseractEngine(lang=lang)
+        return TesseractEngine.accepts_gray
     if name == "paddle":
-        return PaddleClassicEngine(lang=lang)  # giữ nguyên như bạn đang có
+        from .paddle_engine import PaddleClassicEngine
+        return PaddleClassicEngine.accepts_gray
     raise ValueError(f"Unknown OCR engine: {name}")
 
+def build_engine(name: str, lang: str = "vie+eng", **config):
+    """Luôn tạo engine mới. Trong pipeline nên dùng registry.get_engine để tái sử dụng."""
+    lang = normalize_lang(lang)
+    if name == "auto" or name == "tesseract":
+        return TesseractEngine(lang=lang, **config)
+    if name == "paddle":
+        # import muộn: paddleocr rất nặng, chỉ nạp khi thật sự cần
+        from .paddle_engine import PaddleClassicEngine
+        return PaddleClassicEngine(lang=lang, **config)  # giữ nguyên như bạn đang có
+    raise ValueError(f"Unknown OCR engine: {name}")
@@ -2,10 +2,7 @@
 from typing import Any, List
 import numpy as np
 
-try:
-    from paddleocr import PaddleOCR
-except Exception as e:
-    PaddleOCR = None
+from .base import BaseOCREngine, OcrResult
 
 _LANG_FALLBACKS = {
     "vi": ["vi", "latin", "en"],
@@ -13,9 +10,17 @@ _LANG_FALLBACKS = {
     "en": ["en", "latin"],
 }
 
-class PaddleClassicEngine:
+class PaddleClassicEngine(BaseOCREngine):
+    name = "paddle"
+    accepts_gray = False  # detector của Paddle cần 3 kênh
+    output_format = "paddle_classic"   # [[poly 4 điểm, (text, score)], ...]
+    conf_scale = 1.0
+
     def __init__(self, lang: str = "vi"):
-        if PaddleOCR is None:
+        # import ở đây (không ở đầu module) để chỉ nạp paddle khi thật sự dùng engine này
+        try:
+            from paddleocr import PaddleOCR
+        except Exception:
             raise RuntimeError("paddleocr chưa được cài. pip install paddleocr")
         langs = _LANG_FALLBACKS.get(lang, [lang, "latin", "en"])
         last_err = None
@@ -30,10 +35,23 @@ class PaddleClassicEngine:
         if self.ocr is None:
             raise last_err or RuntimeError("Không khởi tạo được PaddleOCR")
 
-    def extract(self, image: np.ndarray) -> List[Any]:
+    def extract(self, image: np.ndarray) -> OcrResult:
         # yêu cầu image uint8, BGR hoặc RGB đều được; paddle tự handle
+        if image.ndim == 2:
+            image = np.repeat(image[:, :, None], 3, axis=2)
         result = self.ocr.ocr(image)
-        # PaddleOCR classic trả list theo batch: lấy phần tử đầu
-        if isinstance(result, list) and result and isinstance(result[0], list):
-            return result[0]
-        return result or []
+        # PaddleOCR classic trả list theo batch: lấy phần tử đầu (None khi trang trống)
+        if isinstance(result, list) and result and (result[0] is None or isinstance(result[0], list)):
+            result = result[0]
+        return self.parse(result or [])
+
+    @classmethod
+    def parse(cls, lines: List[Any]) -> OcrResult:
+        """[[poly, (text, score)], ...] → OcrResult; poly 4 điểm → bbox bằng min/max vector."""
+        if not lines:
+            return OcrResult.empty(cls.name)
+        polys = np.array([ln[0] for ln in lines], dtype=np.float64).reshape(len(lines), -1, 2)
+        bbox = np.concatenate([polys.min(axis=1), polys.max(axis=1)], axis=1)
+        texts = [str(ln[1][0] or "").strip() for ln in lines]
+        conf = np.array([ln[1][1] for ln in lines], dtype=np.float64) / cls.conf_scale
+        return OcrResult(texts, bbox, conf, engine=cls.name)
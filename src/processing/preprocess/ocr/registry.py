@@ -0,0 +1,43 @@
+# src/processing/preprocess/ocr/registry.py
+"""
+Registry engine OCR theo process: mỗi (engine, lang, config) chỉ build 1 lần,
+dùng lại cho mọi trang/tài liệu trong cùng process (kể cả worker của --workers).
+"""
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from .factory import build_engine, engine_accepts_gray, normalize_lang
+
+_ENGINES: Dict[Tuple, Any] = {}
+_INIT_SECONDS: Dict[Tuple, float] = {}
+_LOCK = threading.Lock()
+
+def _key(name: str, lang: str, config: dict) -> Tuple:
+    # "auto" dùng chung instance với "tesseract" (build_engine map giống nhau)
+    name = "tesseract" if name == "auto" else name
+    return (name, normalize_lang(lang), tuple(sorted(config.items())))
+
+def get_engine(name: str, lang: str = "vie+eng", **config):
+    key = _key(name, lang, config)
+    eng = _ENGINES.get(key)
+    if eng is not None:
+        return eng
+    with _LOCK:
+        eng = _ENGINES.get(key)
+        if eng is None:
+            t0 = time.perf_counter()
+            eng = build_engine(key[0], lang=key[1], **config)
+            _INIT_SECONDS[key] = time.perf_counter() - t0
+            _ENGINES[key] = eng
+            print(f"[INFO] OCR engine {key[0]}({key[1]}) initialized in {_INIT_SECONDS[key]:.2f}s")
+    return eng
+
+def engine_init_stats() -> Dict[str, float]:
+    """{"tesseract(vie+eng)": giây khởi tạo, ...} cho các engine đã build trong process này."""
+    return {f"{k[0]}({k[1]})" + (f"{dict(k[2])}" if k[2] else ""): v for k, v in _INIT_SECONDS.items()}
+
+def clear_engines():
+    with _LOCK:
+        _ENGINES.clear()
+        _INIT_SECONDS.clear()
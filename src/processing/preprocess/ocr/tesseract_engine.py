@@ -1,41 +1,44 @@
-from typing import Any, List
+from typing import List
 import numpy as np
 import pytesseract
 from pytesseract import Output
 
+from .base import BaseOCREngine, LINE_ID_KEYS, OcrResult
+
 _LANG_MAP = {"vi": "vie+eng", "en": "eng"}
+# Sử dụng cấu hình tối ưu cho văn bản tiếng Việt
+DEFAULT_CONFIG = "--oem 1 --psm 3 -c preserve_interword_spaces=1"
+_ID_COLUMNS = {"block": "block_num", "par": "par_num", "line": "line_num"}
+
+class TesseractEngine(BaseOCREngine):
+    name = "tesseract"
+    accepts_gray = True   # Tesseract đọc được ảnh gray/nhị phân 1 kênh
+    output_format = "tesseract_data"   # image_to_data(Output.DICT): dict các cột song song
+    conf_scale = 100.0
 
-class TesseractEngine:
-    def __init__(self, lang: str = "vi"):
+    def __init__(self, lang: str = "vi", config: str = DEFAULT_CONFIG):
         self.lang = _LANG_MAP.get(lang, "vie+eng")
+        self.config = config
 
-    def extract(self, image: np.ndarray) -> List[Any]:
-        # Sử dụng cấu hình tối ưu cho văn bản tiếng Việt
-        config = "--oem 1 --psm 3 -c preserve_interword_spaces=1"
+    def extract(self, image: np.ndarray) -> OcrResult:
         data = pytesseract.image_to_data(
             image,
             output_type=Output.DICT,
             lang=self.lang,
-            config=config
+            config=self.config
         )
+        return self.parse(data)
 
-        n = len(data["text"])
-        out: List[dict] = []
-        for i in range(n):
-            txt = (data["text"][i] or "").strip()
-            conf = data["conf"][i]
-            try:
-                conf = float(conf)
-            except:
-                conf = -1.0
-            if conf <= 0 or not txt:
-                continue
-            x, y = int(data["left"][i]), int(data["top"][i])
-            w, h = int(data["width"][i]), int(data["height"][i])
-            out.append({
-                "text": txt,
-                "conf": conf,
-                "bbox": [x, y, x + w, y + h],
-                "engine": "tesseract"
-            })
-        return out
+    @classmethod
+    def parse(cls, data: dict) -> OcrResult:
+        """Output image_to_data đã ở dạng cột → lọc + dựng mảng một lần, không duyệt từng item."""
+        texts: List[str] = [(t or "").strip() for t in data["text"]]
+        conf = np.array(data["conf"], dtype=np.float64)   # pytesseract cũ trả chuỗi "-1"
+        keep = np.flatnonzero((conf > 0) & np.fromiter(map(bool, texts), dtype=bool, count=len(texts)))
+        left, top = np.array(data["left"], dtype=np.float64), np.array(data["top"], dtype=np.float64)
+        bbox = np.stack([left, top, left + np.array(data["width"], dtype=np.float64),
+                         top + np.array(data["height"], dtype=np.float64)], axis=1)
+        # id dòng của Tesseract → dựng lại text theo dòng mà không phải OCR lần 2
+        ids = np.stack([np.array(data[_ID_COLUMNS[k]], dtype=np.int64) for k in LINE_ID_KEYS], axis=1)
+        return OcrResult([texts[k] for k in keep.tolist()], bbox[keep], conf[keep] / cls.conf_scale,
+                         ids[keep], engine=cls.name)
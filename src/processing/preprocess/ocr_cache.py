@@ -0,0 +1,146 @@
+# src/processing/preprocess/ocr_cache.py
+"""
+Cache kết quả OCR theo nội dung trang (content-addressed), lưu trên đĩa.
+
+Key = sha256(nội dung trang PDF + dpi + xoay + tiền xử lý + engine/lang/config), nên chạy lại
+với --norm_loose / --tables / parser khác sẽ bỏ qua cả render lẫn OCR cho trang đã có.
+Mỗi entry là 1 file JSON: {"width", "height", "items": {...}, "meta": ...} — "items" là
+OcrResult.to_dict() (dạng cột, conf 0..1); bảng ("<key>-tables") và hướng trang (kind="orientation",
+chỉ theo hash nội dung) là entry riêng. Vượt giới hạn dung lượng → xoá entry ít dùng nhất (LRU theo mtime).
+
+Tổng dung lượng giữ trong 1 bộ đếm SQLite (cache_dir/cache.sqlite) cộng dồn nguyên tử mỗi lần put,
+dùng chung giữa các process của batch → mở cache không phải quét cả thư mục; chỉ quét khi tạo
+bộ đếm lần đầu và khi evict (lúc đó đồng bộ lại con số thật).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_VERSION = 3   # 2: items là OcrResult dạng cột (conf đã chuẩn hoá); 3: meta không còn thời gian đo
+COUNTER_NAME = "cache.sqlite"
+
+
+def page_content_hash(fitz_doc, page_idx: int, fallback: str = "") -> str:
+    """
+    Hash nội dung 1 trang: content stream + dữ liệu thô các ảnh trang tham chiếu + kích thước/rotation.
+    Không có PyMuPDF → dùng `fallback` (vd md5 cả file) + số trang.
+    """
+    h = hashlib.sha256()
+    if fitz_doc is None:
+        h.update(f"{fallback}:{page_idx}".encode())
+        return h.hexdigest()
+    page = fitz_doc[page_idx]
+    h.update(page.read_contents() or b"")
+    for img in page.get_images(full=True):
+        try:
+            h.update(fitz_doc.xref_stream_raw(img[0]) or b"")
+        except Exception:
+            h.update(str(img).encode())
+    h.update(f"{tuple(page.rect)}:{page.rotation}".encode())
+    return h.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.conn = sqlite3.connect(str(self.dir / COUNTER_NAME), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        row = self.conn.execute("SELECT value FROM counters WHERE name='size'").fetchone()
+        if row is None:   # cache cũ / lần đầu: quét 1 lần rồi lưu
+            self._size = self._scan_size()
+            self.conn.execute("INSERT OR IGNORE INTO counters VALUES ('size', ?)", (self._size,))
+            self.conn.commit()
+        else:
+            self._size = row[0]
+
+    def close(self):
+        self.conn.close()
+
+    def _scan_size(self) -> int:
+        return sum(f.stat().st_size for f in self.dir.glob("*/*.json"))
+
+    def _add_size(self, delta: int):
+        with self.conn:
+            self.conn.execute("UPDATE counters SET value=value+? WHERE name='size'", (delta,))
+            self._size = self.conn.execute("SELECT value FROM counters WHERE name='size'").fetchone()[0]
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        parts["v"] = CACHE_VERSION
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.json"
+
+    def contains(self, key: str, count: bool = True) -> bool:
+        """
+        Kiểm tra nhanh (chỉ stat) để lập kế hoạch render; chưa có → tính là miss.
+        count=False: entry phụ (vd "<key>-tables") không tính vào hits/misses của cache OCR.
+        """
+        p = self._path(key)
+        if p.exists():
+            try:
+                os.utime(p)   # sắp dùng trong lần chạy này → đừng để bị LRU xoá trước
+            except OSError:
+                pass
+            return True
+        self.misses += count
+        return False
+
+    def get(self, key: str, count: bool = True) -> Optional[Dict[str, Any]]:
+        """count=False: entry phụ (vd hướng trang) không tính vào hits/misses của cache OCR."""
+        p = self._path(key)
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(p)   # đánh dấu vừa dùng (LRU)
+        except (OSError, ValueError):
+            self.misses += count
+            return None
+        self.hits += count
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        old = p.stat().st_size if p.exists() else 0
+        tmp = p.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, p)   # ghi nguyên tử: không bao giờ đọc phải entry dở dang
+        self._add_size(p.stat().st_size - old)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # Xoá từ entry cũ nhất tới khi còn ~90% giới hạn
+        files = sorted(self.dir.glob("*/*.json"), key=lambda f: f.stat().st_mtime)
+        target = int(self.max_bytes * 0.9)
+        size = sum(f.stat().st_size for f in files)
+        for f in files:
+            if size <= target:
+                break
+            try:
+                sz = f.stat().st_size
+                f.unlink()
+                size -= sz
+                self.evictions += 1
+            except OSError:
+                pass
+        # đồng bộ lại bộ đếm với số thật (sửa lệch do process khác / file bị xoá tay)
+        with self.conn:
+            self.conn.execute("UPDATE counters SET value=? WHERE name='size'", (size,))
+        self._size = size
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "size_mb": round(self._size / 1024 ** 2, 1)}
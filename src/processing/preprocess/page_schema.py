@@ -1,22 +1,42 @@
-from dataclasses import dataclass, asdict
-from typing import List, Tuple, Optional
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple, Optional
+
+import numpy as np
 
 BBox = Tuple[float, float, float, float]  # x0, y0, x1, y1
 
-@dataclass
+# slots=True: không có __dict__ mỗi object → trang dày (hàng nghìn word box) nhẹ hơn hẳn.
+# to_dict viết tay thay cho asdict (asdict deep-copy đệ quy từng field); output JSON giữ nguyên.
+
+@dataclass(slots=True)
 class Word:
     text: str
     bbox: BBox
     conf: float
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, "bbox": list(self.bbox), "conf": self.conf}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Word":
+        return cls(d["text"], tuple(d["bbox"]), d["conf"])
+
+@dataclass(slots=True)
 class Line:
     text: str
     bbox: BBox
     conf: float
     words: List[Word]
 
-@dataclass
+    def to_dict(self) -> Dict[str, Any]:
+        return {"text": self.text, "bbox": list(self.bbox), "conf": self.conf,
+                "words": [w.to_dict() for w in self.words]}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Line":
+        return cls(d["text"], tuple(d["bbox"]), d["conf"], [Word.from_dict(w) for w in d.get("words") or []])
+
+@dataclass(slots=True)
 class PageText:
     document_id: str
     page_index: int
@@ -26,4 +46,149 @@ class PageText:
     engine: str
     meta: Optional[dict] = None
 
-    def to_dict(self): return asdict(self)
+    def to_dict(self) -> Dict[str, Any]:
+        return {"document_id": self.document_id, "page_index": self.page_index,
+                "width": self.width, "height": self.height,
+                "lines": [l.to_dict() for l in self.lines],
+                "engine": self.engine, "meta": self.meta}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "PageText":
+        return cls(d["document_id"], d["page_index"], d["width"], d["height"],
+                   [Line.from_dict(l) for l in d.get("lines") or []], d.get("engine", ""), d.get("meta"))
+
+
+class PageColumns:
+    """
+    Dạng cột của 1 trang: bbox (n, 4) và conf (n,) là mảng NumPy, text là list — mỗi trang
+    chỉ vài object thay vì n object Line. Lọc/sắp xếp làm bằng phép toán vector.
+    Chỉ giữ cấp dòng (words rỗng); cần cây Line/Word thì gọi to_page() hoặc writer.build_lines.
+    `ids` (tuỳ chọn, (n, 3)): id block/par/line của Tesseract, để gom word thành dòng chính xác.
+    """
+    __slots__ = ("document_id", "page_index", "width", "height", "engine", "meta", "text", "bbox", "conf", "ids")
+
+    def __init__(self, document_id: str, page_index: int, width: int, height: int,
+                 text: List[str], bbox: np.ndarray, conf: np.ndarray,
+                 engine: str = "paddle", meta: Optional[dict] = None, ids: Optional[np.ndarray] = None):
+        self.document_id = document_id
+        self.page_index = page_index
+        self.width = width
+        self.height = height
+        self.engine = engine
+        self.meta = meta
+        self.text = text
+        # float64: giữ nguyên giá trị float Python → JSON giống hệt dạng object
+        self.bbox = np.asarray(bbox, dtype=np.float64).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float64).reshape(-1)
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64).reshape(-1, 3)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def select(self, idx) -> "PageColumns":
+        """Lấy tập con theo mask bool / mảng chỉ số (giữ thứ tự idx)."""
+        idx = np.asarray(idx)
+        if idx.dtype == bool:
+            idx = np.flatnonzero(idx)
+        return PageColumns(self.document_id, self.page_index, self.width, self.height,
+                           [self.text[k] for k in idx.tolist()], self.bbox[idx], self.conf[idx],
+                           self.engine, self.meta, None if self.ids is None else self.ids[idx])
+
+    def filter(self, min_conf: float = 0.0, min_size: float = 1.0) -> "PageColumns":
+        """Bỏ dòng text rỗng, bbox nhỏ hơn min_size (rộng hoặc cao) và conf < min_conf."""
+        if not len(self):
+            return self
+        wh = self.bbox[:, 2:] - self.bbox[:, :2]
+        keep = (wh >= min_size).all(axis=1) & (self.conf >= min_conf)
+        keep &= np.fromiter((bool(t) for t in self.text), dtype=bool, count=len(self.text))
+        return self if keep.all() else self.select(keep)
+
+    def sort_reading_order(self) -> "PageColumns":
+        """Trên-dưới, trái-phải (ổn định, như sort theo (y0, x0))."""
+        if len(self) < 2:
+            return self
+        return self.select(np.lexsort((self.bbox[:, 0], self.bbox[:, 1])))
+
+    def to_page(self) -> PageText:
+        lines = [Line(t, tuple(b), c, []) for t, b, c in zip(self.text, self.bbox.tolist(), self.conf.tolist())]
+        return PageText(self.document_id, self.page_index, self.width, self.height, lines, self.engine, self.meta)
+
+    @classmethod
+    def from_page(cls, page: PageText) -> "PageColumns":
+        return cls(page.document_id, page.page_index, page.width, page.height,
+                   [l.text for l in page.lines], [l.bbox for l in page.lines], [l.conf for l in page.lines],
+                   page.engine, page.meta)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Cùng schema với PageText.to_dict (đọc lại được bằng PageText.from_dict / from_dict)."""
+        lines = [{"text": t, "bbox": b, "conf": c, "words": []}
+                 for t, b, c in zip(self.text, self.bbox.tolist(), self.conf.tolist())]
+        return {"document_id": self.document_id, "page_index": self.page_index,
+                "width": self.width, "height": self.height, "lines": lines,
+                "engine": self.engine, "meta": self.meta}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "PageColumns":
+        lines = d.get("lines") or []
+        return cls(d["document_id"], d["page_index"], d["width"], d["height"],
+                   [l["text"] for l in lines], [l["bbox"] for l in lines], [l["conf"] for l in lines],
+                   d.get("engine", ""), d.get("meta"))
+
+
+# Thứ tự cột của OcrResult.ids (id block/par/line của Tesseract image_to_data)
+LINE_ID_KEYS = ("block", "par", "line")
+
+
+class OcrResult:
+    """
+    Kết quả OCR của 1 ảnh/trang ở dạng cột: text (list), bbox (n, 4) x0,y0,x1,y1, conf (n,) đã
+    chuẩn hoá về 0..1, ids (n, 3) tuỳ chọn. Engine dựng thẳng từ output gốc (một lần, theo
+    định dạng đã khai báo) → phía sau không phải đoán kiểu từng item hay đoán thang conf.
+    """
+    __slots__ = ("text", "bbox", "conf", "ids", "engine")
+
+    def __init__(self, text: List[str], bbox, conf, ids=None, engine: str = ""):
+        self.text = text
+        self.bbox = np.asarray(bbox, dtype=np.float64).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float64).reshape(-1)
+        self.ids = None if ids is None else np.asarray(ids, dtype=np.int64).reshape(-1, 3)
+        self.engine = engine
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    @classmethod
+    def empty(cls, engine: str = "") -> "OcrResult":
+        return cls([], np.zeros((0, 4)), np.zeros(0), engine=engine)
+
+    def mean_conf(self) -> float:
+        return float(self.conf.mean()) if len(self) else 0.0
+
+    def to_page_coords(self, scale: float = 1.0, x_off: int = 0, y_off: int = 0) -> "OcrResult":
+        """bbox ảnh OCR (đã thu nhỏ `scale`) → toạ độ nguyên trên trang (+ offset vùng)."""
+        bbox = np.trunc(self.bbox / scale) + np.array([x_off, y_off, x_off, y_off], dtype=np.float64)
+        return OcrResult(self.text, bbox, self.conf, self.ids, self.engine)
+
+    @classmethod
+    def concat(cls, parts: Sequence["OcrResult"]) -> "OcrResult":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        engines = list(dict.fromkeys(p.engine for p in parts))
+        # ids chỉ có nghĩa khi mọi phần đều có (vùng Tesseract); trộn lẫn → gom dòng theo hình học
+        ids = np.concatenate([p.ids for p in parts]) if all(p.ids is not None for p in parts) else None
+        return cls([t for p in parts for t in p.text], np.concatenate([p.bbox for p in parts]),
+                   np.concatenate([p.conf for p in parts]), ids, "+".join(engines))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dạng cột gọn cho cache (JSON)."""
+        d = {"engine": self.engine, "text": self.text, "bbox": self.bbox.tolist(), "conf": self.conf.tolist()}
+        if self.ids is not None:
+            d["ids"] = self.ids.tolist()
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "OcrResult":
+        return cls(d["text"], d["bbox"], d["conf"], d.get("ids"), d.get("engine", ""))
@@ -0,0 +1,157 @@
+# src/processing/preprocess/page_store.py
+"""
+Kho trang theo tài liệu: thay vì mỗi trang 1 file page_NNNN.json (indent=2), cả tài liệu nằm trong
+
+  pages.jsonl       mỗi dòng = 1 trang (JSON gọn, cùng schema PageText.to_dict), theo thứ tự ghi
+  pages.idx.npy     bảng offset: (page, offset, length) → đọc ngẫu nhiên 1 trang qua mmap,
+                    không phải parse các trang khác
+
+Bên đọc dùng iter_pages / load_page (tự nhận cả layout cũ page_*.json) thay cho glob file trang.
+"""
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+STORE_NAME = "pages.jsonl"
+INDEX_NAME = "pages.idx.npy"
+PAGE_FORMATS = ("json", "jsonl")
+
+INDEX_DTYPE = np.dtype([("page", "<i8"), ("offset", "<u8"), ("length", "<u8")])
+
+
+class PageStoreWriter:
+    """Ghi tuần tự các trang vào file tạm; close() mới đổi tên thành pages.jsonl + index (nguyên tử)."""
+
+    def __init__(self, doc_dir: Path):
+        self.dir = Path(doc_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.dir / f"{STORE_NAME}.tmp{os.getpid()}"
+        self._f = open(self._tmp, "wb")
+        self._rows: List[tuple] = []
+        self._offset = 0
+
+    def append(self, page) -> str:
+        """Ghi 1 trang (PageText / PageColumns / dict); trả về nhãn để log."""
+        from .writer import _json_default, _to_dict
+        data = _to_dict(page)
+        if data.get("page_index") is None:
+            raise ValueError("PageStoreWriter.append: missing page_index")
+        buf = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+        self._f.write(buf + b"\n")
+        self._rows.append((int(data["page_index"]), self._offset, len(buf)))
+        self._offset += len(buf) + 1
+        return f"{STORE_NAME}#{int(data['page_index']) + 1}"
+
+    def close(self, commit: bool = True):
+        if self._f.closed:
+            return
+        self._f.close()
+        if not commit:
+            self._tmp.unlink(missing_ok=True)
+            return
+        index = np.array(self._rows, dtype=INDEX_DTYPE)
+        idx_tmp = self.dir / f"{INDEX_NAME}.tmp{os.getpid()}.npy"
+        np.save(idx_tmp, index)
+        os.replace(self._tmp, self.dir / STORE_NAME)
+        os.replace(idx_tmp, self.dir / INDEX_NAME)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+
+def _build_index(buf) -> np.ndarray:
+    # Không có / hỏng file index → quét lại theo dòng (chỉ dùng khi cần)
+    rows, off, n = [], 0, len(buf)
+    while off < n:
+        end = buf.find(b"\n", off)
+        end = n if end < 0 else end
+        if end > off:
+            rows.append((int(json.loads(buf[off:end])["page_index"]), off, end - off))
+        off = end + 1
+    return np.array(rows, dtype=INDEX_DTYPE)
+
+
+class PageStoreReader:
+    """Đọc ngẫu nhiên trang trong pages.jsonl qua mmap + index."""
+
+    def __init__(self, doc_dir: Path):
+        self.dir = Path(doc_dir)
+        self._file = open(self.dir / STORE_NAME, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        idx_path = self.dir / INDEX_NAME
+        index = np.load(idx_path, mmap_mode="r") if idx_path.exists() else None
+        if index is None or (len(index) and int(index["offset"][-1] + index["length"][-1]) > size):
+            index = _build_index(self._mm)
+        self._index = index
+        self._pos = {int(p): k for k, p in enumerate(index["page"])}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def page_indices(self) -> List[int]:
+        """page_index theo thứ tự trong file (thứ tự trang)."""
+        return [int(p) for p in self._index["page"]]
+
+    def get_raw(self, page_index: int) -> bytes:
+        rec = self._index[self._pos[page_index]]
+        off, ln = int(rec["offset"]), int(rec["length"])
+        return bytes(self._mm[off:off + ln])
+
+    def get(self, page_index: int) -> Dict[str, Any]:
+        """Dict trang (schema PageText.to_dict); KeyError nếu không có trang."""
+        return json.loads(self.get_raw(page_index))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for p in self.page_indices():
+            yield self.get(p)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def has_page_store(doc_dir: Path) -> bool:
+    return (Path(doc_dir) / STORE_NAME).exists()
+
+
+def iter_pages(doc_dir: Path) -> Iterator[Dict[str, Any]]:
+    """Mọi trang của 1 tài liệu theo thứ tự, bất kể layout (pages.jsonl hay page_*.json)."""
+    doc_dir = Path(doc_dir)
+    if has_page_store(doc_dir):
+        with PageStoreReader(doc_dir) as reader:
+            yield from reader
+        return
+    for p in sorted(doc_dir.glob("page_*.json")):
+        with open(p, "r", encoding="utf-8") as f:
+            yield json.load(f)
+
+
+def load_page(doc_dir: Path, page_index: int) -> Optional[Dict[str, Any]]:
+    """1 trang (page_index 0-based) hoặc None nếu không có."""
+    doc_dir = Path(doc_dir)
+    if has_page_store(doc_dir):
+        with PageStoreReader(doc_dir) as reader:
+            try:
+                return reader.get(page_index)
+            except KeyError:
+                return None
+    p = doc_dir / f"page_{page_index + 1:04d}.json"
+    if not p.exists():
+        return None
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,17 +1,26 @@
 # src/processing/preprocess/pdf_ocr_ingest.py
-import argparse, hashlib, re, sys, os
+import argparse, re, sys, os, shutil, tempfile, time
+from collections import deque
+from contextlib import ExitStack, closing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List
-import numpy as np
 import cv2
 import pytesseract
 
-from .utils_text import write_fulltext_files
+from .utils_text import LEGACY_NAME, FulltextWriter
+from .spell_vi import CORRECTIONS_NAME, correct_fulltext, get_corrector
 from .extract_digital import extract_digital_pdf, save_tables_to_csv
-from .extract_scan import ocr_page_to_lines, detect_tables_csv, save_scan_tables
-from .image_ops import pdf_to_images, preprocess_image, split_and_upright
-from src.processing.preprocess.writer import paddle_to_page, save_page_json
-from src.processing.preprocess.ocr.factory import build_engine as ocr_build_engine
+from .extract_scan import detect_tables_csv, save_scan_tables
+from .ocr_cache import OcrCache, page_content_hash
+from .manifest import Manifest, list_outputs, options_hash
+from .page_schema import OcrResult
+from .page_store import INDEX_NAME, PAGE_FORMATS, STORE_NAME, PageStoreWriter
+from .image_ops import (RENDER_BACKENDS, binarize_for_tesseract, ensure_3_channels, iter_pdf_images,
+                        detect_orientation, pdf_page_count, preprocess_image)
+from src.processing.preprocess.writer import items_to_line_texts, paddle_to_page, save_page_json
+from src.processing.preprocess.ocr.registry import get_engine, engine_accepts_gray, engine_init_stats
+from src.processing.preprocess.ocr.tesseract_engine import DEFAULT_CONFIG as TESSERACT_CONFIG
 # PyMuPDF (optional) để phát hiện/trích text với PDF số
 try:
     import fitz  # PyMuPDF
@@ -54,12 +63,280 @@ def _rotate_bgr_by_deg(bgr, deg: int):
         return cv2.rotate(bgr, cv2.ROTATE_90_COUNTERCLOCKWISE)
     return bgr
 
-def main():
+# ---------- Nhánh A: PDF số → trích trực tiếp bằng PyMuPDF ----------
+def _has_text_layer(fitz_doc, i: int) -> bool:
+    if not HAS_FITZ or fitz_doc is None:
+        return False
+    try:
+        words = fitz_doc[i].get_text("words")
+        return bool(words and len(words) > 5)
+    except Exception:
+        return False
+
+def _digital_page_result(doc_id: str, i: int, page) -> dict:
+    w, h = int(page.rect.width), int(page.rect.height)
+    blocks = page.get_text("blocks", flags=fitz.TEXTFLAGS_TEXT)
+    lines = []
+    for b in blocks or []:
+        if len(b) >= 5:
+            x0, y0, x1, y1, txt = b[0], b[1], b[2], b[3], (b[4] or "").strip()
+            if txt:
+                for ln in [t.strip() for t in txt.splitlines() if t.strip()]:
+                    lines.append({"bbox":[int(x0),int(y0),int(x1),int(y1)],
+                                  "text":ln,"conf_avg":1.0,"words":[]})
+    data_dict = {
+        "document_id": doc_id,
+        "page_index": i,
+        "width": w, "height": h,
+        "engine": "pdf_text",
+        "meta": None,
+        "lines": lines
+    }
+    page_lines = [L["text"] for L in lines]
+    return {
+        "page": data_dict,
+        "n_lines": len(lines),
+        "tag": " [pdf_text]",
+        "page_lines": page_lines,
+        "legacy_chunk": "\n".join(page_lines),
+        "tables": None,
+    }
+
+# ---------- Nhánh B: PDF scan → OCR (Paddle/Tesseract) ----------
+def _add_ms(steps: dict, name: str, t0: float):
+    steps[name] = round(steps.get(name, 0.0) + (time.perf_counter() - t0) * 1000, 1)
+
+def _ocr_regions(i: int, bgr_base, args, engine, out_dir: Path, meta: dict, steps: dict) -> OcrResult:
+    """
+    OCR các vùng của 1 trang (+ fallback Tesseract khi Paddle yếu) → OcrResult toạ độ trang.
+    Quyết định tiền xử lý vào `meta`; thời gian từng bước (ms) cộng vào `steps` (không vào page JSON).
+    """
+    regions = [(0, 0, bgr_base)]
+
+    parts = []
+    meta["preprocess"] = []
+    for r_idx, (x_off, y_off, bgr_rot) in enumerate(regions, start=1):
+        result = None
+        pre = {}
+        meta["preprocess"].append(pre)
+        try:
+            img_in = _preprocess_for_engine(bgr_rot, args, pre, steps,
+                                            gray=getattr(engine, "accepts_gray", False))
+            t0 = time.perf_counter()
+            result = engine.extract(img_in)
+            _add_ms(steps, "ocr", t0)
+        except Exception as e:
+            print(f"[WARN] Page {i+1}: {args.engine} exception(part) -> {type(e).__name__}: {e}")
+
+        scale = pre.get("scale", 1.0)   # ảnh OCR bị thu nhỏ → bbox chia lại về toạ độ trang
+        # conf đã ở thang 0..1 cho mọi engine → so ngưỡng trực tiếp
+        weak = result is None or len(result) <= 3 or result.mean_conf() < 0.35
+        if weak and args.engine == "paddle" and args.fallback:
+            print(f"[WARN] Page {i+1}: Paddle weak on a region → try Tesseract fallback")
+            tess_engine = get_engine("tesseract", lang="vie+eng")
+            bgr_tess = binarize_for_tesseract(bgr_rot)
+            if args.save_render_debug:
+                cv2.imwrite(str(out_dir / f"debug_pre_{i+1:03d}_tesseract_part{r_idx}.png"), bgr_tess)
+            scale = 1.0
+            try:
+                result = tess_engine.extract(bgr_tess)
+            except Exception as e:
+                print(f"[ERROR] Page {i+1}: Tesseract exception(part) -> {type(e).__name__}: {e}")
+                result = None
+
+        if result is not None:
+            parts.append(result.to_page_coords(scale, x_off, y_off))
+
+    merged = OcrResult.concat(parts)
+    print(f"[DEBUG] Page {i+1}: regions={len(regions)}, merged_items={len(merged)}")
+    return merged
+
+# Token "giống chữ": chữ cái (kể cả tiếng Việt có dấu) hoặc số, cho phép dấu câu ở hai đầu
+_WORDLIKE_RE = re.compile(r"^[\W_]*(?:[^\W\d_]+(?:[-'][^\W\d_]+)*|\d+(?:[.,:/-]\d+)*%?)[\W_]*$")
+
+def _ocr_quality(result: OcrResult) -> dict:
+    """Độ tin cậy trung bình (0..1) + tỉ lệ token giống chữ — đo xem OCR ở DPI thấp có đủ tốt không."""
+    tokens = [t for s in result.text for t in s.split()]
+    return {
+        "mean_conf": round(result.mean_conf(), 3),
+        "wordlike": round(sum(1 for t in tokens if _WORDLIKE_RE.match(t)) / len(tokens), 3) if tokens else 0.0,
+    }
+
+def _needs_escalation(quality: dict, args) -> bool:
+    return quality["mean_conf"] < args.escalate_conf or quality["wordlike"] < args.escalate_wordlike
+
+def _rerender_page(spec: tuple, i: int, args):
+    """Render lại 1 trang ở --dpi (dùng được trong worker): spec = (pdf, scratch, color, rotate_map, auto_deg)."""
+    pdf, scratch, color, rotate_map, auto_deg = spec
+    with closing(iter_pdf_images(pdf, dpi=args.dpi, poppler_path=args.poppler_path, pages=[i],
+                                 output_dir=os.path.join(scratch, f"dpi{args.dpi}"), prefetch=0,
+                                 backend=args.render_backend, color=color)) as it:
+        _, img = next(it)
+    return _prepare_scan_bgr(img, i + 1, rotate_map, args.force_rotate_270, auto_deg)
+
+def _scan_page_result(doc_id: str, i: int, bgr_base, args, engine, out_dir: Path, orient=None,
+                      rerender=None) -> dict:
+    """
+    OCR 1 trang scan. Chạy được cả ở process chính lẫn worker của --workers.
+    --adaptive_dpi: bgr_base được render ở DPI thấp; nếu kết quả yếu và có `rerender`
+    (spec cho _rerender_page) thì render lại ở --dpi và OCR lại.
+    """
+    meta, steps = {}, {}
+    if orient is not None:
+        meta["orientation"] = orient
+    merged = _ocr_regions(i, bgr_base, args, engine, out_dir, meta, steps)
+
+    if args.adaptive_dpi:
+        quality = _ocr_quality(merged)
+        meta.update(dpi=args.adaptive_dpi, dpi_escalated=False, ocr_quality=quality)
+        if rerender is not None and args.adaptive_dpi < args.dpi and _needs_escalation(quality, args):
+            print(f"[INFO] Page {i+1}: weak OCR at {args.adaptive_dpi} dpi "
+                  f"(conf={quality['mean_conf']}, wordlike={quality['wordlike']}) → re-OCR at {args.dpi} dpi")
+            bgr_base = _rerender_page(rerender, i, args)
+            low = {"dpi": args.adaptive_dpi, "ocr_quality": quality, "preprocess": meta["preprocess"]}
+            merged = _ocr_regions(i, bgr_base, args, engine, out_dir, meta, steps)
+            meta.update(dpi=args.dpi, dpi_escalated=True, ocr_quality=_ocr_quality(merged), first_pass=low)
+    else:
+        meta["dpi"] = args.dpi
+
+    h, w = bgr_base.shape[:2]
+    # Bảng (scan) nếu bật --tables
+    tables = _scan_tables(i, bgr_base) if args.tables else None
+
+    res = _assemble_scan_result(doc_id, i, w, h, merged, tables, meta=meta)
+    res["steps_ms"] = steps
+    # tables=None trong cache nghĩa là "chưa trích bảng" → lần chạy --tables sau sẽ OCR lại trang này
+    res["cache_entry"] = {"width": w, "height": h, "items": merged.to_dict(), "tables": tables, "meta": meta}
+    return res
+
+def _preprocess_for_engine(bgr, args, info: dict, steps: dict, gray: bool):
+    """
+    Ảnh đưa vào engine theo --preprocess; ghi quyết định vào `info`, cộng thời gian từng bước vào `steps`.
+    gray=True (engine accepts_gray): giữ 1 kênh từ render tới engine, không nhân ra BGR.
+    """
+    if args.preprocess == "adaptive":
+        mode = "paddle" if args.engine in ("paddle", "hybrid") else "tesseract"
+        return preprocess_image(bgr, mode=mode, info=info, gray=gray, timings=steps)
+    if args.engine == "auto":
+        t0 = time.perf_counter()
+        out = binarize_for_tesseract(bgr)
+        if not gray:
+            out = ensure_3_channels(out)
+        _add_ms(steps, "binarize", t0)
+        return out
+    return bgr if gray else ensure_3_channels(bgr)
+
+def _render_color(args) -> str:
+    """Engine nhận ảnh 1 kênh → render thẳng ra gray (bỏ vòng BGR → gray → BGR)."""
+    return "gray" if engine_accepts_gray("paddle" if args.engine == "hybrid" else args.engine) else "bgr"
+
+def _scan_tables(i: int, bgr_base):
+    try:
+        return detect_tables_csv(bgr_base)
+    except Exception as e:
+        print(f"[WARN] table detect (scan) failed on page {i+1}: {e}")
+        return None
+
+def _auto_rotate_page(args, page_no: int, rotate_map: dict) -> bool:
+    # Cờ xoay tay luôn thắng tự phát hiện
+    return not args.no_auto_rotate and not args.force_rotate_270 and page_no not in rotate_map
+
+def _page_cache_key(args, page_hash: str, i: int, rotate_map: dict) -> str:
+    """Key cache OCR: nội dung trang + mọi thứ ảnh hưởng tới ảnh đưa vào OCR và engine."""
+    return OcrCache.make_key(
+        page=page_hash,
+        # adaptive: kết quả phụ thuộc cả DPI thấp lẫn ngưỡng nâng DPI
+        dpi=([args.adaptive_dpi, args.dpi, args.escalate_conf, args.escalate_wordlike]
+             if args.adaptive_dpi else args.dpi),
+        render=f"{args.render_backend}-{_render_color(args)}",
+        # hướng tự phát hiện là hàm tất định của nội dung trang → chỉ cần ghi "auto" vào key
+        rotate=[rotate_map.get(i + 1, 0), 270 if args.force_rotate_270 else 0,
+                "auto" if _auto_rotate_page(args, i + 1, rotate_map) else ""],
+        preprocess=(f"adaptive-{'paddle' if args.engine in ('paddle', 'hybrid') else 'tesseract'}"
+                    if args.preprocess == "adaptive" else "tesseract-bin" if args.engine == "auto" else "raw"),
+        engine=args.engine,
+        fallback=bool(args.fallback),
+        lang="vie+eng",
+        config=TESSERACT_CONFIG,
+    )
+
+def _assemble_scan_result(doc_id: str, i: int, w: int, h: int, merged: OcrResult, tables, meta=None) -> dict:
+    """Dựng PageText + dòng RAW/NORM từ item OCR (mới chạy hoặc lấy từ cache)."""
+    page = paddle_to_page(doc_id, i, w, h, merged, min_conf=0.2)
+    page.meta = meta
+
+    # ====== GHÉP DÒNG CHO RAW/NORM (scan) ======
+    # Dựng dòng từ chính kết quả OCR ở trên (id dòng Tesseract / hình học Paddle) → mỗi trang chỉ OCR 1 lần
+    page_lines = items_to_line_texts(merged)
+    if not page_lines:
+        page_lines = [getattr(l, "text", "") for l in getattr(page, "lines", []) if getattr(l, "text", "")]
+
+    # Giữ file fulltext cũ để so sánh
+    if getattr(page, "lines", None):
+        legacy_chunk = "\n".join(getattr(l, "text", "") for l in page.lines if getattr(l, "text", ""))
+    else:
+        legacy_chunk = "\n".join(page_lines)
+
+    return {
+        "page": page,
+        "n_lines": len(page.lines) if hasattr(page, "lines") else 0,
+        "tag": "",
+        "page_lines": page_lines,
+        "legacy_chunk": legacy_chunk,
+        "tables": tables,
+    }
+
+def _prepare_scan_bgr(bgr_base, page_no: int, rotate_map: dict, force_rotate_270: bool, auto_deg: int = 0):
+    if auto_deg:
+        bgr_base = _rotate_bgr_by_deg(bgr_base, auto_deg)
+    if page_no in rotate_map:
+        bgr_base = _rotate_bgr_by_deg(bgr_base, rotate_map[page_no])
+    if force_rotate_270:
+        bgr_base = _rotate_bgr_by_deg(bgr_base, 270)
+    return bgr_base
+
+# ---------- --workers: mỗi worker giữ engine "ấm" (registry) suốt vòng đời ----------
+_WORKER_ENGINE = None
+
+def _init_worker(engine_name: str, lang: str):
+    global _WORKER_ENGINE
+    # Tesseract tự dùng OpenMP; nhiều worker song song thì mỗi process 1 luồng là đủ
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    _WORKER_ENGINE = get_engine(engine_name, lang=lang)
+
+def _worker_scan_page(doc_id: str, i: int, bgr_base, args, out_dir: Path, orient=None, rerender=None) -> dict:
+    return _scan_page_result(doc_id, i, bgr_base, args, _WORKER_ENGINE, out_dir, orient, rerender)
+
+# Tham số không ảnh hưởng nội dung output → không tính vào fingerprint của manifest
+_RUNTIME_ARGS = {"input", "input_dir", "processed_dir", "poppler_path", "workers", "prefetch",
+                 "cache_dir", "cache_max_mb", "no_cache", "force", "jobs", "cpu_budget", "retry_failed",
+                 "max_attempts"}
+
+def _output_options(args) -> dict:
+    return {k: v for k, v in vars(args).items() if k not in _RUNTIME_ARGS}
+
+class NoPagesError(RuntimeError):
+    pass
+
+class PageWorkerCrashed(RuntimeError):
+    """Worker OCR trang (--workers) chết giữa chừng; khác BrokenProcessPool của pool tài liệu (batch)."""
+    pass
+
+def build_arg_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--input", required=True, help="PDF path")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", help="PDF path")
+    src.add_argument("--input_dir",
+                     help="Batch: quét mọi *.pdf dưới thư mục (vd data/raw/<domain>) qua hàng đợi có thể resume")
     ap.add_argument("--processed_dir", default="data/processed",
                     help="Base output dir; a doc_id subfolder will be created")
     ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--adaptive_dpi", type=int, default=None,
+                    help="OCR trang scan ở DPI thấp này trước (vd 150); trang nào kết quả yếu mới render lại ở --dpi.")
+    ap.add_argument("--escalate_conf", type=float, default=0.6,
+                    help="--adaptive_dpi: conf trung bình (0..1) dưới ngưỡng → nâng DPI.")
+    ap.add_argument("--escalate_wordlike", type=float, default=0.75,
+                    help="--adaptive_dpi: tỉ lệ token giống chữ/số dưới ngưỡng → nâng DPI.")
     ap.add_argument("--poppler_path", default=os.getenv("POPPLER_PATH", None),
                     help="Path tới poppler/bin (Windows). Nếu bỏ trống sẽ auto-detect.")
     ap.add_argument("--fallback", action="store_true",
@@ -70,6 +347,9 @@ def main():
                     help="Ép xoay toàn bộ các trang 270° (ví dụ trang nằm ngang).")
     ap.add_argument("--rotate_pages", default="",
                     help='Xoay theo số trang, ví dụ: "1:270,3:180"')
+    ap.add_argument("--no_auto_rotate", action="store_true",
+                    help="Tắt tự phát hiện hướng trang (thumbnail + OSD khi không chắc). "
+                         "--rotate_pages / --force_rotate_270 luôn được ưu tiên.")
     ap.add_argument("--engine", default="auto",
                     choices=["auto", "paddle", "tesseract", "hybrid"],
                     help="auto: PDF số→text layer, PDF scan→tesseract; hybrid: paddle + fallback tesseract")
@@ -77,50 +357,86 @@ def main():
                     help="Trích bảng ra CSV nếu phát hiện được")
     ap.add_argument("--norm_loose", action="store_true",
                     help="Chuẩn hoá nhẹ tay: không xoá header/footer lặp và hạn chế dọn rác.")
+    ap.add_argument("--spell_index", default=None,
+                    help="Thư mục index spell_vi (build bằng: python -m src.processing.preprocess.spell_vi build): "
+                         "sửa lỗi dấu OCR trong fulltext_norm.txt, log từng lần sửa vào spell_corrections.jsonl.")
     ap.add_argument("--force_ocr", action="store_true",
                     help="Bỏ qua text layer của PDF số, luôn OCR ảnh (Tesseract/Paddle).")
       
+    ap.add_argument("--preprocess", default="basic", choices=["basic", "adaptive"],
+                    help="basic: chỉ nhị phân hoá (auto); adaptive: đo nhiễu/tương phản rồi mới chọn denoise/CLAHE "
+                         "(quyết định ghi vào meta của page JSON, tổng thời gian từng bước vào timings của manifest).")
+    ap.add_argument("--page_format", default="json", choices=list(PAGE_FORMATS),
+                    help="json: mỗi trang 1 file page_NNNN.json; jsonl: 1 file pages.jsonl + index "
+                         "(đọc bằng page_store.iter_pages / load_page).")
     ap.add_argument("--save_render_debug", action="store_true",
-                    help="Lưu debug_render_XXX.png (mặc định không lưu).")
-
-    args = ap.parse_args()
-
-    pdf = Path(args.input)
-    if not pdf.exists():
-        print(f"[ERROR] Input not found: {pdf}", file=sys.stderr)
-        sys.exit(2)
-
-    # Tạo doc_id ổn định theo tên file + md5
-    doc_id = f"{slugify(pdf.stem)}-{hashlib.md5(pdf.read_bytes()).hexdigest()[:8]}"
+                    help="Lưu debug_render_XXX.png / debug_pre_*.png vào thư mục output (mặc định không lưu).")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Số process OCR song song cho các trang scan (mỗi worker giữ 1 engine). "
+                         "Mặc định 1; batch: chia --cpu_budget cho các tài liệu đang chạy.")
+    ap.add_argument("--prefetch", type=int, default=2,
+                    help="Số trang render trước khi OCR (giới hạn RAM; 0 = render tuần tự).")
+    ap.add_argument("--cache_dir", default="data/cache/ocr",
+                    help="Thư mục cache kết quả OCR theo nội dung trang.")
+    ap.add_argument("--cache_max_mb", type=int, default=2048,
+                    help="Giới hạn dung lượng cache OCR (MB), vượt thì xoá entry ít dùng nhất.")
+    ap.add_argument("--no_cache", action="store_true",
+                    help="Không đọc/ghi cache OCR.")
+    ap.add_argument("--force", action="store_true",
+                    help="Xử lý lại kể cả khi manifest cho thấy tài liệu + options không đổi.")
+    ap.add_argument("--render_backend", default="pdftoppm", choices=list(RENDER_BACKENDS),
+                    help="pdftoppm: poppler subprocess → file PGM/PPM không nén, đọc qua memmap (không zlib); "
+                         "fitz: PyMuPDF pixmap → numpy trong process (không qua file).")
+
+    ap.add_argument("--jobs", type=int, default=None,
+                    help="Batch: số tài liệu chạy song song (mặc định theo --cpu_budget).")
+    ap.add_argument("--cpu_budget", type=int, default=os.cpu_count() or 1,
+                    help="Batch: tổng số core được dùng; chia đều --workers cho các tài liệu đang chạy.")
+    ap.add_argument("--retry_failed", action="store_true",
+                    help="Batch: chạy lại các tài liệu lỗi ở lần trước.")
+    ap.add_argument("--max_attempts", type=int, default=3,
+                    help="Batch: số lần chạy tối đa 1 tài liệu làm chết worker (crash/OOM) trước khi đánh dấu failed.")
+    return ap
+
+def process_document(pdf: Path, args) -> dict:
+    """OCR 1 PDF vào processed_dir/<doc_id>. Trả về tóm tắt (doc_id, status, timings)."""
+    # PyMuPDF doc + 2 kết nối SQLite (manifest, cache) đóng ở mọi đường ra, kể cả khi lỗi:
+    # worker --jobs sống suốt batch nên rò rỉ sẽ dồn lại theo từng tài liệu
+    with ExitStack() as resources:
+        return _process_document(pdf, args, resources)
+
+def _process_document(pdf: Path, args, resources: ExitStack) -> dict:
+    t_start, wall_start = time.perf_counter(), time.time() - 1
+    manifest = resources.enter_context(closing(Manifest(args.processed_dir)))
+
+    # Tạo doc_id ổn định theo tên file + md5 (hash theo chunk, dùng lại từ manifest nếu file không đổi)
+    pdf_md5 = manifest.input_hash(pdf)
+    doc_id = f"{slugify(pdf.stem)}-{pdf_md5[:8]}"
     out_dir = Path(args.processed_dir) / doc_id
+    options = _output_options(args)
+    opts_hash = options_hash(options)
+    if not args.force and manifest.is_up_to_date(doc_id, pdf_md5, opts_hash, out_dir):
+        print(f"[SKIP] {pdf.name}: unchanged since last run with same options -> {out_dir}")
+        return {"doc_id": doc_id, "status": "skipped", "out_dir": str(out_dir)}
     out_dir.mkdir(parents=True, exist_ok=True)
     print(f"[INFO] Saving OCR result to: {out_dir.resolve()}")
 
-    print(f"[DEBUG] Calling pdf_to_images on {pdf} (dpi={args.dpi}) poppler={args.poppler_path}")
-    # mới
-    render_dir = out_dir / "render"
-    render_dir.mkdir(parents=True, exist_ok=True)
-    pages = pdf_to_images(
-        str(pdf),
-        dpi=args.dpi,
-        poppler_path=args.poppler_path,
-        limit=args.limit,           # 👈 để -f/-l có hiệu lực
-        output_dir=str(render_dir), # 👈 render ngay trong cùng job folder
-    )
-    print(f"[DEBUG] pdf_to_images returned {len(pages) if pages else 0}")
-    if not pages:
-        print("[ERROR] No pages rendered from PDF. (Thiếu Poppler trên Windows?)", file=sys.stderr)
-        print("=> Cài Poppler và truyền --poppler_path C:\\path\\to\\poppler\\bin", file=sys.stderr)
-        sys.exit(3)
+    total_pages = pdf_page_count(str(pdf), args.poppler_path)
+    if args.limit is not None:
+        total_pages = min(total_pages, args.limit)
+    if not total_pages:
+        raise NoPagesError(f"No pages rendered from PDF: {pdf}")
     else:
-        print(f"[INFO] Rendered {len(pages)} page image(s)")
+        print(f"[INFO] {total_pages} page(s) to process")
 
     # hybrid = paddle + fallback tesseract
     effective_engine = args.engine
     if args.engine == "hybrid":
         effective_engine = "paddle"
         args.fallback = True
-    engine = ocr_build_engine(effective_engine, lang="vie+eng")
+    # Engine chỉ được build (qua registry) khi thật sự có trang phải OCR;
+    # chạy song song thì engine được build trong từng worker, process chính không cần
+    use_pool = bool(args.workers and args.workers > 1)
 
     # Bảng từ PDF số (làm một lần nếu bật --tables)
     if args.tables and HAS_FITZ:
@@ -131,186 +447,268 @@ def main():
             print(f"[WARN] table extract (digital) failed: {e}")
 
     rotate_map = _parse_rotate_pages(args.rotate_pages)
-    fitz_doc = fitz.open(str(pdf)) if HAS_FITZ else None
-    total_pages = len(pages)
-
-    # Thu thập text theo từng trang để xuất RAW/NORM
-    paged_lines_raw: List[List[str]] = []
-    # Giữ lại file cũ để so sánh
-    all_txt_chunks: List[str] = []
-
-    for i, pil in enumerate(pages, start=0):
-        if args.limit is not None and i >= args.limit:
-            print(f"[INFO] Dừng sớm sau {args.limit} trang (test).")
-            break
-
-        # ---- Nhánh A: PDF số → bỏ OCR, trích trực tiếp bằng PyMuPDF ----
-        has_text = False
-        if HAS_FITZ and fitz_doc is not None:
-            try:
-                page = fitz_doc[i]
-                words = page.get_text("words")
-                has_text = bool(words and len(words) > 5)
-            except Exception:
-                has_text = False
-
-                # ---- Nhánh A: PDF số → bỏ OCR, trích trực tiếp bằng PyMuPDF ----
-        use_digital = (args.engine == "auto") and has_text and (not args.force_ocr)
-        if use_digital:
-            w, h = int(page.rect.width), int(page.rect.height)
-            blocks = page.get_text("blocks", flags=fitz.TEXTFLAGS_TEXT)
-            lines = []
-            for b in blocks or []:
-                if len(b) >= 5:
-                    x0, y0, x1, y1, txt = b[0], b[1], b[2], b[3], (b[4] or "").strip()
-                    if txt:
-                        for ln in [t.strip() for t in txt.splitlines() if t.strip()]:
-                            lines.append({"bbox":[int(x0),int(y0),int(x1),int(y1)],
-                                          "text":ln,"conf_avg":1.0,"words":[]})
-            data_dict = {
-                "document_id": doc_id,
-                "page_index": i,
-                "width": w, "height": h,
-                "engine": "pdf_text",
-                "meta": None,
-                "lines": lines
-            }
-            out_file = save_page_json(out_dir, data_dict)
-            print(f"[OK] Page {i+1}/{total_pages} -> {out_file.name} (lines={len(lines)}) [pdf_text]")
-
-            page_lines = [L["text"] for L in lines]
-            paged_lines_raw.append(page_lines)
-            all_txt_chunks.append("\n".join(page_lines))
-            continue
-
-        # ---- Nhánh B: PDF scan → OCR (Paddle/Tesseract) ----
-        mode = "paddle" if effective_engine == "paddle" else "tesseract"
-        bgr_base = cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR)
-
-        page_no = i + 1  # 1-based
-        if page_no in rotate_map:
-            bgr_base = _rotate_bgr_by_deg(bgr_base, rotate_map[page_no])
-        if args.force_rotate_270:
-            bgr_base = _rotate_bgr_by_deg(bgr_base, 270)
-
-        h, w = bgr_base.shape[:2]
-        #regions = split_and_upright(bgr_base)  # -> [(0, 0, bgr_rot)]
-        regions = [(0, 0, bgr_base)]
-
-        #for r_idx, (x_off, y_off, bgr_rot) in enumerate(regions, start=1):
-            #cv2.imwrite(str(out_dir / f"debug_pre_{i+1:03d}_{args.engine}_part{r_idx}.png"), bgr_rot)
-            # ngay sau render từ pdf_to_images, trước preprocess:
-            #cv2.imwrite(str(out_dir / f"debug_render_{i+1:03d}.png"), cv2.cvtColor(np.array(pil), cv2.COLOR_RGB2BGR))
-            # ngay sau preprocess_image:
-            #cv2.imwrite(str(out_dir / f"debug_preprocess_{i+1:03d}.png"), bgr_base)
-
-        merged = []
-        def _to_dict_items(items):
-            out = []
-            for it in (items or []):
-                if isinstance(it, (list, tuple)) and len(it) >= 2 and isinstance(it[0], (list, tuple)):
-                    poly = it[0]
-                    try:
-                        xs = [float(p[0]) for p in poly]; ys = [float(p[1]) for p in poly]
-                        bbox = [min(xs), min(ys), max(xs), max(ys)]
-                    except Exception:
-                        bbox = [0,0,0,0]
-                    ti = it[1]
-                    if isinstance(ti, (list, tuple)) and len(ti) >= 2:
-                        txt, cf = str(ti[0] or ""), float(ti[1])
-                    elif isinstance(ti, dict):
-                        txt, cf = str(ti.get("text","") or ""), float(ti.get("conf", ti.get("score", 0.0)) or 0.0)
+    fitz_doc = resources.enter_context(closing(fitz.open(str(pdf)))) if HAS_FITZ else None
+
+    # Phân loại trang trước (rẻ, chỉ đọc text layer) → chỉ render những trang phải OCR
+    scan_pages = [i for i in range(total_pages)
+                  if not (args.engine == "auto" and not args.force_ocr and _has_text_layer(fitz_doc, i))]
+    print(f"[INFO] Pages: {total_pages - len(scan_pages)} pdf_text, {len(scan_pages)} to OCR")
+
+    # Cache OCR: trang đã có kết quả (và bảng nếu cần) thì khỏi render lẫn OCR
+    cache = None
+    if not args.no_cache:
+        cache = resources.enter_context(closing(OcrCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 ** 2)))
+    cache_keys, cached, page_hashes = {}, set(), {}
+    render_pages = scan_pages
+    if cache is not None and scan_pages:
+        for i in scan_pages:
+            page_hashes[i] = page_content_hash(fitz_doc, i, fallback=pdf_md5)
+            cache_keys[i] = _page_cache_key(args, page_hashes[i], i, rotate_map)
+            if cache.contains(cache_keys[i]):
+                cached.add(i)
+        need_tables = {i for i in cached if args.tables and not cache.contains(cache_keys[i] + "-tables", count=False)}
+        render_pages = [i for i in scan_pages if i not in cached or i in need_tables]
+        print(f"[INFO] OCR cache: {len(cached)}/{len(scan_pages)} page(s) cached, {len(render_pages)} to render")
+
+    # Ảnh render (PGM/PPM không nén) chỉ nằm trong thư mục scratch của lần chạy này, xoá ở cuối;
+    # không còn render/*.png tích tụ trong thư mục output
+    render_dir = None
+    render_color = _render_color(args)
+    render_dpi = args.adaptive_dpi or args.dpi   # --adaptive_dpi: render DPI thấp trước, nâng DPI từng trang khi cần
+    def _render(page_list, prefetch):
+        nonlocal render_dir
+        if render_dir is None:
+            render_dir = tempfile.mkdtemp(prefix=f"ocr-render-{doc_id}-")
+        return iter_pdf_images(
+            str(pdf),
+            dpi=render_dpi,
+            poppler_path=args.poppler_path,
+            pages=page_list,
+            output_dir=render_dir,
+            prefetch=prefetch,
+            backend=args.render_backend,
+            color=render_color,
+            fmt="pnm",
+        )
+
+    # Render theo luồng (lazy): mỗi lần chỉ giữ vài trang trong RAM, không gọi renderer nếu không có trang cần render
+    pages = iter(())
+    if render_pages:
+        print(f"[DEBUG] Streaming {len(render_pages)} page(s) of {pdf} (dpi={render_dpi}, {render_color}) "
+              f"poppler={args.poppler_path}")
+        pages = _render(render_pages, args.prefetch)
+    scan_set, render_set = set(scan_pages), set(render_pages)
+
+    # Tổng thời gian từng bước (ms) của các trang OCR trong lần chạy này → timings của manifest
+    steps_ms = {}
+
+    def _add_ms_total(name: str, ms: float):
+        steps_ms[name] = round(steps_ms.get(name, 0.0) + ms, 1)
+
+    def _orientation(i: int, img) -> dict:
+        # Hướng trang cache theo hash nội dung: chạy lại (kể cả khác engine/dpi) khỏi đoán lại / OSD
+        okey = OcrCache.make_key(page=page_hashes[i], kind="orientation") if i in page_hashes else None
+        if okey is not None:
+            hit = cache.get(okey, count=False)
+            if hit is not None:
+                return hit   # page meta giống hệt lần phát hiện đầu (không đánh dấu nguồn cache)
+        t0 = time.perf_counter()
+        orient = detect_orientation(img)
+        _add_ms(steps_ms, "orientation", t0)   # chỉ đo khi thật sự phát hiện; không vào page meta / cache
+        if okey is not None:
+            cache.put(okey, orient)
+        if orient["deg"]:
+            print(f"[INFO] Page {i+1}: auto-rotate {orient['deg']}° ({orient['method']})")
+        return orient
+
+    def _next_page(i: int):
+        """-> (ảnh đã xoay thẳng, thông tin hướng tự phát hiện hoặc None)."""
+        if i in render_set:
+            idx, bgr_page = next(pages)
+            assert idx == i, f"render order mismatch: {idx} != {i}"
+        else:
+            # entry cache biến mất giữa chừng → render riêng trang này
+            with closing(_render([i], 0)) as one:
+                _, bgr_page = next(one)
+        if args.save_render_debug:
+            cv2.imwrite(str(out_dir / f"debug_render_{i+1:03d}.png"), bgr_page)
+        orient = _orientation(i, bgr_page) if _auto_rotate_page(args, i + 1, rotate_map) else None
+        auto_deg = orient["deg"] if orient else 0
+        return _prepare_scan_bgr(bgr_page, i + 1, rotate_map, args.force_rotate_270, auto_deg), orient
+
+    # RAW + fulltext.txt cũ (để so sánh) ghi dần theo từng trang; NORM hoàn tất sau vòng lặp.
+    # Lỗi giữa chừng vẫn giữ được text các trang đã xong.
+    fulltext = FulltextWriter(out_dir, loose=args.norm_loose, legacy=True)
+
+    # Với --workers > 1: trang scan được đẩy vào process pool, trang số xử lý ngay;
+    # kết quả luôn được ghi theo đúng thứ tự trang để output giống hệt chạy tuần tự.
+    pool = None
+    if use_pool and any(i not in cached for i in scan_pages):
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                   initargs=(effective_engine, "vie+eng"))
+        print(f"[INFO] OCR scan pages with {args.workers} worker process(es)")
+
+    def _emit(i: int, res: dict):
+        nonlocal n_escalated
+        for name, ms in res.pop("steps_ms", {}).items():
+            _add_ms_total(name, ms)
+        entry = res.pop("cache_entry", None)
+        if cache is not None and entry is not None:
+            tables = entry.pop("tables", None)
+            cache.put(cache_keys[i], entry)
+            if tables is not None:
+                cache.put(cache_keys[i] + "-tables", {"tables": tables})
+        if page_store is not None:
+            out_name = page_store.append(res["page"])
+        else:
+            out_name = save_page_json(out_dir, res["page"]).name
+        print(f"[OK] Page {i+1}/{total_pages} -> {out_name} (lines={res['n_lines']}){res['tag']}")
+        fulltext.add_page(res["page_lines"], res["legacy_chunk"])
+        if (getattr(res["page"], "meta", None) or {}).get("dpi_escalated"):
+            n_escalated += 1
+        if res["tables"]:
+            save_scan_tables(out_dir, i, res["tables"])
+
+    n_escalated = 0
+
+    # --page_format jsonl: mọi trang vào 1 file pages.jsonl + index offset (xem page_store)
+    if args.page_format == "jsonl":
+        page_store = PageStoreWriter(out_dir)
+    else:
+        page_store = None
+        for stale in (STORE_NAME, INDEX_NAME):   # store cũ sẽ che page_*.json mới với iter_pages
+            (out_dir / stale).unlink(missing_ok=True)
+
+    def _rerender_spec(orient):
+        # Đủ thông tin (picklable) để worker tự render lại trang ở --dpi khi OCR ở DPI thấp quá yếu
+        if not args.adaptive_dpi:
+            return None
+        return (str(pdf), render_dir, render_color, rotate_map, orient["deg"] if orient else 0)
+
+    # [(page_idx, dict | Future)] theo thứ tự trang; giới hạn số trang đang chờ để ảnh
+    # đã gửi sang worker không dồn lại trong RAM
+    pending = deque()
+    max_pending = max(1, args.workers or 1) + max(0, args.prefetch)
+
+    def _drain(keep: int):
+        while len(pending) > keep:
+            i, res = pending.popleft()
+            _emit(i, res if isinstance(res, dict) else res.result())
+
+    try:
+        for i in range(total_pages):
+            # ---- Nhánh A: PDF số → bỏ OCR, trích trực tiếp bằng PyMuPDF ----
+            if i not in scan_set:
+                res = _digital_page_result(doc_id, i, fitz_doc[i])
+                if pool is None:
+                    _emit(i, res)
+                else:
+                    pending.append((i, res))
+                continue
+
+            # ---- Nhánh B: PDF scan → OCR (Paddle/Tesseract) ----
+            entry = cache.get(cache_keys[i]) if i in cached else None
+            if entry is not None:
+                tables = None
+                if args.tables:
+                    t_entry = cache.get(cache_keys[i] + "-tables", count=False)
+                    if t_entry is not None:
+                        tables = t_entry["tables"]
                     else:
-                        txt, cf = str(ti or ""), 1.0
-                    out.append({"text": txt, "conf": cf, "bbox": bbox})
-                elif isinstance(it, dict):
-                    out.append({"text": str(it.get("text","") or ""), "conf": float(it.get("conf", it.get("score", 0.0)) or 0.0),
-                                "bbox": list(it.get("bbox", [0,0,0,0]))})
-            return out
-
-        for r_idx, (x_off, y_off, bgr_rot) in enumerate(regions, start=1):
-            items = None
-            try:
-                if args.engine == "auto":
-                    from .image_ops import prep_for_tesseract_from_bgr
-                    bgr_tess = prep_for_tesseract_from_bgr(bgr_rot)
-                    tess_engine = ocr_build_engine("tesseract", lang="vie+eng")
-                    items = tess_engine.extract(bgr_tess)
+                        img, orient = _next_page(i)
+                        if (entry.get("meta") or {}).get("dpi", render_dpi) != render_dpi:
+                            img = _rerender_page(_rerender_spec(orient), i, args)   # trang đã nâng DPI
+                        tables = _scan_tables(i, img)
+                        cache.put(cache_keys[i] + "-tables", {"tables": tables})
+                res = _assemble_scan_result(doc_id, i, entry["width"], entry["height"],
+                                            OcrResult.from_dict(entry["items"]), tables, meta=entry.get("meta"))
+                res["tag"] = " [cache]"
+                if pool is None:
+                    _emit(i, res)
                 else:
-                    items = engine.extract(bgr_rot)
-            except Exception as e:
-                print(f"[WARN] Page {i+1}: {args.engine} exception(part) -> {type(e).__name__}: {e}")
-
-            weak = (items is None) or (not isinstance(items, list)) or (len(items) <= 3)
-            if not weak:
-                try:
-                    avg_conf = sum(float(getattr(x, "conf", 0) if not isinstance(x, dict) else x.get("conf", 0))
-                                   for x in items) / max(len(items), 1)
-                    if avg_conf < 0.35:
-                        weak = True
-                except Exception:
-                    pass
-            if weak and args.engine == "paddle" and args.fallback:
-                print(f"[WARN] Page {i+1}: Paddle weak on a region → try Tesseract fallback")
-                tess_engine = ocr_build_engine("tesseract", lang="vie+eng")
-                from .image_ops import prep_for_tesseract_from_bgr
-                bgr_tess = prep_for_tesseract_from_bgr(bgr_rot)
-                cv2.imwrite(str(out_dir / f"debug_pre_{i+1:03d}_tesseract_part{r_idx}.png"), bgr_tess)
-                try:
-                    items = tess_engine.extract(bgr_tess)
-                except Exception as e:
-                    print(f"[ERROR] Page {i+1}: Tesseract exception(part) -> {type(e).__name__}: {e}")
-                    items = []
-
-            for obj in _to_dict_items(items):
-                x0, y0, x1, y1 = obj["bbox"]
-                obj["bbox"] = [x0 + x_off, y0 + y_off, x1 + x_off, y1 + y_off]
-                merged.append(obj)
-
-        print(f"[DEBUG] Page {i+1}: regions={len(regions)}, merged_items={len(merged)}")
-
-        page = paddle_to_page(doc_id, i, w, h, merged, min_conf=0.2)
-        out_file = save_page_json(out_dir, page)
-        print(f"[OK] Page {i+1}/{len(pages)} -> {out_file.name} (lines={len(page.lines) if hasattr(page,'lines') else 0})")
-
-        # ====== GHÉP DÒNG CHO RAW/NORM (scan) ======
-        # Ưu tiên image_to_string để có layout theo dòng ổn định
-        try:
-            config = "--oem 1 --psm 3 -c preserve_interword_spaces=1"
-            line_text = pytesseract.image_to_string(bgr_base, lang="vie+eng", config=config)
-            page_lines = [s for s in line_text.splitlines() if s.strip()]
-        except Exception:
-            page_lines = [getattr(l, "text", "") for l in getattr(page, "lines", []) if getattr(l, "text", "")]
-        paged_lines_raw.append(page_lines)
-
-        # Giữ file fulltext cũ để so sánh
-        if getattr(page, "lines", None):
-            all_txt_chunks.append("\n".join(getattr(l, "text", "") for l in page.lines if getattr(l, "text", "")))
-        else:
-            all_txt_chunks.append("\n".join(page_lines))
-
-        # Bảng (scan) nếu bật --tables
-        if args.tables:
-            try:
-                tables = detect_tables_csv(bgr_base)
-                if tables:
-                    save_scan_tables(out_dir, i, tables)
-            except Exception as e:
-                print(f"[WARN] table detect (scan) failed on page {i+1}: {e}")
-
-    # ====== Xuất 2 phiên bản RAW / NORM ======
-    write_fulltext_files(out_dir, paged_lines_raw, loose=args.norm_loose)
+                    pending.append((i, res))
+                continue
+
+            bgr_base, orient = _next_page(i)
+            if pool is None:
+                engine = get_engine(effective_engine, lang="vie+eng")
+                _emit(i, _scan_page_result(doc_id, i, bgr_base, args, engine, out_dir, orient,
+                                           _rerender_spec(orient)))
+            else:
+                pending.append((i, pool.submit(_worker_scan_page, doc_id, i, bgr_base, args, out_dir, orient,
+                                               _rerender_spec(orient))))
+                _drain(max_pending)
+            del bgr_base
+
+        _drain(0)
+        if page_store is not None:
+            page_store.close()
+    except BrokenProcessPool as e:
+        # lỗi thường của riêng tài liệu này: batch (--jobs) không được nhầm là pool của nó bị sập
+        raise PageWorkerCrashed(f"OCR page worker crashed while processing {pdf.name}") from e
+    finally:
+        fulltext.close()
+        if page_store is not None:
+            page_store.close(commit=False)   # lỗi giữa chừng → bỏ file tạm, giữ store cũ nguyên vẹn
+        if hasattr(pages, "close"):
+            pages.close()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if render_dir is not None:
+            shutil.rmtree(render_dir, ignore_errors=True)
+
+    # ====== RAW đã ghi xong theo trang → lọc header/footer từ thống kê đã gom, xuất NORM ======
+    norm_path = fulltext.finalize()
+
+    # ====== (Tuỳ chọn) sửa chính tả NORM trước khi structure_parser đọc; RAW giữ nguyên để đối chiếu ======
+    n_spell = None
+    if args.spell_index:
+        n_spell = correct_fulltext(norm_path, get_corrector(args.spell_index))
+        print(f"[INFO] Spell: {n_spell} correction(s) → {CORRECTIONS_NAME}")
+    else:
+        (out_dir / CORRECTIONS_NAME).unlink(missing_ok=True)   # log của lần chạy trước không còn đúng
+
+    timings = {"total_s": round(time.perf_counter() - t_start, 3),
+               "pages": total_pages, "pages_pdf_text": total_pages - len(scan_pages),
+               "pages_ocr": len(scan_pages)}
+    if steps_ms:
+        timings["steps_ms"] = steps_ms
+    if n_spell is not None:
+        timings["spell_corrections"] = n_spell
+    if args.adaptive_dpi:
+        timings["pages_dpi_escalated"] = n_escalated
+        print(f"[INFO] Adaptive DPI: {n_escalated}/{len(scan_pages)} scan page(s) escalated "
+              f"{args.adaptive_dpi} → {args.dpi} dpi")
+    if cache is not None:
+        st = cache.stats()
+        timings["cache"] = st
+        print(f"[INFO] OCR cache: hits={st['hits']} misses={st['misses']} "
+              f"evictions={st['evictions']} size={st['size_mb']}MB")
+    manifest.record(doc_id, pdf, pdf_md5, options, list_outputs(out_dir, since=wall_start), timings)
+    for name, sec in engine_init_stats().items():
+        print(f"[INFO] Engine init {name}: {sec:.2f}s")
+    print(f"[DONE] OCR done: {out_dir}")
+    print(f"[INFO] Full text (legacy): {LEGACY_NAME}")
+    print(f"[INFO] RAW/NORM written: fulltext_raw.txt, fulltext_norm.txt")
+    return {"doc_id": doc_id, "status": "done", "out_dir": str(out_dir), "timings": timings}
 
-    # (Tuỳ chọn) giữ file cũ để so sánh
-    fulltext_path = out_dir / "fulltext.txt"
-    fulltext_path.write_text("\n\n".join(all_txt_chunks), encoding="utf-8")
+def main():
+    args = build_arg_parser().parse_args()
 
-    if HAS_FITZ and 'fitz_doc' in locals() and fitz_doc is not None:
-        fitz_doc.close()
+    if args.input_dir:
+        from .ingest_queue import run_batch
+        sys.exit(run_batch(args))
 
-    print(f"[DONE] OCR done: {out_dir}")
-    print(f"[INFO] Full text (legacy): {fulltext_path.name}")
-    print(f"[INFO] RAW/NORM written: fulltext_raw.txt, fulltext_norm.txt")
+    pdf = Path(args.input)
+    if not pdf.exists():
+        print(f"[ERROR] Input not found: {pdf}", file=sys.stderr)
+        sys.exit(2)
+    try:
+        process_document(pdf, args)
+    except NoPagesError:
+        print("[ERROR] No pages rendered from PDF. (Thiếu Poppler trên Windows?)", file=sys.stderr)
+        print("=> Cài Poppler và truyền --poppler_path C:\\path\\to\\poppler\\bin", file=sys.stderr)
+        sys.exit(3)
 
 if __name__ == "__main__":
     main()
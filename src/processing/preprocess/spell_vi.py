@@ -0,0 +1,482 @@
+# src/processing/preprocess/spell_vi.py
+"""
+Sửa lỗi chính tả OCR tiếng Việt kiểu SymSpell (symmetric delete), chạy giữa bước ghi fulltext_norm.txt
+và structure_parser: "tiêt" → "tiết", "hoc phân" → "học phần".
+
+Chỉ sửa token KHÔNG phải âm tiết tiếng Việt hợp lệ (kho âm tiết đầy đủ src/config/vi_syllables.txt
++ luật thanh điệu): "Căn cứ", "đình chỉ", "máy khoan" đúng chính tả nên giữ nguyên dù không có trong
+lexicon. Đổi 1 âm tiết hợp lệ sang âm tiết khác chỉ khi cặp chứa nó có token hỏng (không phải âm tiết)
+và cặp từ ghép sau khi sửa đã biết, tần suất gấp pair_ratio lần cặp gốc ("hoc phân" → "học phần",
+nhưng "Phòng thí" giữ nguyên dù có "phòng thi"). Token viết hoa không đứng đầu câu (tên riêng) không bị sửa.
+
+Lexicon = âm tiết + từ ghép 2 âm tiết kèm tần suất (seed src/config/vi_lexicon_seed.txt + đếm từ
+corpus text đúng, vd fulltext_norm của PDF số). Mọi chuỗi xoá ≤ max_edit ký tự của từng mục được
+băm sẵn thành bảng CSR và lưu .npy trong 1 thư mục:
+
+  meta.json            max_edit, prefix_length, số mục, số bucket
+  terms.npy            UTF-8 của mọi mục nối liền (uint8), term_offsets.npy (n+1), term_freq.npy
+  bucket_start.npy     bucket b chiếm [start[b], start[b+1]) trong entry_hash / entry_term
+  entry_hash.npy       hash 64-bit của chuỗi xoá, entry_term.npy: id mục tương ứng
+
+Lúc chạy chỉ np.load(mmap_mode="r") → 1 token tra = vài lần băm chuỗi xoá + đọc 1 bucket (~O(1)),
+không phải nạp/dựng lại lexicon. Mặc định chỉ nhận sửa khác nhau về dấu (bỏ dấu giống hệt nhau) —
+lỗi OCR điển hình của văn bản quy chế, và không "sửa" tên riêng / từ tiếng Anh thành từ Việt.
+
+Usage:
+  python -m src.processing.preprocess.spell_vi build --out data/spell/vi --corpus data/processed
+  python -m src.processing.preprocess.spell_vi correct --index data/spell/vi \\
+      --input data/processed/<doc-id>/fulltext_norm.txt
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SEED_LEXICON = Path(__file__).resolve().parents[2] / "config" / "vi_lexicon_seed.txt"
+SYLLABLE_INVENTORY = Path(__file__).resolve().parents[2] / "config" / "vi_syllables.txt"
+CORRECTIONS_NAME = "spell_corrections.jsonl"
+INDEX_VERSION = 1
+DEFAULT_MAX_EDIT = 2
+DEFAULT_PREFIX = 7
+DEFAULT_PAIR_RATIO = 5
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+_PAGE_MARK_RE = re.compile(r"^<<<PAGE \d+>>>$")
+_SENTENCE_END = ".!?:;…)-–•*"   # ký tự (bỏ khoảng trắng) đứng trước token đầu câu / đầu mục
+
+
+def _hash(s: str) -> int:
+    # hash() của Python đổi theo process (PYTHONHASHSEED) → dùng blake2b 8 byte, ổn định trên đĩa
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _deletes(s: str, max_edit: int) -> set:
+    """s và mọi chuỗi thu được khi xoá ≤ max_edit ký tự."""
+    out, frontier = {s}, {s}
+    for _ in range(max_edit):
+        frontier = {w[:k] + w[k + 1:] for w in frontier if len(w) > 1 for k in range(len(w))} - out
+        out |= frontier
+    return out
+
+
+def _osa_distance(a: str, b: str, max_d: int) -> int:
+    """Khoảng cách Damerau (OSA); > max_d → -1 (cắt sớm theo hàng)."""
+    if abs(len(a) - len(b)) > max_d:
+        return -1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > max_d:
+            return -1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= max_d else -1
+
+
+def fold(s: str) -> str:
+    """Bỏ dấu + đ → d, chữ thường (so khớp 'chỉ khác dấu')."""
+    s = unicodedata.normalize("NFD", s.lower().replace("đ", "d"))
+    return "".join(c for c in s if unicodedata.category(c) != "Mn")
+
+
+# ---------- Âm tiết hợp lệ ----------
+# Vần viết (chưa thanh) sau phụ âm đầu thường; vần có âm đệm o/u; vần "yê..." khi không có phụ âm đầu
+_RHYMES = """a ai ao au ay ac ach am an ang anh ap at  ăc ăm ăn ăng ăp ăt  âc âm ân âng âp ât âu ây
+e ec em en eng eo ep et  ê êch êm ên ênh êp êt êu
+i ia ich im in inh ip it iu iêc iêm iên iêng iêp iêt iêu
+o oc oi om on ong op ot oong ooc  ô ôc ôi ôm ôn ông ôp ôt  ơ ơi ơm ơn ơp ơt
+u ua uc ui um un ung up ut uôc uôi uôm uôn uông uôt
+ư ưa ưc ưi ưm ưn ưng ưt ưu ươc ươi ươm ươn ương ươp ươt ươu  y""".split()
+_GLIDE_RHYMES = """oa oai oay oac oach oam oan oang oanh oap oat oăc oăm oăn oăng oăt oe oem oen oeo oet
+uân uâng uât uây uê uêch uênh uơ uy uya uych uyên uyêt uyn uynh uyp uyt uyu""".split()
+_BARE_RHYMES = "yêm yên yêng yêt yêu".split()
+_ONSETS = "b c ch d đ g gh gi h k kh l m n ng ngh nh p ph qu r s t th tr v x".split()
+_FRONT = "ieêy"
+_TONES = {"\u0300", "\u0301", "\u0303", "\u0309", "\u0323"}   # huyền, sắc, ngã, hỏi, nặng
+_STOP_TONES = {"\u0301", "\u0323"}                                # vần tắc c/ch/p/t chỉ mang sắc/nặng
+
+
+def syllable_inventory() -> set:
+    """
+    Mọi âm tiết (chưa thanh) hợp lệ theo chính tả: phụ âm đầu × vần, kèm luật c/k/q, g/gh, ng/ngh,
+    gi, qu. Thà sinh dư (bỏ sót lỗi OCR) còn hơn thiếu (sửa sai chữ đúng).
+    """
+    out = set(_RHYMES) | set(_GLIDE_RHYMES) | set(_BARE_RHYMES)
+    for c in _ONSETS:
+        for r in _RHYMES:
+            front = r[0] in _FRONT
+            if c in ("k", "gh", "ngh") and not front:
+                continue
+            if c in ("c", "g", "ng") and front:
+                continue
+            if c == "qu":
+                if r[0] not in "uưo":
+                    out.add(c + r)
+            elif c == "gi":
+                out.add(c + (r[1:] if r[0] == "i" else r))   # gi + in → "gìn", gi + iêng → "giếng"
+            else:
+                out.add(c + r)
+        for r in _GLIDE_RHYMES:
+            if c == "qu" and r[0] == "u":
+                out.add(c + r[1:])                           # qu + uyên → "quyên"
+            elif c not in ("k", "gh", "ngh", "qu", "gi"):
+                out.add(c + r)
+    return out
+
+
+def load_syllables(path: Path = SYLLABLE_INVENTORY) -> frozenset:
+    with open(path, "r", encoding="utf-8") as f:
+        return frozenset(ln.strip() for ln in f if ln.strip() and not ln.startswith("#"))
+
+
+def split_tone(word: str) -> Tuple[str, str]:
+    """'tiết' → ('tiêt', dấu sắc); dấu mũ/trăng/móc giữ lại, chỉ tách dấu thanh (không phụ thuộc vị trí đặt dấu)."""
+    chars = unicodedata.normalize("NFD", word)
+    tones = "".join(c for c in chars if c in _TONES)
+    return unicodedata.normalize("NFC", "".join(c for c in chars if c not in _TONES)), tones
+
+
+def is_syllable(word: str, inventory) -> bool:
+    """word (chữ thường) là 1 âm tiết tiếng Việt viết đúng: vần có trong kho + tối đa 1 dấu thanh hợp luật."""
+    base, tones = split_tone(word)
+    if len(tones) > 1 or base not in inventory:
+        return False
+    return not (base.endswith(("c", "ch", "p", "t")) and tones not in _STOP_TONES)
+
+
+# ---------- Lexicon ----------
+def read_lexicon(path: Path) -> Counter:
+    """File 'mục<TAB>tần suất' (mục có thể là từ ghép có dấu cách); dòng '#' là chú thích."""
+    lex = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for ln in f:
+            ln = ln.strip()
+            if not ln or ln.startswith("#"):
+                continue
+            term, _, freq = ln.rpartition("\t") if "\t" in ln else (ln, "", "1")
+            term = unicodedata.normalize("NFC", term.strip().lower())
+            if term:
+                lex[term] += int(freq or 1)
+    return lex
+
+
+def count_corpus(paths: Iterable[Path], min_count: int = 3) -> Counter:
+    """Đếm âm tiết + cặp âm tiết liền nhau trong các file .txt (bỏ marker trang)."""
+    syl, pairs = Counter(), Counter()
+    for p in paths:
+        with open(p, "r", encoding="utf-8", errors="ignore") as f:
+            for ln in f:
+                if _PAGE_MARK_RE.match(ln.strip()):
+                    continue
+                toks = [m.group().lower() for m in _TOKEN_RE.finditer(unicodedata.normalize("NFC", ln))]
+                syl.update(toks)
+                pairs.update(f"{a} {b}" for a, b in zip(toks, toks[1:]))
+    return Counter({k: v for c in (syl, pairs) for k, v in c.items() if v >= min_count})
+
+
+def _corpus_files(roots: Iterable[str]) -> List[Path]:
+    files = []
+    for r in roots:
+        p = Path(r)
+        files.extend([p] if p.is_file() else sorted(p.rglob("fulltext_norm.txt")) or sorted(p.rglob("*.txt")))
+    return files
+
+
+# ---------- Index (build / mmap) ----------
+def build_index(lexicon: Dict[str, int], out_dir: Path, max_edit: int = DEFAULT_MAX_EDIT,
+                prefix_length: int = DEFAULT_PREFIX) -> Path:
+    """Lexicon → thư mục index .npy (ghi file tạm rồi đổi tên, không để index dở dang)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    terms = sorted(lexicon)
+    blobs = [t.encode("utf-8") for t in terms]
+    offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+
+    hashes, owners = [], []
+    for tid, t in enumerate(terms):
+        for d in _deletes(t[:prefix_length], max_edit):
+            hashes.append(_hash(d))
+            owners.append(tid)
+    entry_hash = np.array(hashes, dtype=np.uint64)
+    entry_term = np.array(owners, dtype=np.uint32)
+    n_buckets = 1 << max(4, int(np.ceil(np.log2(max(1, len(entry_hash)) / 2))))
+    bucket = (entry_hash & np.uint64(n_buckets - 1)).astype(np.int64)
+    order = np.argsort(bucket, kind="stable")
+    bucket_start = np.zeros(n_buckets + 1, dtype=np.uint64)
+    bucket_start[1:] = np.cumsum(np.bincount(bucket, minlength=n_buckets))
+
+    arrays = {
+        "terms": np.frombuffer(b"".join(blobs), dtype=np.uint8),
+        "term_offsets": offsets,
+        "term_freq": np.array([lexicon[t] for t in terms], dtype=np.uint32),
+        "bucket_start": bucket_start,
+        "entry_hash": entry_hash[order],
+        "entry_term": entry_term[order],
+    }
+    for name, arr in arrays.items():
+        tmp = out_dir / f"{name}.tmp{os.getpid()}.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, out_dir / f"{name}.npy")
+    meta = {"version": INDEX_VERSION, "max_edit": max_edit, "prefix_length": prefix_length,
+            "n_terms": len(terms), "n_entries": int(len(entry_hash)), "n_buckets": n_buckets}
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return out_dir
+
+
+class SpellIndex:
+    """Index symmetric-delete đã build, đọc qua mmap."""
+
+    def __init__(self, index_dir: Path):
+        self.dir = Path(index_dir)
+        meta = json.loads((self.dir / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Spell index {self.dir}: version {meta.get('version')} != {INDEX_VERSION}, build lại")
+        self.max_edit = int(meta["max_edit"])
+        self.prefix_length = int(meta["prefix_length"])
+        load = lambda name: np.load(self.dir / f"{name}.npy", mmap_mode="r")
+        self._terms, self._offsets, self._freq = load("terms"), load("term_offsets"), load("term_freq")
+        self._start, self._hash, self._owner = load("bucket_start"), load("entry_hash"), load("entry_term")
+        self._mask = len(self._start) - 2
+        self._text: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._freq)
+
+    def term(self, tid: int) -> str:
+        s = self._text.get(tid)
+        if s is None:
+            s = self._text[tid] = bytes(self._terms[int(self._offsets[tid]):int(self._offsets[tid + 1])]).decode("utf-8")
+        return s
+
+    def freq(self, tid: int) -> int:
+        return int(self._freq[tid])
+
+    def _bucket(self, h: int) -> np.ndarray:
+        b = h & self._mask
+        lo, hi = int(self._start[b]), int(self._start[b + 1])
+        return self._owner[lo:hi][self._hash[lo:hi] == np.uint64(h)]
+
+    def candidates(self, word: str, max_edit: Optional[int] = None) -> List[Tuple[int, int]]:
+        """[(id mục, khoảng cách)] trong max_edit của `word` (chữ thường, NFC)."""
+        max_edit = self.max_edit if max_edit is None else min(max_edit, self.max_edit)
+        seen, out = set(), []
+        for d in _deletes(word[:self.prefix_length], max_edit):
+            for tid in self._bucket(_hash(d)).tolist():
+                if tid in seen:
+                    continue
+                seen.add(tid)
+                dist = _osa_distance(word, self.term(tid), max_edit)
+                if dist >= 0:
+                    out.append((tid, dist))
+        return out
+
+    def contains(self, word: str) -> bool:
+        return any(self.term(tid) == word for tid in self._bucket(_hash(word[:self.prefix_length])).tolist())
+
+
+# ---------- Sửa lỗi ----------
+def _match_case(src: str, dst: str) -> str:
+    if len(src) > 1 and src.isupper():
+        return dst.upper()
+    if src[:1].isupper():
+        return dst[:1].upper() + dst[1:]
+    return dst
+
+
+def _sentence_initial(line: str, start: int) -> bool:
+    prev = line[:start].rstrip()
+    return not prev or prev[-1] in _SENTENCE_END
+
+
+class SpellCorrector:
+    """
+    Sửa từng dòng: (1) token không phải âm tiết hợp lệ → ứng viên gần nhất là âm tiết hợp lệ
+    (khoảng cách nhỏ nhất, rồi tần suất cao nhất); (2) cặp âm tiết liền nhau không phải từ ghép đã biết
+    → từ ghép gần nhất; đổi âm tiết vốn hợp lệ chỉ khi cặp có token hỏng và tần suất cặp mới
+    ≥ pair_ratio × (cặp gốc + 1).
+    accent_only=True: chỉ nhận ứng viên có cùng dạng bỏ dấu với token.
+    """
+
+    def __init__(self, index: SpellIndex, accent_only: bool = True, min_len: int = 2,
+                 syllables=None, pair_ratio: float = DEFAULT_PAIR_RATIO):
+        self.index = index
+        self.accent_only = accent_only
+        self.min_len = min_len
+        self.syllables = load_syllables() if syllables is None else syllables
+        self.pair_ratio = pair_ratio
+        self._memo: Dict[str, Optional[Tuple[str, int, int]]] = {}
+        self._valid: Dict[str, bool] = {}
+
+    def is_valid(self, word: str) -> bool:
+        v = self._valid.get(word)
+        if v is None:
+            v = self._valid[word] = all(is_syllable(w, self.syllables) for w in word.split(" "))
+        return v
+
+    def suggest(self, word: str) -> Optional[Tuple[str, int, int]]:
+        """(mục sửa, khoảng cách, tần suất) hoặc None nếu đã đúng / không có ứng viên."""
+        if word in self._memo:
+            return self._memo[word]
+        best = None
+        if not self.index.contains(word):
+            key = fold(word) if self.accent_only else None
+            n_syl = word.count(" ")
+            for tid, dist in self.index.candidates(word):
+                term = self.index.term(tid)
+                if dist == 0 or (key is not None and fold(term) != key):
+                    continue
+                if term.count(" ") != n_syl or not self.is_valid(term):
+                    continue
+                cand = (dist, -self.index.freq(tid), term)
+                if best is None or cand < best:
+                    best = cand
+        res = None if best is None else (best[2], best[0], -best[1])
+        self._memo[word] = res
+        return res
+
+    def _pair_freq(self, pair: str) -> int:
+        b = self.index._bucket(_hash(pair[:self.index.prefix_length])).tolist()
+        return next((self.index.freq(tid) for tid in b if self.index.term(tid) == pair), 0)
+
+    def _skip(self, line: str, tok: List) -> bool:
+        # token quá ngắn, viết tắt IN HOA không dấu (UIT, GPA...), chữ hoa giữa câu (tên riêng): không sửa
+        text = tok[2]
+        if len(text) < self.min_len or (text.isupper() and text.isascii()):
+            return True
+        return text[:1].isupper() and not _sentence_initial(line, tok[0])
+
+    def correct_line(self, line: str) -> Tuple[str, List[dict]]:
+        toks = [[m.start(), m.end(), m.group()] for m in _TOKEN_RE.finditer(line)]
+        skip = [self._skip(line, t) for t in toks]
+        broken = [not sk and not self.is_valid(t[2].lower()) for t, sk in zip(toks, skip)]
+        fixes = []
+        for t, bad in zip(toks, broken):
+            if not bad:
+                continue
+            s = self.suggest(t[2].lower())
+            if s is not None:
+                fixes.append({"original": t[2], "correction": _match_case(t[2], s[0]),
+                              "distance": s[1], "freq": s[2], "kind": "syllable", "col": t[0]})
+                t[2] = fixes[-1]["correction"]
+        # cặp âm tiết cách nhau đúng 1 dấu cách → thử từ ghép
+        k = 0
+        while k + 1 < len(toks):
+            a, b = toks[k], toks[k + 1]
+            if line[a[1]:b[0]] == " " and not (skip[k] or skip[k + 1]):
+                pair = f"{a[2]} {b[2]}"
+                s = self.suggest(pair.lower())
+                if s is not None and self._pair_guard(pair.lower(), s, broken[k] or broken[k + 1]):
+                    fixed = _match_case(a[2], s[0].split(" ", 1)[0]), _match_case(b[2], s[0].split(" ", 1)[1])
+                    fixes.append({"original": pair, "correction": " ".join(fixed),
+                                  "distance": s[1], "freq": s[2], "kind": "word", "col": a[0]})
+                    a[2], b[2] = fixed
+                    k += 2
+                    continue
+            k += 1
+        if not fixes:
+            return line, fixes
+        out, pos = [], 0
+        for start, end, text in toks:
+            out.append(line[pos:start])
+            out.append(text)
+            pos = end
+        out.append(line[pos:])
+        return "".join(out), fixes
+
+    def _pair_guard(self, pair: str, s: Tuple[str, int, int], broken: bool) -> bool:
+        """Cặp có âm tiết hợp lệ bị đổi: chỉ sửa khi cặp có token hỏng và cặp mới phổ biến hơn hẳn cặp gốc."""
+        changed = [w for w, c in zip(pair.split(" "), s[0].split(" ")) if w != c]
+        if not any(self.is_valid(w) for w in changed):
+            return True
+        return broken and s[2] >= self.pair_ratio * (self._pair_freq(pair) + 1)
+
+
+_CORRECTORS: Dict[Tuple[str, bool], SpellCorrector] = {}
+
+def get_corrector(index_dir, accent_only: bool = True) -> SpellCorrector:
+    """Mỗi process mở index (mmap) 1 lần, dùng lại cho mọi tài liệu (như ocr.registry.get_engine)."""
+    key = (str(Path(index_dir).resolve()), accent_only)
+    if key not in _CORRECTORS:
+        _CORRECTORS[key] = SpellCorrector(SpellIndex(Path(index_dir)), accent_only=accent_only)
+    return _CORRECTORS[key]
+
+
+def correct_fulltext(path: Path, corrector: SpellCorrector, log_path: Optional[Path] = None) -> int:
+    """Sửa 1 file fulltext (giữ marker <<<PAGE n>>>), ghi đè nguyên tử; log JSONL mỗi lần sửa. Trả số lần sửa."""
+    path = Path(path)
+    log_path = Path(log_path) if log_path else path.parent / CORRECTIONS_NAME
+    tmp = path.with_suffix(f".spell{os.getpid()}")
+    n_fix, page = 0, 0
+    with open(path, "r", encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst, \
+            open(log_path, "w", encoding="utf-8") as log:
+        for n, ln in enumerate(src, 1):
+            body = ln.rstrip("\n")
+            if _PAGE_MARK_RE.match(body):
+                page = int(body[8:-3])
+                dst.write(ln)
+                continue
+            fixed, fixes = corrector.correct_line(body)
+            for fx in fixes:
+                log.write(json.dumps({"page": page, "line": n, **fx}, ensure_ascii=False) + "\n")
+            n_fix += len(fixes)
+            dst.write(fixed + ln[len(body):])
+    os.replace(tmp, path)
+    return n_fix
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sửa lỗi chính tả OCR tiếng Việt (SymSpell)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Build index symmetric-delete từ seed lexicon + corpus")
+    b.add_argument("--out", required=True, help="Thư mục index (.npy)")
+    b.add_argument("--seed", default=str(SEED_LEXICON), help="Lexicon seed 'mục<TAB>tần suất' ('' = bỏ)")
+    b.add_argument("--corpus", nargs="*", default=[], help="File/thư mục .txt (ưu tiên fulltext_norm.txt)")
+    b.add_argument("--min_count", type=int, default=3, help="Tần suất tối thiểu để lấy mục từ corpus")
+    b.add_argument("--max_edit", type=int, default=DEFAULT_MAX_EDIT)
+    b.add_argument("--prefix_length", type=int, default=DEFAULT_PREFIX)
+    c = sub.add_parser("correct", help="Sửa 1 file fulltext tại chỗ + ghi log JSONL")
+    c.add_argument("--index", required=True)
+    c.add_argument("--input", required=True)
+    c.add_argument("--log", default=None, help=f"Mặc định: {CORRECTIONS_NAME} cạnh file input")
+    c.add_argument("--any_edit", action="store_true", help="Nhận cả sửa khác chữ (mặc định chỉ khác dấu)")
+    c.add_argument("--pair_ratio", type=float, default=DEFAULT_PAIR_RATIO,
+                   help="Đổi âm tiết hợp lệ theo từ ghép khi tần suất cặp mới ≥ ratio × (cặp gốc + 1)")
+    y = sub.add_parser("syllables", help="Sinh lại kho âm tiết (chưa thanh) từ luật chính tả")
+    y.add_argument("--out", default=str(SYLLABLE_INVENTORY))
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        lex = read_lexicon(Path(args.seed)) if args.seed else Counter()
+        files = _corpus_files(args.corpus)
+        lex.update(count_corpus(files, min_count=args.min_count))
+        if not lex:
+            raise SystemExit("[ERROR] Lexicon rỗng: cần --seed và/hoặc --corpus")
+        out = build_index(lex, Path(args.out), max_edit=args.max_edit, prefix_length=args.prefix_length)
+        print(f"[INFO] Spell index: {len(lex)} term(s) from seed + {len(files)} corpus file(s) → {out}")
+    elif args.cmd == "syllables":
+        inv = sorted(syllable_inventory())
+        header = ("# Kho âm tiết tiếng Việt (chưa dấu thanh) cho spell_vi.is_syllable; sinh bằng:\n"
+                  "#   python -m src.processing.preprocess.spell_vi syllables\n")
+        Path(args.out).write_text(header + "\n".join(inv) + "\n", encoding="utf-8")
+        print(f"[INFO] {len(inv)} syllable(s) → {args.out}")
+    else:
+        corrector = SpellCorrector(SpellIndex(Path(args.index)), accent_only=not args.any_edit,
+                                   pair_ratio=args.pair_ratio)
+        n = correct_fulltext(Path(args.input), corrector, Path(args.log) if args.log else None)
+        print(f"[INFO] Spell: {n} correction(s) in {args.input}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
 # utils_text.py
-import re, csv
+import re, csv, unicodedata
+from collections import Counter
 from pathlib import Path
+from typing import Dict, List, Optional
 
-_DOTS_LEADER = re.compile(r"\.{3,}")
-_MULTI_SPACE = re.compile(r"[ \t\u00A0]{2,}")
+from src.config.regex_patterns import STRUCT_FOLD_RE, STRUCT_RE, strip_accents
 
 _WHITELIST_STARTS = (
     "QUYẾT ĐỊNH", "QUY DINH", "QUY CHE", "Căn cứ", "Can cu",
@@ -18,14 +19,71 @@ def _looks_like_header_footer(line: str) -> bool:
             "CỘNG HÒA XÃ HỘI", "CONG HOA XA HOI", "Trang ", "Page ")
     return any(t in s for t in toks)
 
+# ---------- Chuẩn hoá dòng: pipeline khai báo, compile 1 lần ----------
+# Lỗi nhận dạng hay gặp ở văn bản tiếng Việt: Ð/ð (U+00D0/U+00F0, eth) thay cho Đ/đ (U+0110/U+0111)
+OCR_CONFUSIONS = {"\u00D0": "\u0110", "\u00F0": "\u0111"}
+
+# (tên, pattern, thay thế, chuỗi kích hoạt) — chạy theo thứ tự trên cả khối nhiều dòng (re.M),
+# bỏ qua rule khi khối không chứa chuỗi kích hoạt. Không pattern nào được vượt qua "\n":
+# khoảng trắng dùng [^\S\n] / [ \t\u00A0] thay cho \s. Cắt khoảng trắng 2 đầu làm sau cùng, theo dòng.
+NORMALIZE_RULES = (
+    ("dot_leader",  r"\.{3,}",                  "",   "..."),   # bỏ ........
+    ("end_mark",    r"\./\.",                   ".",  "./."),   # ./.
+    # Hạnh- phúc -> Hạnh phúc (bản cũ nối liền thành "Hạnhphúc" — sai với âm tiết tiếng Việt)
+    ("hyphenation", r"-(?<=\w-)[^\S\n]+(?=\w)",  " ",  "-"),
+    ("multi_space", r"[ \t\u00A0]{2,}",          " ",  None),
+    ("table_bar",   r"^\|[^\S\n]*",             "",   "|"),     # bỏ '|' đầu dòng
+)
+_COMPILED_RULES = tuple((name, re.compile(pat, re.M), repl, trigger)
+                        for name, pat, repl, trigger in NORMALIZE_RULES)
+
+def _normalize_block(text: str) -> str:
+    """NFC → sửa ký tự nhầm → các rule regex → strip từng dòng; `text` có thể là nhiều dòng nối bằng "\n"."""
+    if not unicodedata.is_normalized("NFC", text):
+        text = unicodedata.normalize("NFC", text)
+    for bad, good in OCR_CONFUSIONS.items():   # str.replace nhanh hơn hẳn str.translate với chuỗi Unicode
+        if bad in text:
+            text = text.replace(bad, good)
+    for _, rx, repl, trigger in _COMPILED_RULES:
+        if trigger is None or trigger in text:
+            text = rx.sub(repl, text)
+    return "\n".join([ln.strip() for ln in text.split("\n")])
+
 def _normalize_line(s: str) -> str:
-    s = s.rstrip()
-    s = _DOTS_LEADER.sub("", s)                     # bỏ ........
-    s = s.replace("./.", ".")                       # ./.
-    s = re.sub(r"(\w)-\s+\b", r"\1", s)             # Hạnh- phúc -> Hạnh phúc
-    s = _MULTI_SPACE.sub(" ", s)                    # co space
-    s = re.sub(r"^\|\s*", "", s)                    # bỏ '|' đầu dòng
-    return s.strip()
+    return _normalize_block(s.replace("\n", " "))
+
+class LineNormalizer:
+    """
+    Chuẩn hoá theo lô có nhớ: mỗi dòng khác nhau chỉ chuẩn hoá 1 lần cho cả tài liệu
+    (RAW và NORM dùng chung; header/footer lặp lại mỗi trang cũng chỉ tính 1 lần).
+    Các dòng chưa có trong memo được nối lại và chạy pipeline 1 lần cho cả lô.
+    """
+
+    def __init__(self, memo: Optional[Dict[str, str]] = None):
+        self.memo: Dict[str, str] = {} if memo is None else memo
+        self.hits = 0
+
+    def batch(self, lines: List[str]) -> List[str]:
+        memo = self.memo
+        misses = list(dict.fromkeys(s for s in lines if s not in memo))
+        self.hits += len(lines) - len(misses)
+        if misses:
+            # dòng chứa sẵn "\n" (hiếm) → nối bằng "\n" sẽ lệch số dòng → chạy riêng
+            flat = [s for s in misses if "\n" not in s]
+            if flat:
+                # NFC theo dòng (chỉ dòng chưa chuẩn): 1 dòng tách dấu không kéo cả trang qua normalize
+                nfc = [s if unicodedata.is_normalized("NFC", s) else unicodedata.normalize("NFC", s) for s in flat]
+                memo.update(zip(flat, _normalize_block("\n".join(nfc)).split("\n")))
+            for s in misses:
+                if "\n" in s:
+                    memo[s] = _normalize_line(s)
+        return [memo[s] for s in lines]
+
+    def __call__(self, s: str) -> str:
+        return self.batch([s])[0]
+
+def _drop_obvious(L):
+    return [s for s in L if not _looks_like_header_footer(s)]
 
 def drop_repeating_headers_footers(paged_lines, loose=False):
     """
@@ -34,77 +92,182 @@ def drop_repeating_headers_footers(paged_lines, loose=False):
     """
     if loose or len(paged_lines) <= 3:
         # chỉ bỏ dòng “rõ ràng” là header/footer
-        out = []
-        for L in paged_lines:
-            kept = []
-            for s in L:
-                if _looks_like_header_footer(s):
-                    continue
-                kept.append(s)
-            out.append(kept)
-        return out
-
-    # Mặc định (tài liệu dài): thống kê lặp lại >=60% số trang
-    from collections import Counter
-    head_cand, foot_cand = Counter(), Counter()
-    for L in paged_lines:
-        if L:
-            head_cand[L[0]] += 1
-            foot_cand[L[-1]] += 1
-        if len(L) >= 2:
-            head_cand[" ".join(L[:2])] += 1
-            foot_cand[" ".join(L[-2:])] += 1
-
-    th = max(2, int(0.6 * len(paged_lines)))
-    heads = {k for k, v in head_cand.items() if v >= th}
-    foots = {k for k, v in foot_cand.items() if v >= th}
-
-    out = []
+        return [_drop_obvious(L) for L in paged_lines]
+
+    # Mặc định (tài liệu dài): dòng ở mép trang lặp lại >= 60% số trang → header/footer
+    freq = Counter()
     for L in paged_lines:
-        joined = " ".join(L)
-        for token in sorted(heads | foots, key=len, reverse=True):
-            joined = joined.replace(token, "")
-        # tách lại thành dòng “thô”
-        tmp = [x.strip() for x in joined.split("  ") if x.strip()]
-        out.append(tmp)
+        _count_edge_lines(freq, L)
+    repeated, rx = _compile_repeated(freq, _repeat_threshold(len(paged_lines)))
+    return [_strip_edges(L, repeated, rx) for L in paged_lines]
+
+def _repeat_threshold(n_pages: int) -> int:
+    return max(2, int(0.6 * n_pages))
+
+HF_ZONE = 3                      # số dòng đầu/cuối trang được xem là vùng header/footer
+_DIGIT_RUN = re.compile(r"\d+")
+_NUM_MARK = "\x00"
+# Dạng số trang (trên khoá đã chữ thường + gộp khoảng trắng): "trang 3", "trang 3/10", "page 3 of 10",
+# "- 3 -", "3/10", "3". Chỉ các dòng này được che số (số đổi theo trang → coi như 1 khoá) và cắt dính.
+_PAGE_NO_RE = re.compile(r"^(?:(?:trang|page|tr\.)\s*)?[-–—]?\s*\d+\s*(?:(?:/|of|trên)\s*\d+)?\s*[-–—]?$")
+_HAS_LETTER = re.compile(r"[^\W\d_]")
+
+def _is_structural(line: str) -> bool:
+    # Chương/Điều/khoản "1. ..."/điểm "a) ..." (có dấu hoặc mất dấu): không bao giờ là header/footer
+    return bool(STRUCT_RE.match(line) or STRUCT_FOLD_RE.match(strip_accents(line)))
+
+def _line_key(line: str) -> str:
+    """
+    Khoá băm của 1 dòng: chữ thường, gộp khoảng trắng; dạng số trang thì mọi dãy số → 1 ký hiệu.
+    Dòng cấu trúc (Chương/Điều/khoản/điểm) → "" (không bao giờ được đếm/bỏ).
+    """
+    key = " ".join(line.lower().split())
+    if _PAGE_NO_RE.match(key):
+        return _DIGIT_RUN.sub(_NUM_MARK, key)
+    return "" if _is_structural(line) else key
+
+def _key_pattern(key: str) -> str:
+    return re.escape(key).replace(_NUM_MARK, r"\d+").replace(r"\ ", r"\s+")
+
+def _edge_lines(L):
+    return L if len(L) <= 2 * HF_ZONE else L[:HF_ZONE] + L[-HF_ZONE:]
+
+def _count_edge_lines(freq: Counter, L) -> None:
+    """Cộng thống kê 1 trang: mỗi khoá dòng mép trang tính tối đa 1 lần/trang."""
+    freq.update({_line_key(s) for s in _edge_lines(L)} - {""})
+
+def _compile_repeated(freq: Counter, th: int):
+    """
+    (tập khoá lặp >= th trang, regex alternation của các khoá số trang có chữ, vd "trang N").
+    Regex chỉ khớp ở đầu/cuối dòng: bắt số trang dính vào dòng (vd "Điều 5. Học phí Trang 3");
+    header chữ và khoá chỉ gồm số chỉ bỏ khi trùng trọn dòng, để không cắt mất nội dung.
+    """
+    repeated = {k for k, v in freq.items() if v >= th}
+    worded = [k for k in repeated if _NUM_MARK in k and _HAS_LETTER.search(k)]
+    if not worded:
+        return repeated, None
+    # dài trước để alternation ưu tiên khớp header dài nhất
+    alt = "|".join(_key_pattern(k) for k in sorted(worded, key=len, reverse=True))
+    return repeated, re.compile(rf"^\s*(?:{alt})(?:\s+|$)|\s+(?:{alt})\s*$", re.IGNORECASE)
+
+def _strip_edges(L, repeated, rx):
+    """1 lượt qua vùng mép trang: trùng khoá → bỏ dòng; header dính đầu/cuối dòng → cắt phần khớp."""
+    n, out = len(L), []
+    for k, s in enumerate(L):
+        if k < HF_ZONE or k >= n - HF_ZONE:
+            if _line_key(s) in repeated:
+                continue
+            if rx is not None:
+                s2, hits = rx.subn("", s)
+                if hits:
+                    if not s2.strip():
+                        continue
+                    s = s2.strip()
+        out.append(s)
     return out
 
+RAW_NAME = "fulltext_raw.txt"
+NORM_NAME = "fulltext_norm.txt"
+LEGACY_NAME = "fulltext.txt"
+_RAW_PAGE_RE = re.compile(r"^<<<PAGE (\d+)>>>$")
+
+class FulltextWriter:
+    """
+    Ghi fulltext theo luồng, mỗi trang xong là ghi ngay (không giữ cả tài liệu trong RAM):
+      - add_page: append RAW (đã chuẩn hoá) + fulltext.txt cũ (tuỳ chọn), flush; cộng thống kê
+        dòng mép trang cho header/footer
+      - finalize: đọc lại RAW từng trang, bỏ header/footer theo thống kê đã gom → ghi NORM
+    Lỗi giữa chừng (close() không finalize): RAW/fulltext.txt đã ghi tới trang cuối cùng vẫn còn.
+    """
+
+    def __init__(self, processed_dir: Path, loose: bool = False, legacy: bool = False,
+                 memo_max: int = 100_000):
+        self.dir = Path(processed_dir)
+        self.loose = loose
+        self.n_pages = 0
+        self._freq = Counter()
+        self._memo_max = memo_max
+        self._normalize = LineNormalizer()
+        self._raw = open(self.dir / RAW_NAME, "w", encoding="utf-8")
+        self._legacy = open(self.dir / LEGACY_NAME, "w", encoding="utf-8") if legacy else None
+
+    def add_page(self, lines: List[str], legacy_chunk: Optional[str] = None) -> None:
+        if len(self._normalize.memo) > self._memo_max:   # giữ memo có giới hạn với tài liệu rất dài
+            self._normalize.memo.clear()
+        norm = self._normalize.batch(lines)
+        self.n_pages += 1
+        self._raw.write(f"<<<PAGE {self.n_pages}>>>\n")
+        self._raw.writelines(ss + "\n" for ss in norm)
+        self._raw.flush()
+        _count_edge_lines(self._freq, norm)
+        if self._legacy is not None:
+            self._legacy.write(("\n\n" if self.n_pages > 1 else "") + (legacy_chunk or ""))
+            self._legacy.flush()
+
+    def close(self) -> None:
+        for f in (self._raw, self._legacy):
+            if f is not None and not f.closed:
+                f.close()
+
+    def _iter_raw_pages(self):
+        page, lines = None, []
+        with open(self.dir / RAW_NAME, "r", encoding="utf-8") as f:
+            for ln in f:
+                ln = ln.rstrip("\n")
+                m = _RAW_PAGE_RE.match(ln)
+                if m:
+                    if page is not None:
+                        yield page, lines
+                    page, lines = int(m.group(1)), []
+                else:
+                    lines.append(ln)
+        if page is not None:
+            yield page, lines
+
+    def finalize(self) -> Path:
+        """Đóng RAW rồi ghi NORM bằng cách stream lại RAW (RAM chỉ giữ 1 trang)."""
+        self.close()
+        strong = not (self.loose or self.n_pages <= 3)
+        repeated, rx = (_compile_repeated(self._freq, _repeat_threshold(self.n_pages))
+                        if strong else (set(), None))
+        norm_path = self.dir / NORM_NAME
+        first = True
+        with open(norm_path, "w", encoding="utf-8") as out:
+            for p, L in self._iter_raw_pages():
+                L = _strip_edges(L, repeated, rx) if strong else _drop_obvious(L)
+                # giữ whitelisted lines bất kể có giống header/footer
+                kept = []
+                for ss in L:
+                    if not ss:
+                        continue
+                    if any(ss.upper().startswith(w.upper()) for w in _WHITELIST_STARTS):
+                        kept.append(ss)
+                    else:
+                        kept.append(ss)
+                if kept:
+                    out.write(("" if first else "\n") + f"<<<PAGE {p}>>>")
+                    first = False
+                    # bỏ dòng trống liên tiếp
+                    prev_blank = False
+                    for line in kept:
+                        blank = (line.strip() == "")
+                        if blank and prev_blank:
+                            continue
+                        out.write("\n" + line)
+                        prev_blank = blank
+        return norm_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.close()
+
 def write_fulltext_files(processed_dir: Path, paged_lines_raw, loose=False):
-    raw_path  = processed_dir / "fulltext_raw.txt"
-    norm_path = processed_dir / "fulltext_norm.txt"
-
-    # RAW
-    with raw_path.open("w", encoding="utf-8") as f:
-        for p, L in enumerate(paged_lines_raw, 1):
-            f.write(f"<<<PAGE {p}>>>\n")
-            for s in L:
-                f.write(_normalize_line(s) + "\n")
-
-    # Clean header/footer
-    cleaned_pages = drop_repeating_headers_footers(paged_lines_raw, loose=loose)
-
-    # NORM
-    norm_lines = []
-    for p, L in enumerate(cleaned_pages, 1):
-        # giữ whitelisted lines bất kể có giống header/footer
-        kept = []
-        for s in L:
-            ss = _normalize_line(s)
-            if not ss:
-                continue
-            if any(ss.upper().startswith(w.upper()) for w in _WHITELIST_STARTS):
-                kept.append(ss)
-            else:
-                kept.append(ss)
-        if kept:
-            norm_lines.append(f"<<<PAGE {p}>>>")
-            # bỏ dòng trống liên tiếp
-            prev_blank = False
-            for line in kept:
-                blank = (line.strip() == "")
-                if blank and prev_blank:
-                    continue
-                norm_lines.append(line)
-                prev_blank = blank
-
-    norm_path.write_text("\n".join(norm_lines), encoding="utf-8")
+    """Ghi RAW/NORM cho cả tài liệu đã có sẵn trong RAM (wrapper của FulltextWriter)."""
+    with FulltextWriter(processed_dir, loose=loose) as writer:
+        for L in paged_lines_raw:
+            writer.add_page(L)
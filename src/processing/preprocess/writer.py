@@ -1,182 +1,185 @@
 # src/processing/preprocess/writer.py
+import bisect
 import json
 import dataclasses
 from dataclasses import asdict
 from pathlib import Path
-from typing import List, Tuple, Any, Dict, Iterable
-from .page_schema import PageText, Line, Word
+from typing import Dict, List
+import numpy as np
 
-# ========== NEW: helpers nhận dạng dict từ paddlex/pipeline ==========
-def _dict_get(d: Dict, *keys, default=None):
-    for k in keys:
-        if k in d:
-            return d[k]
-    return default
+from .page_schema import OcrResult, PageColumns, PageText, Line, Word
 
-def _poly_to_bbox(poly: Iterable) -> Tuple[float, float, float, float]:
-    try:
-        xs, ys = [], []
-        # poly có thể là [(x,y),...], hoặc {"points":[[x,y],...]}
-        if isinstance(poly, dict):
-            pts = _dict_get(poly, "points", "poly", "polygon", "quad", default=None)
-            if pts is None:
-                return (0.0, 0.0, 0.0, 0.0)
-            for p in pts:
-                xs.append(float(p[0])); ys.append(float(p[1]))
-        else:
-            for p in poly:
-                xs.append(float(p[0])); ys.append(float(p[1]))
-        return (min(xs), min(ys), max(xs), max(ys))
-    except Exception:
-        return (0.0, 0.0, 0.0, 0.0)
 
-def _bbox_like(obj: Any) -> Tuple[float, float, float, float]:
-    # hỗ trợ nhiều kiểu: (x0,y0,x1,y1) hoặc dict {"x0":..} / {"bbox":[x0,y0,x1,y1]} / {"rect":{...}} ...
-    try:
-        if isinstance(obj, (list, tuple)) and len(obj) == 4:
-            return float(obj[0]), float(obj[1]), float(obj[2]), float(obj[3])
-        if isinstance(obj, dict):
-            if "bbox" in obj and isinstance(obj["bbox"], (list, tuple)) and len(obj["bbox"]) == 4:
-                x0,y0,x1,y1 = obj["bbox"]; return float(x0), float(y0), float(x1), float(y1)
-            if {"x0","y0","x1","y1"}.issubset(obj.keys()):
-                return float(obj["x0"]), float(obj["y0"]), float(obj["x1"]), float(obj["y1"])
-            # một số pipeline trả "poly"/"points"
-            poly = _dict_get(obj, "points", "poly", "polygon", "quad", default=None)
-            if poly is not None:
-                return _poly_to_bbox(poly)
-    except Exception:
-        pass
-    return (0.0, 0.0, 0.0, 0.0)
-
-# ========== NEW: normalize mọi định dạng paddle_result về list of (bbox, text, conf) ==========
-def _flatten_paddle_result(paddle_result: Any) -> List[Tuple[Tuple[float,float,float,float], str, float]]:
+def items_to_line_texts(result: OcrResult) -> List[str]:
     """
-    Trả về danh sách (bbox, text, conf) từ nhiều biến thể output:
-      - Cổ điển: [ [poly, (text, conf)], ... ]
-      - Paddlex dict: mỗi phần tử có thể là dict với keys: text/label, score/conf, bbox/poly/points
-      - List 'per-page': [[...page0...], [...page1...]]
+    Ghép kết quả OCR thành các dòng text theo thứ tự đọc.
+      - Có id block/par/line (Tesseract image_to_data): gom theo id, giữ thứ tự của Tesseract
+      - Không có (Paddle): gom theo hình học — chồng lấn dọc ≥ 50% chiều cao nhỏ hơn → cùng dòng
     """
-    out: List[Tuple[Tuple[float,float,float,float], str, float]] = []
+    keep = np.flatnonzero(np.fromiter(map(bool, result.text), dtype=bool, count=len(result.text)))
+    if not len(keep):
+        return []
+    texts = [result.text[k] for k in keep.tolist()]
 
-    if paddle_result is None:
-        return out
+    if result.ids is not None:
+        ids = result.ids[keep]
+        # chỗ đổi id dòng giữa 2 word liên tiếp → ranh giới dòng
+        cuts = (np.flatnonzero((ids[1:] != ids[:-1]).any(axis=1)) + 1).tolist()
+        return [" ".join(texts[a:b]) for a, b in zip([0] + cuts, cuts + [len(texts)])]
+
+    # Paddle: gom dòng theo hình học + thứ tự đọc theo cột (build_lines)
+    cols = PageColumns("", 0, 0, 0, texts, result.bbox[keep], np.zeros(len(texts)))
+    return [l.text for l in build_lines(cols)]
 
-    # case: per-page list [[...], [...]]
-    if isinstance(paddle_result, list) and paddle_result and isinstance(paddle_result[0], list):
-        # nối phẳng luôn — caller sẽ chọn page tương ứng nếu muốn
-        items = []
-        for page_items in paddle_result:
-            items.extend(page_items or [])
-    else:
-        items = paddle_result if isinstance(paddle_result, list) else [paddle_result]
-
-    for it in items:
-        # (A) Cổ điển: [poly, (text, conf), ...]
-        if isinstance(it, (list, tuple)) and len(it) >= 2:
-            bbox_pts = it[0]
-            text_info = it[1]
-            text, conf = "", 0.0
-            if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
-                text, conf = text_info[0], text_info[1]
-            elif isinstance(text_info, dict):
-                text = _dict_get(text_info, "text", "label", default="")
-                conf = _dict_get(text_info, "score", "conf", "confidence", default=1.0) or 0.0
-            bbox = _poly_to_bbox(bbox_pts)
-            try:
-                conf = float(conf)
-            except Exception:
-                conf = 0.0
-            if text is None:
-                text = ""
-            out.append((bbox, str(text).strip(), conf))
-            continue
-
-        # (B) Dict-style (paddlex / structure / custom)
-        if isinstance(it, dict):
-            text = _dict_get(it, "text", "label", "value", default="")
-            conf = _dict_get(it, "score", "conf", "confidence", default=1.0) or 0.0
-            bbox = _bbox_like(it)
-            try:
-                conf = float(conf)
-            except Exception:
-                conf = 0.0
-
-            # Nếu text là 1 đoạn nhiều dòng → tách thành từng dòng
-            if isinstance(text, str):
-                lines = [t.strip() for t in text.splitlines() if t.strip()]
-                if lines:
-                    for ln in lines:
-                        out.append((bbox, ln, conf))
-                else:
-                    out.append((bbox, "", conf))
-            else:
-                out.append((bbox, str(text), conf))
-            continue
-
-        # (C) Fallback: chuỗi trơn
-        if isinstance(it, str):
-            out.append(((0.0,0.0,0.0,0.0), it.strip(), 1.0))
 
+# ---------- Gom word box → dòng + thứ tự đọc theo cột ----------
+LINE_OVERLAP = 0.5       # chồng lấn dọc tối thiểu (theo chiều cao box nhỏ hơn) để cùng dòng
+WORD_GAP_K = 2.0         # khoảng trống ngang > K × chiều cao chữ → tách thành đoạn dòng riêng
+SPAN_RATIO = 0.6         # đoạn dòng rộng hơn tỉ lệ này của vùng chữ không dùng để dò khe cột
+MIN_COLUMN_RATIO = 0.25  # cột hẹp hơn (vd cột bảng) → không coi là layout nhiều cột
+MAX_COLUMNS = 3
+
+
+def _sweep_rows(bbox: np.ndarray) -> List[List[int]]:
+    """
+    Quét theo tâm y (sort O(n log n)): box chồng lấn dọc đủ với 1 dòng đang mở thì nhập vào dòng đó.
+    Dòng có đáy ở trên đỉnh box hiện tại được đóng lại → danh sách dòng mở luôn nhỏ.
+    """
+    cy = (bbox[:, 1] + bbox[:, 3]) / 2.0
+    rows: List[List[int]] = []
+    open_rows: List[list] = []   # [y0, y1, members]
+    for k in np.argsort(cy, kind="stable").tolist():
+        y0, y1 = bbox[k, 1], bbox[k, 3]
+        open_rows = [r for r in open_rows if r[1] > y0]
+        best, best_ov = None, 0.0
+        for r in open_rows:
+            ov = min(r[1], y1) - max(r[0], y0)
+            if ov >= LINE_OVERLAP * max(1.0, min(r[1] - r[0], y1 - y0)) and ov > best_ov:
+                best, best_ov = r, ov
+        if best is None:
+            best = [y0, y1, []]
+            open_rows.append(best)
+            rows.append(best[2])
+        else:
+            best[0], best[1] = min(best[0], y0), max(best[1], y1)
+        best[2].append(k)
+    return rows
+
+
+def _split_by_gap(members: List[int], bbox: np.ndarray) -> List[List[int]]:
+    """Sắp word theo x; khoảng trống lớn (khe cột, tab) → tách thành nhiều đoạn dòng."""
+    members = sorted(members, key=lambda k: bbox[k, 0])
+    h = float(np.median(bbox[members, 3] - bbox[members, 1]))
+    segs, cur, right = [], [members[0]], bbox[members[0], 2]
+    for k in members[1:]:
+        if bbox[k, 0] - right > WORD_GAP_K * max(1.0, h):
+            segs.append(cur)
+            cur = []
+        cur.append(k)
+        right = max(right, bbox[k, 2])
+    segs.append(cur)
+    return segs
+
+
+def _column_gutters(boxes: np.ndarray) -> List[float]:
+    """
+    Khe giữa các cột: vùng x gần như không bị đoạn dòng "hẹp" nào phủ (độ phủ tính bằng
+    mảng hiệu + cumsum, O(n + W)). Trả [] nếu trang 1 cột hoặc các "cột" quá hẹp (bảng).
+    """
+    if len(boxes) < 6:
+        return []
+    cx0, cx1 = float(boxes[:, 0].min()), float(boxes[:, 2].max())
+    cw = int(np.ceil(cx1 - cx0))
+    if cw < 10:
+        return []
+    narrow = boxes[(boxes[:, 2] - boxes[:, 0]) < SPAN_RATIO * cw]
+    if len(narrow) < 6:
+        return []
+    diff = np.zeros(cw + 2, dtype=np.int64)
+    np.add.at(diff, np.clip(np.floor(narrow[:, 0] - cx0).astype(np.int64), 0, cw), 1)
+    np.add.at(diff, np.clip(np.ceil(narrow[:, 2] - cx0).astype(np.int64), 0, cw), -1)
+    low = np.cumsum(diff)[:cw + 1] <= int(0.03 * len(narrow))
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], low.astype(np.int8), [0]))))
+    min_gutter = max(1.5 * float(np.median(narrow[:, 3] - narrow[:, 1])), 0.01 * cw)
+    runs = [(b - a, (a + b) / 2.0) for a, b in zip(edges[::2], edges[1::2])
+            if a > 0 and b < cw + 1 and b - a >= min_gutter]          # bỏ lề trái/phải
+    gutters = sorted(c for _, c in sorted(runs, reverse=True)[:MAX_COLUMNS - 1])
+    bounds = [0.0] + gutters + [float(cw)]
+    if any(b - a < MIN_COLUMN_RATIO * cw for a, b in zip(bounds, bounds[1:])):
+        return []
+    return [cx0 + g for g in gutters]
+
+
+def _reading_order(boxes: np.ndarray) -> List[int]:
+    """
+    Thứ tự đọc: trên-dưới theo tâm y; nếu có nhiều cột thì đọc hết cột trái rồi mới sang cột phải.
+    Dòng vắt qua khe cột (tiêu đề, đoạn full-width) là ranh giới giữa các khối cột.
+    """
+    order = np.lexsort((boxes[:, 0], (boxes[:, 1] + boxes[:, 3]) / 2.0)).tolist()
+    gutters = _column_gutters(boxes)
+    if not gutters:
+        return order
+    out: List[int] = []
+    buckets: List[List[int]] = [[] for _ in range(len(gutters) + 1)]
+    for k in order:
+        x0, x1 = boxes[k, 0], boxes[k, 2]
+        if any(x0 < g < x1 for g in gutters):
+            for b in buckets:
+                out.extend(b)
+                b.clear()
+            out.append(k)
+        else:
+            buckets[bisect.bisect_left(gutters, (x0 + x1) / 2.0)].append(k)
+    for b in buckets:
+        out.extend(b)
     return out
 
-def _parse_paddle_line(line: Any) -> Tuple[Tuple[float, float, float, float], str, float]:
+
+def build_lines(cols: PageColumns) -> List[Line]:
     """
-    Hỗ trợ:
-      - Paddle classic: [poly, (text, conf)]
-      - Dict (tesseract/custom): {"text":..., "conf":..., "bbox":[x0,y0,x1,y1]}
+    Gom word/box của 1 trang thành Line (điền Line.words) và sắp theo thứ tự đọc.
+      - Có id Tesseract (cols.ids): dòng = nhóm (block, par, line)
+      - Không có (Paddle / nguồn khác): quét gom theo chồng lấn dọc, tách ở khe ngang lớn
+    Line.conf = trung bình conf các word; bbox = hợp các word.
     """
-    # --- dict style (tesseract) ---
-    if isinstance(line, dict):
-        text = str(line.get("text", "") or "").strip()
-        conf = line.get("conf", 0.0)
-        try:
-            conf = float(conf)
-        except Exception:
-            conf = 0.0
-        # chuẩn hóa conf về 0..1
-        if conf > 1.5 and conf <= 100.0:
-            conf = conf / 100.0
-        elif conf > 100.0:
-            conf = min(1.0, conf / 3000.0)  # phòng trường hợp scale rất lớn như bạn gặp
-        bbox = line.get("bbox", [0, 0, 0, 0])
-        try:
-            x0, y0, x1, y1 = float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3])
-        except Exception:
-            x0 = y0 = x1 = y1 = 0.0
-        return (x0, y0, x1, y1), text, conf
-
-    # --- paddle classic ---
-    if not isinstance(line, (list, tuple)) or len(line) < 2:
-        return (0.0, 0.0, 0.0, 0.0), "", 0.0
-
-    bbox_pts = line[0]
-    text_info = line[1]
-
-    # Extract text/conf
-    if isinstance(text_info, (list, tuple)) and len(text_info) >= 2:
-        text, conf = text_info[0], text_info[1]
-    elif isinstance(text_info, dict):
-        text = text_info.get("text", "")
-        conf = text_info.get("conf", text_info.get("score", 0.0))
+    n = len(cols)
+    if not n:
+        return []
+    bbox = cols.bbox
+    if cols.ids is not None:
+        groups: Dict[tuple, List[int]] = {}
+        for k, key in enumerate(map(tuple, cols.ids.tolist())):
+            groups.setdefault(key, []).append(k)
+        segs = [seg for g in groups.values() for seg in _split_by_gap(g, bbox)]
     else:
-        text, conf = str(text_info), 1.0
+        segs = [seg for row in _sweep_rows(bbox) for seg in _split_by_gap(row, bbox)]
 
-    # poly -> bbox
-    try:
-        xs = [float(p[0]) for p in bbox_pts]
-        ys = [float(p[1]) for p in bbox_pts]
-        bbox = (min(xs), min(ys), max(xs), max(ys))
-    except Exception:
-        bbox = (0.0, 0.0, 0.0, 0.0)
+    seg_boxes = np.array([[bbox[s, 0].min(), bbox[s, 1].min(), bbox[s, 2].max(), bbox[s, 3].max()]
+                          for s in segs], dtype=np.float64)
+    boxes_l, conf_l = bbox.tolist(), cols.conf.tolist()
+    lines: List[Line] = []
+    for j in _reading_order(seg_boxes):
+        words = [Word(cols.text[k], tuple(boxes_l[k]), conf_l[k]) for k in segs[j]]
+        lines.append(Line(" ".join(w.text for w in words), tuple(seg_boxes[j].tolist()),
+                          float(np.mean([w.conf for w in words])), words))
+    return lines
 
-    try:
-        conf = float(conf)
-        if conf > 1.5 and conf <= 100.0:
-            conf = conf / 100.0  # nếu đến từ tesseract mà đi nhầm nhánh
-    except Exception:
-        conf = 0.0
 
-    return bbox, str(text), conf
+def paddle_to_columns(
+    doc_id: str,
+    page_idx: int,
+    w: int,
+    h: int,
+    result: OcrResult,
+    min_conf: float = 0.5
+) -> PageColumns:
+    """
+    OcrResult (conf đã chuẩn hoá 0..1 bởi engine) → PageColumns đã lọc (text rỗng, bbox < 1px,
+    conf < min_conf) và sắp thứ tự đọc. Chỉ là phép toán mảng, không parse từng item.
+    """
+    cols = PageColumns(doc_id, page_idx, w, h, result.text, result.bbox, result.conf,
+                       engine=result.engine, ids=result.ids)
+    return cols.filter(min_conf=min_conf, min_size=1.0).sort_reading_order()
 
 
 def paddle_to_page(
@@ -184,38 +187,12 @@ def paddle_to_page(
     page_idx: int,
     w: int,
     h: int,
-    paddle_result: Any,
+    result: OcrResult,
     min_conf: float = 0.5
 ) -> PageText:
-    # unwrap nếu là kiểu [[page0], [page1], ...]
-    if isinstance(paddle_result, list) and paddle_result and isinstance(paddle_result[0], list):
-        page_items = paddle_result[page_idx] if 0 <= page_idx < len(paddle_result) else []
-    else:
-        page_items = paddle_result or []
-
-    lines: List[Line] = []
-    for item in page_items:
-        bbox, text, conf = _parse_paddle_line(item)
-        # lọc bbox rỗng & text rỗng
-        if (bbox[0] == bbox[2] and bbox[1] == bbox[3]) or (bbox[2] - bbox[0] < 1 or bbox[3] - bbox[1] < 1):
-            continue
-        if not text or not text.strip():
-            continue
-        if conf < min_conf:
-            continue
-        lines.append(Line(text=text.strip(), bbox=bbox, conf=float(conf), words=[]))
-
-    # sắp xếp trên-dưới, trái-phải cho ổn định
-    lines.sort(key=lambda L: (L.bbox[1], L.bbox[0]))
-
-    return PageText(
-        document_id=doc_id,
-        page_index=page_idx,
-        width=w,
-        height=h,
-        lines=lines,
-        engine="paddle",
-    )
+    # lọc bbox rỗng / text rỗng / conf thấp bằng phép toán vector, rồi gom word → dòng theo thứ tự đọc
+    cols = paddle_to_columns(doc_id, page_idx, w, h, result, min_conf=min_conf)
+    return PageText(doc_id, page_idx, w, h, build_lines(cols), cols.engine)
 
 
 # ------------------------------
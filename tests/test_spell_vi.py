@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.processing.preprocess.spell_vi import (
+    SEED_LEXICON, SpellCorrector, SpellIndex, build_index, correct_fulltext, is_syllable,
+    load_syllables, read_lexicon, syllable_inventory,
+)
+
+# Văn bản quy chế viết đúng: đi qua corrector phải giữ nguyên từng ký tự
+REGULATION_TEXT = """\
+<<<PAGE 1>>>
+Căn cứ Luật Giáo dục đại học ngày 18 tháng 6 năm 2012;
+Căn cứ Quyết định số 1234/QĐ-ĐHQG của Giám đốc Đại học Quốc gia Thành phố Hồ Chí Minh;
+Theo đề nghị của Trưởng phòng Đào tạo,
+QUYẾT ĐỊNH:
+Điều 1. Ban hành kèm theo Quyết định này Quy chế đào tạo theo học chế tín chỉ.
+Điều 2. Sinh viên bị đình chỉ học tập một học kỳ nếu vi phạm quy chế thi lần thứ hai.
+1. Học kỳ hè được tổ chức cho sinh viên học lại, học cải thiện điểm.
+a) Phòng thí nghiệm trang bị máy khoan điện, máy tiện và thiết bị đo.
+b) Bà Lan, ông Tuấn và thầy Nguyễn Văn Khoa thuộc khoa Khoa học Máy tính.
+<<<PAGE 2>>>
+Điều 3. Điều kiện xét tốt nghiệp: tích lũy đủ số tín chỉ, điểm trung bình tích lũy từ 5,0 trở lên.
+Sinh viên được khen thưởng, kỷ luật theo quy định hiện hành của Trường.
+"""
+
+
+class SpellViTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls.tmp = Path(cls._tmp.name)
+        build_index(read_lexicon(SEED_LEXICON), cls.tmp / "index")
+        cls.corrector = SpellCorrector(SpellIndex(cls.tmp / "index"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def test_inventory_file_matches_rules(self):
+        self.assertEqual(load_syllables(), frozenset(syllable_inventory()))
+
+    def test_is_syllable(self):
+        inv = load_syllables()
+        for w in ("căn", "cứ", "đình", "khoan", "hè", "quyết", "giường", "nghiêng", "khuỷu", "hoà", "hòa"):
+            self.assertTrue(is_syllable(w, inv), w)
+        for w in ("hoc", "tiêt", "nguyen", "cin", "kan", "hóà"):
+            self.assertFalse(is_syllable(w, inv), w)
+
+    def test_correct_text_unchanged(self):
+        for line in REGULATION_TEXT.splitlines():
+            fixed, fixes = self.corrector.correct_line(line)
+            self.assertEqual(fixed, line)
+            self.assertEqual(fixes, [])
+
+    def test_valid_words_outside_lexicon_unchanged(self):
+        for line in ("Căn cứ Luật Giáo dục", "bị đình chỉ học tập", "học kỳ hè", "bà Lan", "máy khoan điện"):
+            self.assertEqual(self.corrector.correct_line(line)[0], line)
+
+    def test_proper_names_mid_sentence_unchanged(self):
+        line = "Sinh viên Nguyen Van Hoc lớp KHMT"
+        self.assertEqual(self.corrector.correct_line(line)[0], line)
+
+    def test_fixes_invalid_syllables(self):
+        self.assertEqual(self.corrector.correct_line("Đăng ký hoc phân theo tiêt học")[0],
+                         "Đăng ký học phần theo tiết học")
+        # "ky" là âm tiết hợp lệ, cặp không có token hỏng → không đổi dù có "đăng ký"
+        self.assertEqual(self.corrector.correct_line("đăng ky")[0], "đăng ky")
+
+    def test_correct_fulltext_unchanged(self):
+        path = self.tmp / "fulltext_norm.txt"
+        path.write_text(REGULATION_TEXT, encoding="utf-8")
+        self.assertEqual(correct_fulltext(path, self.corrector), 0)
+        self.assertEqual(path.read_text(encoding="utf-8"), REGULATION_TEXT)
+
+
+if __name__ == "__main__":
+    unittest.main()
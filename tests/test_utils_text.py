@@ -0,0 +1,42 @@
+import unittest
+
+from src.processing.preprocess.utils_text import LineNormalizer, _normalize_line, drop_repeating_headers_footers
+
+
+def _doc(n_pages: int = 10):
+    pages = []
+    for p in range(1, n_pages + 1):
+        pages.append(["TRƯỜNG ĐẠI HỌC CÔNG NGHỆ THÔNG TIN", f"Điều {p}.", f"Chương {p}",
+                      "Sinh viên thực hiện theo quy định của Trường.",
+                      "1. Quy định chung", f"Dieu {p + 20}. Học phí", f"Trang {p}/{n_pages}"])
+    return pages
+
+
+class HeaderFooterTest(unittest.TestCase):
+    def test_drops_repeated_header_and_page_numbers(self):
+        for L in drop_repeating_headers_footers(_doc()):
+            self.assertNotIn("TRƯỜNG ĐẠI HỌC CÔNG NGHỆ THÔNG TIN", L)
+            self.assertFalse(any(s.startswith("Trang ") for s in L))
+
+    def test_keeps_structural_edge_lines(self):
+        for p, L in enumerate(drop_repeating_headers_footers(_doc()), 1):
+            self.assertEqual(L, [f"Điều {p}.", f"Chương {p}", "Sinh viên thực hiện theo quy định của Trường.",
+                                 "1. Quy định chung", f"Dieu {p + 20}. Học phí"])
+
+    def test_cuts_page_number_glued_to_article(self):
+        pages = _doc()
+        pages[3][-1] = "Điều 7. Học phí Trang 4/10"
+        self.assertEqual(drop_repeating_headers_footers(pages)[3][-1], "Điều 7. Học phí")
+
+
+class NormalizeTest(unittest.TestCase):
+    # Khác baseline ("Hạnhphúc"): tiếng Việt tách âm tiết bằng dấu cách nên gạch nối cuối dòng → 1 dấu cách
+    def test_hyphenation_keeps_syllable_space(self):
+        self.assertEqual(_normalize_line("Độc lập - Tự do - Hạnh- phúc"), "Độc lập - Tự do - Hạnh phúc")
+        self.assertEqual(_normalize_line("Hạnh-\nphúc"), "Hạnh phúc")
+        self.assertEqual(LineNormalizer().batch(["Hạnh-   phúc", "x -  y", "Hạnh-phúc"]),
+                         ["Hạnh phúc", "x - y", "Hạnh-phúc"])
+
+
+if __name__ == "__main__":
+    unittest.main()